@@ -0,0 +1,200 @@
+"""
+api_server.py
+─────────────
+Local HTTP/JSON API over core.py — the learner journey without Streamlit.
+
+    POST /analyse     {"text"}                              → scenario categories, scores, keywords
+    POST /scenario    {"text", "level"}                     → analysis + phrases and dialogue
+                                                              ("job" set while provisional)
+    GET  /jobs/<id>                                         → {"status", "result"}
+    POST /sessions    {"scenario", "level", "confidence", "dialogue"}
+                                                            → {"readiness"}
+    POST /chat        {"text", "level", "history", "message"}
+                                                            → {"reply": {"spanish", "english"}}
+    POST /feedback    {"text", "level", "history"}          → {"feedback"}
+    GET  /profile                                           → the learner's headline numbers
+    GET  /healthz                                           → liveness, learners cached, quota queue
+    GET  /metrics                                           → Prometheus text (telemetry.py)
+
+The learner is the "user_id" field, the X-User-Id header or the user_id
+query parameter (default: the demo user). Chat history is sent by the
+client each turn as chat_history.py turns ({"role", "es", "en"}); the
+server keeps no conversation state, so any replica can serve any turn.
+
+Usage:
+
+    python api_server.py --port 8765
+    CONVOREADY_FAKE_GEMINI=1 python api_server.py      # no API key needed
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import core
+from rate_limiter import SCHEDULER
+from telemetry import REGISTRY
+from user_model import DEMO_USER_ID
+
+logger = logging.getLogger(__name__)
+
+API_HOST = os.environ.get("CONVOREADY_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("CONVOREADY_API_PORT", "8765"))
+MAX_BODY = 1 << 20          # bytes; a long chat history is well under this
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _field(body: dict, name: str):
+    if name not in body:
+        raise BadRequest(f"missing field '{name}'")
+    return body[name]
+
+
+# ── Routes ───────────────────────────────────────────────────────────────────
+
+def analyse(body, user_id):
+    return core.analyse(_field(body, "text"))
+
+
+def scenario(body, user_id):
+    text, level = _field(body, "text"), body.get("level", "A1")
+    analysis    = core.analyse(text)
+    core.STORE.note_request(text)
+    content     = core.scenario_content(text, level, analysis["scenarios"])
+    return {**analysis, **content}
+
+
+def sessions(body, user_id):
+    with core.LEARNERS.use(user_id):
+        readiness = core.record_marks(_field(body, "scenario"), body.get("level", "A1"),
+                                      _field(body, "confidence"), _field(body, "dialogue"))
+    return {"readiness": readiness}
+
+
+def chat(body, user_id):
+    text, level = _field(body, "text"), body.get("level", "A1")
+    with core.LEARNERS.use(user_id):
+        prompt = core.conversation_prompt(core.primary_scenario(core.detect_scenarios(text)), text, level)
+    return {"reply": core.chat(body.get("history", []), _field(body, "message"), prompt)}
+
+
+def feedback(body, user_id):
+    with core.LEARNERS.use(user_id):
+        weaknesses = core.weaknesses()
+    return {"feedback": core.feedback(body.get("history", []), _field(body, "text"),
+                                      body.get("level", "A1"), weaknesses)}
+
+
+def profile(body, user_id):
+    with core.LEARNERS.use(user_id):
+        return core.profile_summary()
+
+
+def healthz(body, user_id):
+    return {"ok": True, "learners": len(core.LEARNERS), "queue": SCHEDULER.status()}
+
+
+ROUTES = {
+    ("POST", "/analyse"):  analyse,
+    ("POST", "/scenario"): scenario,
+    ("POST", "/sessions"): sessions,
+    ("POST", "/chat"):     chat,
+    ("POST", "/feedback"): feedback,
+    ("GET",  "/profile"):  profile,
+    ("GET",  "/healthz"):  healthz,
+}
+
+
+# ── HTTP ─────────────────────────────────────────────────────────────────────
+
+class _APIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"      # keep-alive, so load tests measure the app, not TCP setup
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str):
+        url   = urlsplit(self.path)
+        query = parse_qs(url.query)
+        try:
+            body = self._body() if method == "POST" else {}
+            if method == "GET" and url.path == "/metrics":
+                return self._send(200, REGISTRY.prometheus_text().encode(), "text/plain; version=0.0.4")
+            if method == "GET" and url.path.startswith("/jobs/"):
+                return self._json(200, core.job_result(url.path[len("/jobs/"):]))
+            route = ROUTES.get((method, url.path))
+            if route is None:
+                return self._json(404, {"error": f"no route {method} {url.path}"})
+            user_id = (body.get("user_id") or self.headers.get("X-User-Id")
+                       or query.get("user_id", [DEMO_USER_ID])[0])
+            self._json(200, route(body, user_id))
+        except BadRequest as e:
+            self._json(400, {"error": str(e)})
+        except Exception as e:
+            logger.exception("%s %s failed", method, url.path)
+            self._json(500, {"error": str(e)})
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            raise BadRequest("request body too large")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            raise BadRequest(f"invalid JSON: {e}") from None
+        if not isinstance(body, dict):
+            raise BadRequest("request body must be a JSON object")
+        return body
+
+    def _json(self, status: int, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False, default=str).encode(),
+                   "application/json; charset=utf-8")
+
+    def _send(self, status: int, data: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(host: str = API_HOST, port: int = API_PORT) -> ThreadingHTTPServer:
+    """The API server, bound but not yet serving (port=0 picks a free port)."""
+    server = ThreadingHTTPServer((host, port), _APIHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the ConvoReady engine as a JSON API.")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    server = make_server(args.host, args.port)
+    logger.info("ConvoReady API on http://%s:%s", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,67 @@
 import streamlit as st
-import plotly.graph_objects as go
+import html
 import re
 import sys
 import os
-import json
+import time
 
 # ── Import corpus data and user model (same directory) ─────────────────────
 sys.path.insert(0, os.path.dirname(__file__))
-from corpus_data import get_corpus_frequencies
+from corpus_data import get_corpus_frequencies, get_collocations, get_examples
 from user_model import (
-    record_session,
     get_strengths_and_weaknesses,
     get_recommended_focus,
-    get_predicted_readiness,
+    get_readiness_prediction,
+    get_readiness_series,
+    get_due_reviews,
     get_session_count,
     get_scenario_history,
+    get_profile_version,
     clear_profile,
 )
+from charts import (
+    corpus_figure,
+    grammar_figure,
+    readiness_donut,
+    pattern_history_figure,
+    readiness_line_figure,
+    scenario_bar_figure,
+    reset_rerun_stats,
+    rerun_stats,
+    cache_stats,
+)
 from llm_generator import (
-    generate_phrases,
-    generate_dialogue,
     generate_smart_recommendation,
-    build_conversation_system_prompt,
     chat_with_local,
-    generate_conversation_feedback,
 )
+from core import (
+    LEVEL_ORDER,
+    detect_scenarios,
+    get_match_confidence,
+    primary_scenario,
+    extract_keywords,
+    content_key,
+    recommendation_key,
+    projected_pattern_stats,
+    scenario_content,
+    submit_scenario,
+    submit_recommendation,
+    start_scenario,
+    start_recommendation,
+    submit_feedback,
+    record_marks,
+    conversation_prompt,
+)
+from rate_limiter import CHAT, SCENARIO, SCHEDULER
+from telemetry import start_metrics_server, latency_summary, ui_timing_summary, ui_timing, cache_hit
+from content_store import STORE
+from prefetch import Prefetcher
+from jobs import JOBS, PENDING, RUNNING, UNKNOWN
+from grammar_tagger import tag
+from warmup import EXAMPLE_SCENARIOS, start_warmup
+from timeseries import RANGES
+from session_cache import scenario_key, is_recorded, set_recorded, touch, memory_report
+from chat_history import CHAT_WINDOW, user_turn, assistant_turn, visible_window
 
 # ─────────────────────────────────────────────
 #  PAGE CONFIG
@@ -35,6 +72,9 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
+_run_started = time.perf_counter()
+reset_rerun_stats()
+start_metrics_server()   # Prometheus /metrics for Gemini call telemetry (once per process)
 
 # ─────────────────────────────────────────────
 #  CUSTOM CSS
@@ -182,8 +222,6 @@ SCENARIO_LABELS = {
     "general":    "🌍 General",
 }
 
-LEVEL_ORDER = ["A1", "A2", "B1"]
-
 PATTERN_LABELS = {
     "present_simple":  "Present tense",
     "basic_question":  "Basic question",
@@ -200,169 +238,69 @@ PATTERN_LABELS = {
 
 MODEL_PATTERN_LABELS = PATTERN_LABELS
 
-# ── TF-IDF scenario profiles ────────────────────────────────────────────────
-# Each scenario profile is a rich bag of words drawn from phrases, dialogues,
-# and keywords. The vectoriser learns what language belongs to each scenario
-# and matches user input via cosine similarity — no keyword lists needed.
-
-SCENARIO_PROFILES = {
-    "restaurant": """
-        mesa comer cuenta agua carta vino hambre café comida cena pedido pedir
-        desayuno cocina cerveza carne camarero restaurante menú reserva tapas
-        mesa para dos por favor trae carta recomienda pedir cuenta bebida
-        eat food dinner lunch breakfast cafe bar cook cuisine burger pizza
-        milkshake shake coffee sandwich juice ice cream dessert pastry bakery
-        snack takeaway fast food soda smoothie chicken fish steak soup salad
-        table for two bring the menu what do you recommend i want to order
-        could you bring the bill do you accept card is service included
-        grab a bite starving somewhere to eat book a table tonight hungry
-    """,
-    "transport": """
-        tren viaje calle dirección taxi avión izquierda derecha estación salida
-        equipaje esquina mapa billete vuelo autobús llegada conductor parada
-        bus station airport directions lost route ticket ride drive uber tram
-        straight ahead turn right how much does it cost stop here how long
-        where is the stop keep the change accept card far take me to address
-        getting a cab going to airport catching a train taking the bus metro
-        subway navigate aeropuerto autobus coach ferry port platform
-    """,
-    "shopping": """
-        dinero ropa vestido pagar comprar cambio tienda caja zapatos precio
-        color camisa centro oferta marca talla caro barato probador devolución
-        shop store buy purchase clothes size market mall souvenir gift sale
-        discount fitting return exchange looking for a gift buying clothes
-        how much does this cost do you have my size can i try it on
-        i will take it do you accept returns where is the checkout
-        need a different size another color gift wrap receipt refund
-        salon beauty hair eyebrows nails threading waxing haircut hairdresser
-        peluquería cejas uñas depilación hilo corte pelo tinte manicura
-        beautician stylist barber blow dry trim highlights treatment spa
-        how much is a cut keep the same shape a little shorter same style
-        just a trim keep the shape make them neat tidy up clean up
-        asking price beauty treatment grooming appointment book a time
-    """,
-    "hotel": """
-        noche habitación cama hotel servicio llave doble piso baño maleta
-        recepción pasaporte desayuno toalla ducha wifi equipaje ascensor
-        accommodation room stay check in check out booking reservation bed
-        breakfast key reception airbnb luggage towel hostel
-        i have a reservation what time is breakfast is there wifi
-        the key doesnt work can you store my luggage what time is checkout
-        need more towels air conditioning doesnt work wake me up
-    """,
-    "health": """
-        seguro doctor cabeza sangre médico enfermo hospital dolor cita
-        enfermera fiebre medicina estómago herida farmacia receta alergia
-        sick pain hurt appointment ill injury emergency prescription clinic
-        pharmacy medicine fever symptom allergy feeling unwell
-        i need a doctor my head hurts i have a fever i am allergic
-        where is the nearest pharmacy i need a prescription health insurance
-        been sick for two days need an appointment ache nausea cough
-    """,
-    "work": """
-        trabajo jefe oficina negocio cargo contrato reunión equipo informe
-        experiencia cliente departamento empresa sueldo entrevista candidato
-        job interview office colleague meeting boss salary hire career
-        profession business company cv resume internship
-        my name is i have experience my strengths i would like to work here
-        i work well in a team what would my role be training opportunities
-        when can i start what are the working hours do you have questions
-        apply for a job professional presentation deadline project
-    """,
-    "social": """
-        hablar amigo chica chico fiesta música número teléfono bailar copa
-        beber novia club plan conocer contigo salir quedar pareja invitar
-        friend date party bar meet conversation introduce chat hang out
-        weekend invite relationship dating romance flirt
-        hi my name is where are you from what do you do want to grab a drink
-        what are your plans nice to meet you can i buy you a drink
-        do you have whatsapp shall we exchange numbers how long in spain
-        making friends getting to know people first date night out
-    """,
-    "housing": """
-        casa luz ruido salón dormitorio alquiler casero piso contrato reparar
-        calefacción ducha fontanero avería fianza vecino grifo tubería
-        landlord flat apartment rent lease tenant repair broken deposit
-        contract neighbour noise heat heater water electric boiler plumber
-        shower filter install pipe leak tap drain bathroom kitchen sink
-        electrician fix maintenance wall floor ceiling window door lock
-        there is a problem with the heating the tap is broken
-        when can you send someone to fix it been without hot water
-        is water included in the rent need a copy of the contract
-        calling a plumber neighbours making noise return my deposit
-    """,
-}
-
-# Build TF-IDF matrix at import time (fast — runs once on startup)
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
-
-_scenario_names = list(SCENARIO_PROFILES.keys())
-_vectorizer = TfidfVectorizer(ngram_range=(1, 2), min_df=1, sublinear_tf=True)
-_scenario_matrix = _vectorizer.fit_transform([SCENARIO_PROFILES[s] for s in _scenario_names])
-
-def detect_scenarios(user_text: str) -> list:
-    """
-    Match user text against scenario profiles using TF-IDF cosine similarity.
-    Returns ranked list of scenario keys. Falls back to [general] if no match.
-    """
-    user_vec = _vectorizer.transform([user_text.lower()])
-    similarities = cosine_similarity(user_vec, _scenario_matrix)[0]
-    ranked = [
-        (name, score)
-        for name, score in zip(_scenario_names, similarities)
-        if score > 0.02  # minimum similarity threshold
-    ]
-    ranked.sort(key=lambda x: x[1], reverse=True)
-    return [name for name, _ in ranked] if ranked else ["general"]
-
-def get_match_confidence(user_text: str, matched_keys: list) -> dict:
-    """Return 0–100 cosine similarity scores per matched scenario."""
-    user_vec = _vectorizer.transform([user_text.lower()])
-    similarities = cosine_similarity(user_vec, _scenario_matrix)[0]
-    score_map = dict(zip(_scenario_names, similarities))
-    return {
-        key: min(100, int(score_map.get(key, 0) * 200))
-        for key in matched_keys
-    }
-
 def build_scenario_data(matched_keys: list, user_level_code: str,
                         user_text: str = "") -> dict:
-    primary_key = matched_keys[0] if matched_keys and matched_keys != ["general"] else "general"
-
-    # LLM-generated content — fallbacks are minimal emergency phrases
-    fallback_phrases  = [{"es": "Por favor, ¿puede ayudarme?", "en": "Please, can you help me?", "tip": "💡 Universal phrase when all else fails.", "level": "A1", "pattern": "polite_request"}]
-    fallback_dialogue = [
-        {"speaker": "Local",  "es": "¡Hola! ¿En qué puedo ayudarle?", "en": "Hello! How can I help you?"},
-        {"speaker": "You",    "es": "Hola, necesito ayuda, por favor.", "en": "Hello, I need help, please."},
-    ]
-
-    with st.spinner("✨ Generating personalised phrases with AI..."):
-        phrases = generate_phrases(
-            user_scenario      = user_text,
-            scenario_category  = primary_key,
-            level_code         = user_level_code,
-            fallback_phrases   = fallback_phrases,
-        )
-
-    with st.spinner("✨ Building your practice dialogue..."):
-        dialogue = generate_dialogue(
-            user_scenario      = user_text,
-            scenario_category  = primary_key,
-            level_code         = user_level_code,
-            fallback_dialogue  = fallback_dialogue,
-        )
-
-    return {"phrases": phrases, "dialogue": dialogue,
-            "primary_key": primary_key}
-
-def extract_keywords(user_text: str) -> list:
-    stopwords = {"i", "a", "the", "to", "in", "at", "my", "me", "and", "for", "with",
-                 "of", "on", "is", "it", "an", "want", "need", "going", "will", "be",
-                 "have", "about", "that", "this", "how", "would", "can", "when", "do"}
-    words = re.findall(r'\b[a-z]{3,}\b', user_text.lower())
-    return [w for w in words if w not in stopwords][:8]
+    """
+    Content for the results area — core.scenario_content(), counting a
+    prefetched result as such and showing a spinner if it has to wait.
+    upgrade_scenario_data() swaps the personalised content in when it lands.
+    """
+    # Prefetched while reviewing another level — finished into the store, or still running as a job
+    prefetched = st.session_state.prefetcher.claim(content_key(user_text, user_level_code))
+    return scenario_content(
+        user_text, user_level_code, matched_keys,
+        hit_source = "prefetch" if prefetched else "store",
+        waiting    = lambda: st.spinner("✨ Generating personalised phrases and dialogue with AI..."),
+    )
+
+def upgrade_scenario_data(cache_key: str, user_text: str, user_level_code: str) -> dict:
+    """
+    Swap the personalised content in once its job lands. Phrases swap at
+    once; the dialogue only if no line has been marked yet — otherwise it is
+    kept as "pending_dialogue" and offered, so marks never end up attached to
+    different lines. A failed job leaves the provisional content in place; a
+    job the queue no longer knows (cancelled, or its result expired) is
+    submitted again, so the content still upgrades.
+    """
+    data   = st.session_state[cache_key]
+    job    = data.get("job")
+    status = JOBS.status(job) if job is not None else None
+    if status == UNKNOWN:
+        data = {**data, "job": submit_scenario(user_text, data["primary_key"], user_level_code)}
+        st.session_state[cache_key] = data
+        return data
+    if job is None or status in (PENDING, RUNNING):
+        return data
+    personalised = JOBS.result(job)
+    data = {k: v for k, v in data.items() if k != "job"}
+    if personalised:
+        data["phrases"] = personalised["phrases"]
+        if st.session_state.confidence:
+            data["pending_dialogue"] = personalised["dialogue"]
+        else:
+            data["dialogue"] = personalised["dialogue"]
+        _mark_render_time(cache_key, "personalised")
+    st.session_state[cache_key] = data
+    return data
+
+def _mark_render_time(cache_key: str, stage: str):
+    """Record time-to-first-paint / time-to-personalised-content for this scenario, once each."""
+    timing = st.session_state.render_timing
+    if timing.get("key") == cache_key and timing.get(stage) is None:
+        timing[stage] = time.perf_counter() - timing["started"]
+        ui_timing(stage, timing["source"], timing[stage])
+
+# Pre-generate the sidebar examples and popular scenarios (once per server process)
+start_warmup(lambda text: primary_scenario(detect_scenarios(text)))
+
+def readiness_stats(dialogue: list, confidence: dict):
+    """Return (you_lines, reviewed, confident_count, readiness %, colour) for the dialogue review."""
+    you_lines       = [l for l in dialogue if l["speaker"] == "You"]
+    reviewed        = len(confidence)
+    confident_count = sum(1 for v in confidence.values() if v == "✅")
+    readiness       = int((confident_count / len(you_lines)) * 100) if you_lines else 0
+    r_color         = "#FF9F1C" if readiness >= 70 else "#58CC02" if readiness >= 40 else "#e87c7c"
+    return you_lines, reviewed, confident_count, readiness, r_color
 
 # ─────────────────────────────────────────────
 #  SESSION STATE
@@ -379,79 +317,106 @@ if "conversation_feedback" not in st.session_state:
     st.session_state.conversation_feedback = None
 if "conv_system_prompt" not in st.session_state:
     st.session_state.conv_system_prompt = ""
+if "prefetcher" not in st.session_state:
+    st.session_state.prefetcher = Prefetcher()
+if "render_timing" not in st.session_state:
+    st.session_state.render_timing = {}
 
 # ─────────────────────────────────────────────
-#  SIDEBAR
+#  FRAGMENTS
 # ─────────────────────────────────────────────
-with st.sidebar:
-    st.markdown("""
-    <div style='padding:1rem 0 0.8rem 0;'>
-        <div style='display:flex;align-items:center;gap:0.6rem;margin-bottom:0.3rem;'>
-            <svg width="36" height="36" viewBox="0 0 36 36" fill="none" xmlns="http://www.w3.org/2000/svg">
-                <circle cx="18" cy="18" r="18" fill="#58CC02"/>
-                <ellipse cx="14" cy="16" rx="3.5" ry="4" fill="white"/>
-                <ellipse cx="22" cy="16" rx="3.5" ry="4" fill="white"/>
-                <circle cx="14" cy="16" r="2" fill="#1f2937"/>
-                <circle cx="22" cy="16" r="2" fill="#1f2937"/>
-                <ellipse cx="18" cy="22" rx="4" ry="2.5" fill="#FF9F1C"/>
-                <path d="M16 21.5 Q18 24 20 21.5" stroke="#1f2937" stroke-width="0.5" fill="none"/>
-            </svg>
-            <div>
-                <div style='font-family:Nunito,sans-serif;font-size:1.5rem;font-weight:900;color:#f9fafb;line-height:1;'>ConvoReady</div>
-                <div style='font-size:0.7rem;color:#58CC02;font-weight:700;letter-spacing:0.05em;'>POWERED BY DUOLINGO DATA</div>
-            </div>
-        </div>
-        <div style='font-size:0.78rem;color:#9ca3af;font-weight:400;'>Spanish Conversation Trainer</div>
-    </div>
-    <hr style='border-color:#374151;margin:0.8rem 0;'>
-    """, unsafe_allow_html=True)
-
-    st.markdown("<div style='font-size:0.75rem;color:#9ca3af;text-transform:uppercase;letter-spacing:0.1em;margin-bottom:0.4rem;'>Your Level</div>", unsafe_allow_html=True)
-    level = st.selectbox("level", list(LEVEL_INFO.keys()), label_visibility="collapsed")
-    level_data      = LEVEL_INFO[level]
-    user_level_code = level_data["code"]
-
-    # Detect level change → reset confidence so adaptive content refreshes visibly
-    if st.session_state.get("last_level") != user_level_code:
-        st.session_state["last_level"] = user_level_code
-        st.session_state.confidence = {}
-        if st.session_state.get("scenario_submitted"):
-            st.rerun()
-
-    st.markdown("<hr style='border-color:#374151;margin:1.2rem 0;'>", unsafe_allow_html=True)
-    st.markdown(f"""
-    <div style='background:#111827;border:1px solid #374151;border-radius:10px;padding:1rem;'>
-        <div style='font-size:0.75rem;color:#9ca3af;text-transform:uppercase;letter-spacing:0.08em;margin-bottom:0.5rem;'>Your Profile</div>
-        <div style='font-size:0.85rem;color:#f9fafb;margin-bottom:0.5rem;'>{level_data["desc"]}</div>
-        <div style='font-size:0.75rem;color:#9ca3af;'>Est. vocabulary: <span style='color:{level_data["color"]};'>{level_data["known_vocab"]:,} words</span></div>
-    </div>
-    """, unsafe_allow_html=True)
+# Panels that rerun on their own. A widget inside a fragment reruns just
+# that fragment, so confidence clicks and chat messages skip scenario
+# detection, CSS injection, the sidebar profile and the other tabs.
+
+def _record_run_time(name: str, started: float):
+    st.session_state.setdefault("run_times_ms", {})[name] = (time.perf_counter() - started) * 1000
+
+def _mark_line(key: str, verdict: str):
+    st.session_state.confidence[key] = verdict
+
+def _record_review(primary_key: str, user_text: str, user_level_code: str, dialogue: list):
+    """Save the confidence marks to the learning profile, once per scenario + level."""
+    if is_recorded(st.session_state, user_text, user_level_code):
+        return
+    record_marks(primary_key, user_level_code, st.session_state.confidence, dialogue)
+    set_recorded(st.session_state, user_text, user_level_code)
+
+def _switch_dialogue(cache_key: str, primary_key: str, user_text: str, user_level_code: str):
+    """Adopt the personalised dialogue: marks on the provisional one are recorded, then reset."""
+    data = dict(st.session_state[cache_key])
+    _record_review(primary_key, user_text, user_level_code, data["dialogue"])
+    set_recorded(st.session_state, user_text, user_level_code, False)
+    data["dialogue"] = data.pop("pending_dialogue")
+    st.session_state[cache_key] = data
+    st.session_state.confidence = {}
 
-    st.markdown("<hr style='border-color:#374151;margin:1.2rem 0;'>", unsafe_allow_html=True)
-    st.markdown("<div style='font-size:0.75rem;color:#9ca3af;margin-bottom:0.6rem;'>💡 Example scenarios:</div>", unsafe_allow_html=True)
-    examples = [
-        "Complain to landlord about broken heater",
-        "First date at a tapas bar",
-        "Buying clothes, asking about sizes",
-        "Feeling sick, need a pharmacy",
-        "Taxi from the airport",
-        "Job interview at a Spanish company",
-    ]
-    for ex in examples:
-        if st.button(f"→ {ex}", key=f"ex_{ex}", use_container_width=True):
-            st.session_state.scenario_text = ex
-            st.session_state.scenario_submitted = True
-            st.session_state.confidence = {}
-            st.rerun()
+def _ensure_conv_system_prompt(primary_key: str, user_text: str, user_level_code: str):
+    """Build the Tab 4 system prompt once per scenario + level."""
+    if (st.session_state.conv_system_prompt
+            and st.session_state.get("conv_prompt_for") == (user_text, user_level_code)):
+        return
+    st.session_state.conv_system_prompt = conversation_prompt(primary_key, user_text, user_level_code)
+    st.session_state.conv_prompt_for = (user_text, user_level_code)
 
-    st.markdown("<hr style='border-color:#374151;margin:1.2rem 0;'>", unsafe_allow_html=True)
-    if st.button("🔄 New Scenario", use_container_width=True):
-        st.session_state.confidence = {}
-        st.session_state.scenario_text = ""
-        st.session_state.scenario_submitted = False
+def _prefetch_next_steps(dialogue: list, primary_key: str, user_text: str, user_level_code: str):
+    """
+    Speculatively start what the next click will likely need while the learner
+    reviews the dialogue. Prefetches no longer relevant are let go of.
+    """
+    pf        = st.session_state.prefetcher
+    marks     = st.session_state.confidence
+    you_idx   = [i for i, l in enumerate(dialogue) if l["speaker"] == "You"]
+    unmarked  = [i for i in you_idx if f"conf_{i}" not in marks]
+    struggled = [i for i in you_idx if marks.get(f"conf_{i}") == "❌"]
+    keep      = set()
+
+    # Survival Kit recommendation — with one line left there are only two possible outcomes
+    if len(unmarked) <= 1:
+        pattern_stats = __import__("user_model")._load_profile().get("pattern_stats", {})
+        for candidate in {tuple(struggled), tuple(sorted(struggled + unmarked))}:
+            if not candidate:
+                continue
+            phrases = [{"es": dialogue[i]["es"], "en": dialogue[i]["en"]} for i in candidate]
+            final   = {**marks, **{f"conf_{i}": "❌" if i in candidate else "✅" for i in unmarked}}
+            stats   = projected_pattern_stats(pattern_stats, final, dialogue)
+            key     = recommendation_key(user_text, user_level_code, phrases, stats)
+            jid, started = start_recommendation(user_text, primary_key, user_level_code,
+                                                phrases, stats)
+            future       = JOBS.future(jid)
+            if future is not None:
+                keep.add(key)
+                pf.adopt(key, future, started)
+
+    # Adjacent levels of this scenario — once the learner has started reviewing
+    pos = LEVEL_ORDER.index(user_level_code) if user_level_code in LEVEL_ORDER else -1
+    for j, level in enumerate(LEVEL_ORDER):
+        key = content_key(user_text, level)
+        if pf.pending(key):
+            keep.add(key)
+        elif marks and abs(j - pos) == 1 and (user_text, level) not in STORE:
+            jid, started = start_scenario(user_text, primary_key, level)
+            future       = JOBS.future(jid)
+            if future is not None:
+                keep.add(key)
+                pf.adopt(key, future, started)
+
+    pf.retain(keep)
+
+    # Conversation opener — the system prompt is local, so just build it now
+    _ensure_conv_system_prompt(primary_key, user_text, user_level_code)
+
+@st.fragment(run_every=1.0)
+def job_poller(jid: str):
+    """Rendered only while a background job runs; triggers one full rerun when it lands."""
+    if JOBS.status(jid) not in (PENDING, RUNNING):
         st.rerun()
 
-    # ── Learning Profile sidebar widget ──────────────────────────────────────
+@st.fragment
+def learning_profile_panel():
+    """Sidebar learning profile and dashboard — skipped by Tab 2 and Tab 4 fragment reruns."""
+    started = time.perf_counter()
+
     session_count = get_session_count()
     if session_count > 0:
         st.markdown("<hr style='border-color:#374151;margin:1.2rem 0;'>", unsafe_allow_html=True)
@@ -474,6 +439,12 @@ with st.sidebar:
             for w in weaknesses[:2]:
                 st.markdown(f"<div style='font-size:0.72rem;color:#f9fafb;margin-bottom:0.2rem;'>❌ {w['label']} — {int(w['rate']*100)}%</div>", unsafe_allow_html=True)
 
+        due_reviews = get_due_reviews(limit=3)
+        if due_reviews:
+            st.markdown("<div style='font-size:0.72rem;color:#1CB0F6;font-weight:700;margin:0.5rem 0 0.3rem 0;'>🔁 Due for review</div>", unsafe_allow_html=True)
+            for r in due_reviews:
+                st.markdown(f"<div style='font-size:0.72rem;color:#f9fafb;margin-bottom:0.2rem;'>{html.escape(r['phrase'])}</div>", unsafe_allow_html=True)
+
         st.markdown("</div>", unsafe_allow_html=True)
 
         if st.button("🗑️ Reset Profile", use_container_width=True):
@@ -483,21 +454,23 @@ with st.sidebar:
         # ── Progress Dashboard ────────────────────────────────────────────
         st.markdown("<hr style='border-color:#374151;margin:1rem 0;'>", unsafe_allow_html=True)
         with st.expander("📈 Progress Dashboard", expanded=False):
-            profile_data   = __import__("user_model")._load_profile()
-            sessions_list  = profile_data.get("sessions", [])
+            profile_data    = __import__("user_model")._load_profile()
+            profile_version = get_profile_version()
             scenario_stats = profile_data.get("scenario_stats", {})
             pattern_stats  = profile_data.get("pattern_stats", {})
 
-            if not sessions_list:
+            if not session_count:
                 st.markdown("<div style='color:#6b7280;font-size:0.8rem;'>Complete a practice session to see your progress here.</div>", unsafe_allow_html=True)
             else:
-                # ── Stat pills ──────────────────────────────────────────
+                # ── Stat pills ── (from the stats, so the stored sessions stay packed)
                 total_scenarios = len(scenario_stats)
-                avg_readiness   = int(sum(s["readiness"] for s in sessions_list) / len(sessions_list))
+                scored          = sum(v["sessions"] for v in scenario_stats.values())
+                avg_readiness   = int(sum(v["avg_readiness"] * v["sessions"] for v in scenario_stats.values())
+                                      / scored) if scored else 0
                 st.markdown(f"""
                 <div style='display:grid;grid-template-columns:1fr 1fr 1fr;gap:0.4rem;margin-bottom:0.8rem;'>
                     <div style='background:#111827;border-radius:8px;padding:0.5rem;text-align:center;'>
-                        <div style='font-size:1.1rem;font-weight:900;color:#58CC02;font-family:Nunito,sans-serif;'>{len(sessions_list)}</div>
+                        <div style='font-size:1.1rem;font-weight:900;color:#58CC02;font-family:Nunito,sans-serif;'>{session_count}</div>
                         <div style='font-size:0.6rem;color:#9ca3af;'>Sessions</div>
                     </div>
                     <div style='background:#111827;border-radius:8px;padding:0.5rem;text-align:center;'>
@@ -512,50 +485,32 @@ with st.sidebar:
                 """, unsafe_allow_html=True)
 
                 # ── Readiness over time line chart ───────────────────────
-                if len(sessions_list) >= 2:
+                if session_count >= 2:
                     st.markdown("<div style='font-size:0.7rem;color:#9ca3af;text-transform:uppercase;letter-spacing:0.08em;margin-bottom:0.3rem;'>Readiness over time</div>", unsafe_allow_html=True)
-                    dates     = [s["timestamp"][:10] for s in sessions_list]
-                    readiness_vals = [s["readiness"] for s in sessions_list]
-                    fig_line = go.Figure()
-                    fig_line.add_trace(go.Scatter(
-                        x=list(range(1, len(sessions_list)+1)),
-                        y=readiness_vals,
-                        mode="lines+markers",
-                        line=dict(color="#58CC02", width=2),
-                        marker=dict(size=6, color="#58CC02"),
-                        hovertemplate="Session %{x}<br>%{y}% ready<br>" +
-                                      "<extra></extra>",
-                    ))
-                    fig_line.update_layout(
-                        height=140, margin=dict(l=0, r=0, t=4, b=0),
-                        paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)",
-                        xaxis=dict(showgrid=False, color="#6b7280", tickfont=dict(size=9)),
-                        yaxis=dict(showgrid=True, gridcolor="#374151", color="#6b7280",
-                                   tickfont=dict(size=9), range=[0, 105]),
-                        showlegend=False,
-                    )
-                    st.plotly_chart(fig_line, use_container_width=True, config={"displayModeBar": False})
+                    col_sc, col_range = st.columns(2)
+                    with col_sc:
+                        series_scenario = st.selectbox("series_scenario", ["All scenarios"] + list(scenario_stats),
+                                                       key="series_scenario", label_visibility="collapsed",
+                                                       format_func=lambda k: SCENARIO_LABELS.get(k, k))
+                    with col_range:
+                        series_range = st.selectbox("series_range", list(RANGES), key="series_range",
+                                                    label_visibility="collapsed")
+                    scenario_filter = None if series_scenario == "All scenarios" else series_scenario
+                    series = get_readiness_series(scenario_filter, RANGES[series_range])
+                    if series:
+                        fig_line = readiness_line_figure((profile_version, scenario_filter, series_range), series)
+                        st.plotly_chart(fig_line, use_container_width=True, config={"displayModeBar": False})
+                        if series["total"] > len(series["x"]):
+                            st.markdown(f"<div style='font-size:0.65rem;color:#6b7280;margin-top:-0.6rem;'>{series['total']:,} sessions · shape-preserving sample of {len(series['x'])}</div>", unsafe_allow_html=True)
+                    else:
+                        st.markdown("<div style='color:#6b7280;font-size:0.75rem;margin-bottom:0.6rem;'>No sessions in this range.</div>", unsafe_allow_html=True)
 
                 # ── Scenarios bar chart ──────────────────────────────────
                 if scenario_stats:
                     st.markdown("<div style='font-size:0.7rem;color:#9ca3af;text-transform:uppercase;letter-spacing:0.08em;margin-bottom:0.3rem;'>Scenarios practised</div>", unsafe_allow_html=True)
                     sc_labels = [SCENARIO_LABELS.get(k, k).split(" ")[1] if " " in SCENARIO_LABELS.get(k, k) else k for k in scenario_stats]
                     sc_counts = [v["sessions"] for v in scenario_stats.values()]
-                    sc_ready  = [v["avg_readiness"] for v in scenario_stats.values()]
-                    fig_bar = go.Figure()
-                    fig_bar.add_trace(go.Bar(
-                        x=sc_labels, y=sc_counts,
-                        marker_color="#1CB0F6",
-                        hovertemplate="%{x}<br>%{y} session(s)<extra></extra>",
-                    ))
-                    fig_bar.update_layout(
-                        height=130, margin=dict(l=0, r=0, t=4, b=0),
-                        paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)",
-                        xaxis=dict(showgrid=False, color="#6b7280", tickfont=dict(size=9)),
-                        yaxis=dict(showgrid=True, gridcolor="#374151", color="#6b7280",
-                                   tickfont=dict(size=9)),
-                        showlegend=False,
-                    )
+                    fig_bar = scenario_bar_figure(profile_version, sc_labels, sc_counts)
                     st.plotly_chart(fig_bar, use_container_width=True, config={"displayModeBar": False})
 
                 # ── Grammar pattern breakdown ────────────────────────────
@@ -581,6 +536,306 @@ with st.sidebar:
                         </div>
                         """, unsafe_allow_html=True)
 
+    _record_run_time("learning_profile_panel", started)
+
+@st.fragment
+def dialogue_review(dialogue: list, primary_key: str, user_text: str,
+                    user_level_code: str, level_color: str):
+    """
+    Tab 2 — runs as a fragment, so a confidence click reruns only this panel.
+    The click that marks the last line triggers one full rerun so the Survival
+    Kit and the header stats pick up the completed review; later changes stay
+    in the fragment and offer a button to refresh them.
+    """
+    started = time.perf_counter()
+    you_lines, reviewed, confident_count, readiness, r_color = readiness_stats(
+        dialogue, st.session_state.confidence)
+    synced   = st.session_state.get("marks_at_full_run", {})
+    complete = bool(you_lines) and reviewed >= len(you_lines)
+    if complete and len(synced) < len(you_lines):
+        st.rerun()
+    _prefetch_next_steps(dialogue, primary_key, user_text, user_level_code)
+
+    st.markdown("<div class='section-header'>Practice Dialogue</div>", unsafe_allow_html=True)
+    st.markdown(f"<div class='section-sub'>A real {user_level_code}-level conversation — mark your honest confidence on each line you'd need to say.</div>", unsafe_allow_html=True)
+
+    if reviewed > 0:
+        st.progress(reviewed / len(you_lines))
+        st.markdown(f"<div style='font-size:0.8rem;color:#9ca3af;margin-bottom:1rem;'>{reviewed} of {len(you_lines)} your lines reviewed — {confident_count} confident</div>", unsafe_allow_html=True)
+    if complete and st.session_state.confidence != synced:
+        if st.button("🔄 Update Survival Kit with these marks", key="refresh_kit"):
+            st.rerun()
+
+    col_d, col_c = st.columns([1.6, 1], gap="large")
+
+    with col_d:
+        you_idx = 0
+        for i, line in enumerate(dialogue):
+            is_you = line["speaker"] == "You"
+            bc = "#58CC02" if is_you else "#374151"
+            st.markdown(f"""
+            <div class='dialogue-line' style='border-left-color:{bc};'>
+                <div class='dialogue-speaker'>{"🧑 You" if is_you else "💬 " + line["speaker"]}</div>
+                <div class='dialogue-spanish'>{line["es"]}</div>
+                <div class='dialogue-english'>{line["en"]}</div>
+            </div>
+            """, unsafe_allow_html=True)
+            if is_you:
+                key = f"conf_{i}"
+                cy, cn = st.columns(2)
+                with cy:
+                    st.button("✅ I know this", key=f"yes_{i}", use_container_width=True,
+                              on_click=_mark_line, args=(key, "✅"))
+                with cn:
+                    st.button("❌ I'd struggle", key=f"no_{i}", use_container_width=True,
+                              on_click=_mark_line, args=(key, "❌"))
+                current = st.session_state.confidence.get(key)
+                if current:
+                    cc = "#FF9F1C" if current == "✅" else "#e87c7c"
+                    label = "I know this ✅" if current == "✅" else "I'd struggle ❌"
+                    st.markdown(f"<div style='font-size:0.78rem;color:{cc};margin-bottom:0.5rem;padding-left:0.5rem;'>{label}</div>", unsafe_allow_html=True)
+                you_idx += 1
+
+    with col_c:
+        st.markdown(f"""
+        <div style='background:#1f2937;border:1px solid #374151;border-radius:12px;padding:1.2rem;margin-bottom:1rem;'>
+            <div style='font-size:0.75rem;color:#9ca3af;text-transform:uppercase;letter-spacing:0.1em;margin-bottom:0.6rem;'>
+                {user_level_code} Dialogue
+            </div>
+            <div style='font-size:0.85rem;color:#f9fafb;line-height:1.7;'>
+                This dialogue is tailored to your <span style='color:{level_color};'>{user_level_code}</span> level —
+                {"shorter and simpler for beginners." if user_level_code == "A1" else
+                 "a solid mid-length exchange." if user_level_code == "A2" else
+                 "the full, natural-speed conversation."}
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+        st.markdown(f"""
+        <div class='readiness-container'>
+            <div class='readiness-label'>Conversation Readiness</div>
+            <div class='readiness-score' style='color:{r_color};'>{readiness}%</div>
+            <div style='font-size:0.85rem;color:#9ca3af;margin-top:0.5rem;'>
+                {"🟢 You're ready!" if readiness >= 80 else "🟡 Getting there..." if readiness >= 50 else "🔴 Keep practicing"}
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    _record_run_time("dialogue_review", started)
+
+@st.fragment
+def conversation_practice(primary_key: str, user_text: str, user_level_code: str):
+    """Tab 4 — runs as a fragment, so sending a message reruns only the chat panel."""
+    started = time.perf_counter()
+
+    # Usually already prepared by the dialogue review
+    _ensure_conv_system_prompt(primary_key, user_text, user_level_code)
+
+    role_name = {
+        "restaurant": "Waiter", "transport": "Driver", "shopping": "Shop Assistant",
+        "hotel": "Receptionist", "health": "Doctor", "work": "Colleague",
+        "social": "Friend", "housing": "Landlord", "general": "Local",
+    }.get(primary_key, "Local")
+
+    # Header
+    st.markdown(f"""
+    <div style='background:linear-gradient(135deg,#1f2937,#111827);border:1px solid #374151;
+                border-radius:16px;padding:1.2rem 1.5rem;margin-bottom:1.2rem;'>
+        <div style='font-size:0.75rem;color:#58CC02;text-transform:uppercase;
+                    letter-spacing:0.1em;font-weight:800;margin-bottom:0.3rem;'>
+            💬 Live Conversation Practice
+        </div>
+        <div style='color:#f9fafb;font-size:0.95rem;line-height:1.6;'>
+            You're speaking with a <strong>{role_name}</strong> in Spain.
+            Type in <strong>Spanish only</strong> — the {role_name} will respond in Spanish
+            with an English translation. When you're done, click <em>Finish & Get Feedback</em>.
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # Pick up a finished feedback job
+    feedback_job = st.session_state.get("feedback_job")
+    if feedback_job and JOBS.status(feedback_job) not in (PENDING, RUNNING):
+        st.session_state.conversation_feedback = JOBS.result(feedback_job)
+        st.session_state.feedback_job = feedback_job = None
+        if not st.session_state.conversation_feedback:
+            st.warning("⚠️ Couldn't analyse your conversation this time — please try again.")
+
+    # Show conversation feedback if available
+    if st.session_state.conversation_feedback:
+        fb = st.session_state.conversation_feedback
+        score     = fb.get("score", 0)
+        s_color   = "#58CC02" if score >= 70 else "#FF9F1C" if score >= 40 else "#EF4444"
+
+        st.markdown(f"""
+        <div style='background:#1f2937;border:2px solid {s_color};border-radius:16px;
+                    padding:1.5rem;margin-bottom:1.5rem;'>
+            <div style='font-size:0.75rem;color:{s_color};text-transform:uppercase;
+                        letter-spacing:0.1em;font-weight:800;margin-bottom:0.8rem;'>
+                🏆 Conversation Report
+            </div>
+            <div style='display:flex;align-items:center;gap:1.5rem;margin-bottom:1rem;'>
+                <div style='font-size:3rem;font-weight:900;color:{s_color};font-family:Nunito,sans-serif;'>
+                    {score}
+                </div>
+                <div style='color:#f9fafb;font-size:0.95rem;line-height:1.6;'>
+                    {fb.get("summary", "")}
+                </div>
+            </div>
+            <div style='display:grid;grid-template-columns:1fr 1fr;gap:1rem;margin-bottom:1rem;'>
+                <div style='background:#111827;border-radius:10px;padding:0.8rem;'>
+                    <div style='color:#58CC02;font-size:0.75rem;font-weight:800;
+                                text-transform:uppercase;margin-bottom:0.5rem;'>✅ Strengths</div>
+                    {"".join([f"<div style='color:#d1fae5;font-size:0.85rem;margin-bottom:0.3rem;'>• {s}</div>" for s in fb.get("strengths", [])])}
+                </div>
+                <div style='background:#111827;border-radius:10px;padding:0.8rem;'>
+                    <div style='color:#FF9F1C;font-size:0.75rem;font-weight:800;
+                                text-transform:uppercase;margin-bottom:0.5rem;'>⚠️ To Improve</div>
+                    {"".join([f"<div style='color:#fef3c7;font-size:0.85rem;margin-bottom:0.3rem;'>• {i}</div>" for i in fb.get("improvements", [])])}
+                </div>
+            </div>
+            <div style='background:#111827;border-radius:10px;padding:0.8rem;'>
+                <div style='color:#1CB0F6;font-size:0.75rem;font-weight:800;
+                            text-transform:uppercase;margin-bottom:0.4rem;'>🎯 Next Focus</div>
+                <div style='color:#bfdbfe;font-size:0.85rem;'>{fb.get("next_focus", "")}</div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+        if st.button("🔄 Start New Conversation", use_container_width=True, key="reset_conv"):
+            st.session_state.chat_history = []
+            st.session_state.chat_window = CHAT_WINDOW
+            st.session_state.conversation_feedback = None
+            st.session_state.feedback_job = None
+            st.rerun(scope="fragment")
+
+    else:
+        # Chat history display
+        if not st.session_state.chat_history:
+            st.markdown("""
+            <div style='text-align:center;padding:2rem;color:#6b7280;font-size:0.9rem;'>
+                Start the conversation by typing your first message in Spanish below 👇
+            </div>
+            """, unsafe_allow_html=True)
+        else:
+            window = st.session_state.get("chat_window", CHAT_WINDOW)
+            hidden, turns_html = visible_window(st.session_state.chat_history, window)
+            if hidden and st.button(f"⬆️ Show earlier messages ({hidden})", key="chat_more",
+                                    use_container_width=True):
+                st.session_state.chat_window = window + CHAT_WINDOW
+                st.rerun(scope="fragment")
+            st.markdown(turns_html, unsafe_allow_html=True)
+
+        # Quota queue — warn before the learner sends into a long wait
+        chat_wait = SCHEDULER.estimated_wait(CHAT)
+        if chat_wait >= 1:
+            st.markdown(f"<div style='font-size:0.8rem;color:#9ca3af;margin:0.4rem 0;'>⏳ Lots of learners right now — replies may take about {chat_wait:.0f}s.</div>", unsafe_allow_html=True)
+
+        # Input area
+        user_chat_input = st.text_input(
+            "Your message (in Spanish)",
+            placeholder="Escribe en español...",
+            key="chat_input",
+            label_visibility="collapsed",
+        )
+
+        col_send, col_finish = st.columns([3, 2])
+        with col_send:
+            if st.button("📤 Send", use_container_width=True, key="send_msg"):
+                if user_chat_input.strip():
+                    with st.spinner("💬 Responding..."):
+                        response = chat_with_local(
+                            chat_history  = st.session_state.chat_history,
+                            user_message  = user_chat_input.strip(),
+                            system_prompt = st.session_state.conv_system_prompt,
+                        )
+                    st.session_state.chat_history.append(user_turn(user_chat_input.strip()))
+                    st.session_state.chat_history.append(assistant_turn(response))
+                    st.rerun(scope="fragment")
+
+        with col_finish:
+            if st.button("🏁 Finish & Get Feedback", use_container_width=True, key="finish_conv",
+                         disabled=bool(feedback_job)):
+                history = list(st.session_state.chat_history)
+                if len(history) >= 2:
+                    _, weaknesses = get_strengths_and_weaknesses()
+                    st.session_state.feedback_job = submit_feedback(
+                        history, user_text, user_level_code, weaknesses)
+                    st.rerun(scope="fragment")
+                else:
+                    st.warning("Have at least one exchange before getting feedback.")
+
+        if feedback_job:
+            st.markdown("<div style='font-size:0.85rem;color:#9ca3af;margin-top:0.5rem;'>🤖 Analysing your conversation — your report will appear here in a moment.</div>", unsafe_allow_html=True)
+            job_poller(feedback_job)
+
+    _record_run_time("conversation_practice", started)
+
+# ─────────────────────────────────────────────
+#  SIDEBAR
+# ─────────────────────────────────────────────
+with st.sidebar:
+    st.markdown("""
+    <div style='padding:1rem 0 0.8rem 0;'>
+        <div style='display:flex;align-items:center;gap:0.6rem;margin-bottom:0.3rem;'>
+            <svg width="36" height="36" viewBox="0 0 36 36" fill="none" xmlns="http://www.w3.org/2000/svg">
+                <circle cx="18" cy="18" r="18" fill="#58CC02"/>
+                <ellipse cx="14" cy="16" rx="3.5" ry="4" fill="white"/>
+                <ellipse cx="22" cy="16" rx="3.5" ry="4" fill="white"/>
+                <circle cx="14" cy="16" r="2" fill="#1f2937"/>
+                <circle cx="22" cy="16" r="2" fill="#1f2937"/>
+                <ellipse cx="18" cy="22" rx="4" ry="2.5" fill="#FF9F1C"/>
+                <path d="M16 21.5 Q18 24 20 21.5" stroke="#1f2937" stroke-width="0.5" fill="none"/>
+            </svg>
+            <div>
+                <div style='font-family:Nunito,sans-serif;font-size:1.5rem;font-weight:900;color:#f9fafb;line-height:1;'>ConvoReady</div>
+                <div style='font-size:0.7rem;color:#58CC02;font-weight:700;letter-spacing:0.05em;'>POWERED BY DUOLINGO DATA</div>
+            </div>
+        </div>
+        <div style='font-size:0.78rem;color:#9ca3af;font-weight:400;'>Spanish Conversation Trainer</div>
+    </div>
+    <hr style='border-color:#374151;margin:0.8rem 0;'>
+    """, unsafe_allow_html=True)
+
+    st.markdown("<div style='font-size:0.75rem;color:#9ca3af;text-transform:uppercase;letter-spacing:0.1em;margin-bottom:0.4rem;'>Your Level</div>", unsafe_allow_html=True)
+    level = st.selectbox("level", list(LEVEL_INFO.keys()), label_visibility="collapsed")
+    level_data      = LEVEL_INFO[level]
+    user_level_code = level_data["code"]
+
+    # Detect level change → reset confidence so adaptive content refreshes visibly
+    if st.session_state.get("last_level") != user_level_code:
+        st.session_state["last_level"] = user_level_code
+        st.session_state.confidence = {}
+        if st.session_state.get("scenario_submitted"):
+            st.rerun()
+
+    st.markdown("<hr style='border-color:#374151;margin:1.2rem 0;'>", unsafe_allow_html=True)
+    st.markdown(f"""
+    <div style='background:#111827;border:1px solid #374151;border-radius:10px;padding:1rem;'>
+        <div style='font-size:0.75rem;color:#9ca3af;text-transform:uppercase;letter-spacing:0.08em;margin-bottom:0.5rem;'>Your Profile</div>
+        <div style='font-size:0.85rem;color:#f9fafb;margin-bottom:0.5rem;'>{level_data["desc"]}</div>
+        <div style='font-size:0.75rem;color:#9ca3af;'>Est. vocabulary: <span style='color:{level_data["color"]};'>{level_data["known_vocab"]:,} words</span></div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    st.markdown("<hr style='border-color:#374151;margin:1.2rem 0;'>", unsafe_allow_html=True)
+    st.markdown("<div style='font-size:0.75rem;color:#9ca3af;margin-bottom:0.6rem;'>💡 Example scenarios:</div>", unsafe_allow_html=True)
+    for ex in EXAMPLE_SCENARIOS:
+        if st.button(f"→ {ex}", key=f"ex_{ex}", use_container_width=True):
+            st.session_state.scenario_text = ex
+            st.session_state.scenario_submitted = True
+            st.session_state.confidence = {}
+            st.rerun()
+
+    st.markdown("<hr style='border-color:#374151;margin:1.2rem 0;'>", unsafe_allow_html=True)
+    if st.button("🔄 New Scenario", use_container_width=True):
+        st.session_state.confidence = {}
+        st.session_state.scenario_text = ""
+        st.session_state.scenario_submitted = False
+        st.rerun()
+
+    # ── Learning Profile sidebar widget ──────────────────────────────────────
+    learning_profile_panel()
+
 # ─────────────────────────────────────────────
 #  MAIN
 # ─────────────────────────────────────────────
@@ -608,7 +863,9 @@ if st.button("✨ Analyse my scenario", use_container_width=True):
         st.session_state.scenario_submitted = True
         st.session_state.confidence = {}
         st.session_state.chat_history = []
+        st.session_state.chat_window = CHAT_WINDOW
         st.session_state.conversation_feedback = None
+        st.session_state.feedback_job = None
         st.session_state.conv_system_prompt = ""
         st.rerun()
 
@@ -622,10 +879,17 @@ if st.session_state.scenario_submitted and st.session_state.scenario_text.strip(
     detected_words = extract_keywords(user_text)
 
     # Cache scenario_data so Gemini is NOT called on every button click rerun
-    cache_key = f"scenario_data_{user_text}_{user_level_code}"
+    cache_key = scenario_key(user_text, user_level_code)
     if cache_key not in st.session_state:
-        st.session_state[cache_key] = build_scenario_data(matched_keys, user_level_code, user_text)
-    scenario_data = st.session_state[cache_key]
+        STORE.note_request(user_text)
+        data = build_scenario_data(matched_keys, user_level_code, user_text)
+        st.session_state[cache_key]    = data
+        st.session_state.render_timing = {"key": cache_key, "started": _run_started, "source": data["source"]}
+    elif st.session_state.get("served_scenario") != cache_key:
+        cache_hit("build_scenario_data", "session")     # back to a scenario, not a rerun of this one
+    st.session_state.served_scenario = cache_key
+    touch(st.session_state, cache_key)     # LRU — older scenarios' content is dropped past the budget
+    scenario_data = upgrade_scenario_data(cache_key, user_text, user_level_code)
     primary_key   = scenario_data["primary_key"]
 
     st.markdown("<hr style='border-color:#374151;margin:1.5rem 0;'>", unsafe_allow_html=True)
@@ -647,14 +911,28 @@ if st.session_state.scenario_submitted and st.session_state.scenario_text.strip(
     </div>
     """, unsafe_allow_html=True)
 
+    # Provisional content — say where it is from until the personalised kit lands
+    if scenario_data.get("job"):
+        shown_from = {"similar": "a similar scenario", "bank": "the offline phrasebook",
+                      "emergency": "a few universal phrases"}[scenario_data["source"]]
+        queue_wait = SCHEDULER.estimated_wait(SCENARIO)
+        queue_note = f" Gemini is busy, so that may take about {queue_wait:.0f}s." if queue_wait >= 1 else ""
+        st.markdown(f"<div style='font-size:0.8rem;color:#9ca3af;margin:0.6rem 0;'>⏳ Showing phrases from {shown_from} while your personalised kit is written — it swaps in as soon as it's ready.{queue_note}</div>", unsafe_allow_html=True)
+        job_poller(scenario_data["job"])
+    elif scenario_data.get("pending_dialogue"):
+        marked = len(st.session_state.confidence)
+        col_msg, col_btn = st.columns([3, 1])
+        with col_msg:
+            st.markdown(f"<div style='font-size:0.85rem;color:#f9fafb;margin:0.6rem 0;'>✨ Your personalised phrases are in, and a personalised dialogue is ready. Your {marked} mark{'s' if marked != 1 else ''} on the current dialogue will be saved to your learning profile when you switch.</div>", unsafe_allow_html=True)
+        with col_btn:
+            st.button("Switch dialogue", use_container_width=True, on_click=_switch_dialogue,
+                      args=(cache_key, primary_key, user_text, user_level_code))
+
     # Stats
     dialogue        = scenario_data["dialogue"]
     total_lines     = len(dialogue)
-    you_lines       = [l for l in dialogue if l["speaker"] == "You"]
-    reviewed        = len(st.session_state.confidence)
-    confident_count = sum(1 for v in st.session_state.confidence.values() if v == "✅")
-    readiness       = int((confident_count / len(you_lines)) * 100) if you_lines else 0
-    r_color         = "#FF9F1C" if readiness >= 70 else "#58CC02" if readiness >= 40 else "#e87c7c"
+    you_lines, reviewed, confident_count, readiness, r_color = readiness_stats(
+        dialogue, st.session_state.confidence)
 
     c1, c2, c3, c4 = st.columns(4)
     with c1:
@@ -685,50 +963,44 @@ if st.session_state.scenario_submitted and st.session_state.scenario_text.strip(
             corpus_freqs = get_corpus_frequencies(primary_key)
             top_words    = dict(list(corpus_freqs.items())[:12])
 
-            fig_corpus = go.Figure(go.Bar(
-                x=list(top_words.keys()),
-                y=list(top_words.values()),
-                marker=dict(
-                    color=list(top_words.values()),
-                    colorscale=[[0, '#1a2e1a'], [1, '#1CB0F6']],
-                    showscale=False,
-                    line=dict(color='#374151', width=1)
-                ),
-                hovertemplate='<b>%{x}</b><br>%{y} per 100k words<extra></extra>',
-            ))
-            fig_corpus.update_layout(
-                title=dict(text=f"Most frequent words in real '{SCENARIO_LABELS.get(primary_key,'').split(' ')[-1]}' conversations", font=dict(color='#9ca3af', size=12)),
-                paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='#f9fafb', family='DM Sans'),
-                xaxis=dict(showgrid=False, tickangle=-35, tickfont=dict(size=11)),
-                yaxis=dict(showgrid=True, gridcolor='#374151', showticklabels=True,
-                           title=dict(text='freq / 100k words', font=dict(size=10, color='#9ca3af'))),
-                margin=dict(l=10, r=10, t=50, b=70), height=280,
-            )
+            fig_corpus = corpus_figure(primary_key, top_words,
+                                       SCENARIO_LABELS.get(primary_key, '').split(' ')[-1])
             st.plotly_chart(fig_corpus, use_container_width=True)
 
+            # Collocations from the corpus index — real chunks, no LLM call
+            if get_collocations(primary_key, limit=1):
+                st.markdown("<div style='font-size:0.75rem;color:#9ca3af;text-transform:uppercase;letter-spacing:0.08em;margin:0.4rem 0;'>Common chunks in real conversations</div>", unsafe_allow_html=True)
+                head_word = st.selectbox("chunk_head", ["All words"] + list(top_words.keys()),
+                                         key="chunk_head", label_visibility="collapsed")
+                chunks = get_collocations(primary_key,
+                                          head=None if head_word == "All words" else head_word,
+                                          limit=10)
+                if chunks:
+                    chips = "".join([
+                        f'<span class="tag-detected" title="{c["count"]:,} occurrences · PMI {c["pmi"]:.1f}">{c["ngram"]}</span>'
+                        for c in chunks
+                    ])
+                    st.markdown(f"<div style='margin-bottom:1rem;'>{chips}</div>", unsafe_allow_html=True)
+                else:
+                    st.markdown(f"<div style='font-size:0.8rem;color:#6b7280;margin-bottom:1rem;'>No strong chunks found for “{head_word}”.</div>", unsafe_allow_html=True)
+
+            # Real subtitle lines for chart words and words in the generated phrases
+            phrase_words = [w for p in scenario_data["phrases"]
+                            for w in re.findall(r"[a-záéíóúüñ]{4,}", p["es"].lower())]
+            example_words = list(dict.fromkeys(list(top_words.keys()) + phrase_words))
+            if any(get_examples(primary_key, w, limit=1) for w in example_words):
+                with st.expander("🎬 See words used in real subtitles", expanded=False):
+                    ex_word  = st.selectbox("example_word", example_words, key="example_word",
+                                            label_visibility="collapsed")
+                    examples = get_examples(primary_key, ex_word, limit=3)
+                    if examples:
+                        for line in examples:
+                            st.markdown(f"<div class='dialogue-line'><div class='dialogue-spanish' style='font-size:0.92rem;'>{html.escape(line)}</div></div>", unsafe_allow_html=True)
+                    else:
+                        st.markdown(f"<div style='font-size:0.8rem;color:#6b7280;'>No corpus examples for “{html.escape(ex_word)}” yet.</div>", unsafe_allow_html=True)
+
             # Grammar pattern breakdown for this level
-            level_patterns = {
-                "A1": {"Present tense": 55, "Basic questions": 30, "Greetings": 15},
-                "A2": {"Present tense": 42, "Basic questions": 25, "Polite requests": 20, "Past tense": 13},
-                "B1": {"Present tense": 32, "Questions": 18, "Polite requests": 18, "Past tense": 15, "Conditional": 10, "Future": 7},
-            }
-            gp = level_patterns[user_level_code]
-            fig_g = go.Figure(go.Bar(
-                x=list(gp.values()), y=list(gp.keys()), orientation='h',
-                marker=dict(color=list(gp.values()), colorscale=[[0,'#374151'],[1,'#58CC02']], showscale=False),
-                text=[f"{v}%" for v in gp.values()], textposition='outside',
-                textfont=dict(color='#f9fafb', size=11),
-                hovertemplate='%{y}: %{x}%<extra></extra>',
-            ))
-            fig_g.update_layout(
-                title=dict(text=f"Grammar patterns you'll encounter at {user_level_code}", font=dict(color='#9ca3af', size=12)),
-                paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='#f9fafb', family='DM Sans'),
-                xaxis=dict(showgrid=False, showticklabels=False, range=[0, max(gp.values())*1.35]),
-                yaxis=dict(showgrid=False, tickfont=dict(size=11)),
-                margin=dict(l=0, r=50, t=50, b=10), height=220,
-            )
+            fig_g = grammar_figure(user_level_code)
             st.plotly_chart(fig_g, use_container_width=True)
 
         with col_r:
@@ -751,67 +1023,9 @@ if st.session_state.scenario_submitted and st.session_state.scenario_text.strip(
                 """, unsafe_allow_html=True)
 
     # ── TAB 2 ──────────────────────────────────
+    st.session_state.marks_at_full_run = dict(st.session_state.confidence)
     with tab2:
-        st.markdown("<div class='section-header'>Practice Dialogue</div>", unsafe_allow_html=True)
-        st.markdown(f"<div class='section-sub'>A real {user_level_code}-level conversation — mark your honest confidence on each line you'd need to say.</div>", unsafe_allow_html=True)
-
-        if reviewed > 0:
-            st.progress(reviewed / len(you_lines))
-            st.markdown(f"<div style='font-size:0.8rem;color:#9ca3af;margin-bottom:1rem;'>{reviewed} of {len(you_lines)} your lines reviewed — {confident_count} confident</div>", unsafe_allow_html=True)
-
-        col_d, col_c = st.columns([1.6, 1], gap="large")
-
-        with col_d:
-            you_idx = 0
-            for i, line in enumerate(dialogue):
-                is_you = line["speaker"] == "You"
-                bc = "#58CC02" if is_you else "#374151"
-                st.markdown(f"""
-                <div class='dialogue-line' style='border-left-color:{bc};'>
-                    <div class='dialogue-speaker'>{"🧑 You" if is_you else "💬 " + line["speaker"]}</div>
-                    <div class='dialogue-spanish'>{line["es"]}</div>
-                    <div class='dialogue-english'>{line["en"]}</div>
-                </div>
-                """, unsafe_allow_html=True)
-                if is_you:
-                    key = f"conf_{i}"
-                    current = st.session_state.confidence.get(key)
-                    cy, cn = st.columns(2)
-                    with cy:
-                        if st.button("✅ I know this", key=f"yes_{i}", use_container_width=True):
-                            st.session_state.confidence[key] = "✅"
-                    with cn:
-                        if st.button("❌ I'd struggle", key=f"no_{i}", use_container_width=True):
-                            st.session_state.confidence[key] = "❌"
-                    if current:
-                        cc = "#FF9F1C" if current == "✅" else "#e87c7c"
-                        label = "I know this ✅" if current == "✅" else "I'd struggle ❌"
-                        st.markdown(f"<div style='font-size:0.78rem;color:{cc};margin-bottom:0.5rem;padding-left:0.5rem;'>{label}</div>", unsafe_allow_html=True)
-                    you_idx += 1
-
-        with col_c:
-            st.markdown(f"""
-            <div style='background:#1f2937;border:1px solid #374151;border-radius:12px;padding:1.2rem;margin-bottom:1rem;'>
-                <div style='font-size:0.75rem;color:#9ca3af;text-transform:uppercase;letter-spacing:0.1em;margin-bottom:0.6rem;'>
-                    {user_level_code} Dialogue
-                </div>
-                <div style='font-size:0.85rem;color:#f9fafb;line-height:1.7;'>
-                    This dialogue is tailored to your <span style='color:{level_data["color"]};'>{user_level_code}</span> level —
-                    {"shorter and simpler for beginners." if user_level_code == "A1" else
-                     "a solid mid-length exchange." if user_level_code == "A2" else
-                     "the full, natural-speed conversation."}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-            st.markdown(f"""
-            <div class='readiness-container'>
-                <div class='readiness-label'>Conversation Readiness</div>
-                <div class='readiness-score' style='color:{r_color};'>{readiness}%</div>
-                <div style='font-size:0.85rem;color:#9ca3af;margin-top:0.5rem;'>
-                    {"🟢 You're ready!" if readiness >= 80 else "🟡 Getting there..." if readiness >= 50 else "🔴 Keep practicing"}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+        dialogue_review(dialogue, primary_key, user_text, user_level_code, level_data["color"])
 
     # TAB 3
     with tab3:
@@ -822,9 +1036,10 @@ if st.session_state.scenario_submitted and st.session_state.scenario_text.strip(
         struggled_lines   = [dialogue[i] for i in struggled_indices if i < len(dialogue)]
 
         if not st.session_state.confidence:
-            predicted     = get_predicted_readiness(primary_key, user_level_code)
+            prediction    = get_readiness_prediction(primary_key, user_level_code, lines=len(you_lines))
             session_count = get_session_count()
-            if predicted is not None:
+            if prediction is not None:
+                predicted  = prediction["readiness"]
                 pred_color = "#58CC02" if predicted >= 70 else "#FF9F1C" if predicted >= 40 else "#e87c7c"
                 pred_word  = "straightforward" if predicted >= 70 else "moderately challenging" if predicted >= 40 else "quite challenging"
                 st.markdown(f"""
@@ -836,6 +1051,7 @@ if st.session_state.scenario_submitted and st.session_state.scenario_text.strip(
                         <div>
                             <div style='font-size:3rem;font-weight:900;color:{pred_color};line-height:1;'>{predicted}%</div>
                             <div style='font-size:0.8rem;color:#9ca3af;'>Predicted readiness</div>
+                            <div style='font-size:0.72rem;color:#6b7280;'>likely {prediction["low"]}–{prediction["high"]}%</div>
                         </div>
                         <div style='flex:1;font-size:0.85rem;color:#f9fafb;line-height:1.6;'>
                             Based on your grammar history, we predict this scenario will be
@@ -856,28 +1072,29 @@ if st.session_state.scenario_submitted and st.session_state.scenario_text.strip(
 
         else:
             # Record session once per scenario+level combination
-            session_key = f"recorded_{hash(user_text)}_{user_level_code}"
-            if not st.session_state.get(session_key):
-                record_session(
-                    scenario          = primary_key,
-                    level             = user_level_code,
-                    confidence_map    = st.session_state.confidence,
-                    dialogue          = dialogue,
-                    phrase_pattern_fn = lambda es: next(
-                        (l.get("pattern", "present_simple") for l in dialogue if l["es"] == es),
-                        "present_simple"
-                    ),
-                )
-                st.session_state[session_key] = True
+            _record_review(primary_key, user_text, user_level_code, dialogue)
 
             strengths,   weaknesses   = get_strengths_and_weaknesses()
-            predicted                  = get_predicted_readiness(primary_key, user_level_code)
             session_count              = get_session_count()
             fallback_rec               = get_recommended_focus()
             profile                    = __import__("user_model")._load_profile()
-            with st.spinner("🤖 Generating personalised recommendation..."):
+            struggled_phrases          = [{"es": l["es"], "en": l["en"]} for l in struggled_lines]
+            rec_job                    = None
+            if struggled_phrases:
+                # Background job — the kit renders now, the recommendation fills in when it lands
+                st.session_state.prefetcher.claim(
+                    recommendation_key(user_text, user_level_code, struggled_phrases,
+                                       profile.get("pattern_stats", {})))
+                rec_job = submit_recommendation(user_text, primary_key, user_level_code,
+                                                struggled_phrases, profile.get("pattern_stats", {}))
+                if JOBS.status(rec_job) in (PENDING, RUNNING):
+                    recommendation = None
+                else:
+                    recommendation = JOBS.result(rec_job) or fallback_rec
+                    rec_job        = None
+            else:
                 recommendation = generate_smart_recommendation(
-                    struggled_phrases = [{"es": l["es"], "en": l["en"]} for l in struggled_lines],
+                    struggled_phrases = [],
                     pattern_stats     = profile.get("pattern_stats", {}),
                     scenario          = primary_key,
                     level_code        = user_level_code,
@@ -896,39 +1113,14 @@ if st.session_state.scenario_submitted and st.session_state.scenario_text.strip(
                     </div>
                 </div>
                 """, unsafe_allow_html=True)
-                fig_donut = go.Figure(go.Pie(
-                    values=[max(readiness, 1), max(100 - readiness, 1)],
-                    hole=0.72, marker=dict(colors=["#58CC02", "#1f2937"]),
-                    textinfo="none", hoverinfo="skip",
-                ))
-                fig_donut.add_annotation(text=f"{readiness}%", x=0.5, y=0.5,
-                    font=dict(size=28, color="#f9fafb", family="Nunito"), showarrow=False)
-                fig_donut.update_layout(paper_bgcolor="rgba(0,0,0,0)", showlegend=False,
-                    margin=dict(l=20, r=20, t=20, b=20), height=200)
+                fig_donut = readiness_donut(readiness)
                 st.plotly_chart(fig_donut, use_container_width=True)
 
             with col_model:
                 from user_model import get_pattern_performance
                 perf = get_pattern_performance()
                 if perf:
-                    labels = [v["label"] for v in perf.values()]
-                    rates  = [int(v["rate"] * 100) for v in perf.values()]
-                    colors = ["#58CC02" if r >= 70 else "#FF9F1C" if r >= 40 else "#e87c7c" for r in rates]
-                    fig_hist = go.Figure(go.Bar(
-                        x=rates, y=labels, orientation="h",
-                        marker=dict(color=colors),
-                        text=[f"{r}%" for r in rates], textposition="outside",
-                        textfont=dict(color="#f9fafb", size=11),
-                        hovertemplate="%{y}: %{x}%<extra></extra>",
-                    ))
-                    fig_hist.update_layout(
-                        title=dict(text="Grammar Pattern History", font=dict(color="#9ca3af", size=12)),
-                        paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)",
-                        font=dict(color="#f9fafb", family="Nunito"),
-                        xaxis=dict(showgrid=False, showticklabels=False, range=[0, 130]),
-                        yaxis=dict(showgrid=False, tickfont=dict(size=11)),
-                        margin=dict(l=0, r=50, t=40, b=10), height=240,
-                    )
+                    fig_hist = pattern_history_figure(get_profile_version(), perf)
                     st.plotly_chart(fig_hist, use_container_width=True)
                 else:
                     st.markdown(f"""
@@ -954,13 +1146,25 @@ if st.session_state.scenario_submitted and st.session_state.scenario_text.strip(
                     <div style='font-size:0.9rem;color:#f9fafb;line-height:1.6;'>{recommendation}</div>
                 </div>
                 """, unsafe_allow_html=True)
+            elif rec_job:
+                st.markdown("""
+                <div style='background:#1f2937;border:1px dashed #374151;border-radius:16px;
+                            padding:1.2rem 1.5rem;margin:1rem 0;'>
+                    <div style='font-size:0.72rem;color:#58CC02;text-transform:uppercase;
+                                letter-spacing:0.1em;font-weight:800;margin-bottom:0.5rem;'>
+                        🤖 Personalised Recommendation
+                    </div>
+                    <div style='font-size:0.9rem;color:#9ca3af;line-height:1.6;'>Writing your recommendation...</div>
+                </div>
+                """, unsafe_allow_html=True)
+                job_poller(rec_job)
 
             # Struggled phrases
             if struggled_lines:
                 st.markdown("<hr style='border-color:#374151;margin:1.2rem 0;'>", unsafe_allow_html=True)
                 st.markdown(f"<div style='font-size:1rem;font-weight:800;color:#f9fafb;margin-bottom:0.8rem;'>⚠️ {len(struggled_lines)} phrases to focus on</div>", unsafe_allow_html=True)
                 for line in struggled_lines:
-                    pattern = PATTERN_LABELS.get(line.get('pattern', 'present_simple'), 'Present tense')
+                    pattern = PATTERN_LABELS.get(tag(line["es"]), 'Present tense')
                     level_tag = line.get('level', 'A1')
                     st.markdown(f"""
                     <div class='kit-card' style='border-color:#e87c7c44;'>
@@ -1012,7 +1216,7 @@ if st.session_state.scenario_submitted and st.session_state.scenario_text.strip(
             if struggled_lines:
                 kit_text += "FOCUS PHRASES (you struggled with these):\n"
                 for line in struggled_lines:
-                    kit_text += f"  ES: {line['es']}\n  EN: {line['en']}\n  Pattern: {PATTERN_LABELS.get(line.get('pattern', 'present_simple'), 'Present tense')}\n\n"
+                    kit_text += f"  ES: {line['es']}\n  EN: {line['en']}\n  Pattern: {PATTERN_LABELS.get(tag(line['es']), 'Present tense')}\n\n"
                 kit_text += "\nALL PHRASES:\n"
             for p in scenario_data["phrases"]:
                 plevel   = p.get('level', 'A1')
@@ -1029,164 +1233,12 @@ if st.session_state.scenario_submitted and st.session_state.scenario_text.strip(
 
     # ── TAB 4 ──────────────────────────────────
     with tab4:
+        conversation_practice(primary_key, user_text, user_level_code)
 
-        # Build system prompt once per scenario
-        if not st.session_state.conv_system_prompt:
-            _, weaknesses = get_strengths_and_weaknesses()
-            st.session_state.conv_system_prompt = build_conversation_system_prompt(
-                scenario_category = primary_key,
-                user_scenario     = user_text,
-                level_code        = user_level_code,
-                weak_patterns     = weaknesses,
-            )
-
-        role_name = {
-            "restaurant": "Waiter", "transport": "Driver", "shopping": "Shop Assistant",
-            "hotel": "Receptionist", "health": "Doctor", "work": "Colleague",
-            "social": "Friend", "housing": "Landlord", "general": "Local",
-        }.get(primary_key, "Local")
-
-        # Header
-        st.markdown(f"""
-        <div style='background:linear-gradient(135deg,#1f2937,#111827);border:1px solid #374151;
-                    border-radius:16px;padding:1.2rem 1.5rem;margin-bottom:1.2rem;'>
-            <div style='font-size:0.75rem;color:#58CC02;text-transform:uppercase;
-                        letter-spacing:0.1em;font-weight:800;margin-bottom:0.3rem;'>
-                💬 Live Conversation Practice
-            </div>
-            <div style='color:#f9fafb;font-size:0.95rem;line-height:1.6;'>
-                You're speaking with a <strong>{role_name}</strong> in Spain.
-                Type in <strong>Spanish only</strong> — the {role_name} will respond in Spanish
-                with an English translation. When you're done, click <em>Finish & Get Feedback</em>.
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-
-        # Show conversation feedback if available
-        if st.session_state.conversation_feedback:
-            fb = st.session_state.conversation_feedback
-            score     = fb.get("score", 0)
-            s_color   = "#58CC02" if score >= 70 else "#FF9F1C" if score >= 40 else "#EF4444"
-
-            st.markdown(f"""
-            <div style='background:#1f2937;border:2px solid {s_color};border-radius:16px;
-                        padding:1.5rem;margin-bottom:1.5rem;'>
-                <div style='font-size:0.75rem;color:{s_color};text-transform:uppercase;
-                            letter-spacing:0.1em;font-weight:800;margin-bottom:0.8rem;'>
-                    🏆 Conversation Report
-                </div>
-                <div style='display:flex;align-items:center;gap:1.5rem;margin-bottom:1rem;'>
-                    <div style='font-size:3rem;font-weight:900;color:{s_color};font-family:Nunito,sans-serif;'>
-                        {score}
-                    </div>
-                    <div style='color:#f9fafb;font-size:0.95rem;line-height:1.6;'>
-                        {fb.get("summary", "")}
-                    </div>
-                </div>
-                <div style='display:grid;grid-template-columns:1fr 1fr;gap:1rem;margin-bottom:1rem;'>
-                    <div style='background:#111827;border-radius:10px;padding:0.8rem;'>
-                        <div style='color:#58CC02;font-size:0.75rem;font-weight:800;
-                                    text-transform:uppercase;margin-bottom:0.5rem;'>✅ Strengths</div>
-                        {"".join([f"<div style='color:#d1fae5;font-size:0.85rem;margin-bottom:0.3rem;'>• {s}</div>" for s in fb.get("strengths", [])])}
-                    </div>
-                    <div style='background:#111827;border-radius:10px;padding:0.8rem;'>
-                        <div style='color:#FF9F1C;font-size:0.75rem;font-weight:800;
-                                    text-transform:uppercase;margin-bottom:0.5rem;'>⚠️ To Improve</div>
-                        {"".join([f"<div style='color:#fef3c7;font-size:0.85rem;margin-bottom:0.3rem;'>• {i}</div>" for i in fb.get("improvements", [])])}
-                    </div>
-                </div>
-                <div style='background:#111827;border-radius:10px;padding:0.8rem;'>
-                    <div style='color:#1CB0F6;font-size:0.75rem;font-weight:800;
-                                text-transform:uppercase;margin-bottom:0.4rem;'>🎯 Next Focus</div>
-                    <div style='color:#bfdbfe;font-size:0.85rem;'>{fb.get("next_focus", "")}</div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-
-            if st.button("🔄 Start New Conversation", use_container_width=True, key="reset_conv"):
-                st.session_state.chat_history = []
-                st.session_state.conversation_feedback = None
-                st.rerun()
-
-        else:
-            # Chat history display
-            if not st.session_state.chat_history:
-                st.markdown("""
-                <div style='text-align:center;padding:2rem;color:#6b7280;font-size:0.9rem;'>
-                    Start the conversation by typing your first message in Spanish below 👇
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                for msg in st.session_state.chat_history:
-                    if msg["role"] == "user":
-                        st.markdown(f"""
-                        <div style='display:flex;justify-content:flex-end;margin-bottom:0.8rem;'>
-                            <div style='background:#1d4ed8;color:#f9fafb;border-radius:16px 16px 4px 16px;
-                                        padding:0.8rem 1.1rem;max-width:75%;font-size:0.9rem;line-height:1.5;'>
-                                {msg["content"]}
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    else:
-                        # Parse stored response
-                        try:
-                            resp = json.loads(msg["content"])
-                            spanish = resp.get("spanish", msg["content"])
-                            english = resp.get("english", "")
-                        except Exception:
-                            spanish = msg["content"]
-                            english = ""
-                        st.markdown(f"""
-                        <div style='display:flex;justify-content:flex-start;margin-bottom:0.8rem;'>
-                            <div style='background:#1f2937;border:1px solid #374151;color:#f9fafb;
-                                        border-radius:16px 16px 16px 4px;padding:0.8rem 1.1rem;
-                                        max-width:75%;font-size:0.9rem;line-height:1.5;'>
-                                <div style='font-weight:700;margin-bottom:0.3rem;'>{spanish}</div>
-                                <div style='color:#9ca3af;font-size:0.8rem;font-style:italic;'>{english}</div>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-
-            # Input area
-            user_chat_input = st.text_input(
-                "Your message (in Spanish)",
-                placeholder="Escribe en español...",
-                key="chat_input",
-                label_visibility="collapsed",
-            )
-
-            col_send, col_finish = st.columns([3, 2])
-            with col_send:
-                if st.button("📤 Send", use_container_width=True, key="send_msg"):
-                    if user_chat_input.strip():
-                        with st.spinner("💬 Responding..."):
-                            response = chat_with_local(
-                                chat_history  = st.session_state.chat_history,
-                                user_message  = user_chat_input.strip(),
-                                system_prompt = st.session_state.conv_system_prompt,
-                            )
-                        st.session_state.chat_history.append(
-                            {"role": "user", "content": user_chat_input.strip()})
-                        st.session_state.chat_history.append(
-                            {"role": "assistant", "content": json.dumps(response)})
-                        st.rerun()
-
-            with col_finish:
-                if st.button("🏁 Finish & Get Feedback", use_container_width=True, key="finish_conv"):
-                    if len(st.session_state.chat_history) >= 2:
-                        _, weaknesses = get_strengths_and_weaknesses()
-                        with st.spinner("🤖 Analysing your conversation..."):
-                            feedback = generate_conversation_feedback(
-                                chat_history  = st.session_state.chat_history,
-                                scenario      = user_text,
-                                level_code    = user_level_code,
-                                weak_patterns = weaknesses,
-                            )
-                        if feedback:
-                            st.session_state.conversation_feedback = feedback
-                            st.rerun()
-                    else:
-                        st.warning("Have at least one exchange before getting feedback.")
+    # Results rendered — time to first meaningful paint, and to personalised content if it was at hand
+    _mark_render_time(cache_key, "first_paint")
+    if scenario_data["source"] in ("store", "job"):
+        _mark_render_time(cache_key, "personalised")
 
 else:
     st.markdown("""
@@ -1199,3 +1251,46 @@ else:
         </div>
     </div>
     """, unsafe_allow_html=True)
+
+# ─────────────────────────────────────────────
+#  DEBUG PANEL (?debug=1)
+# ─────────────────────────────────────────────
+if st.query_params.get("debug"):
+    fig_run   = rerun_stats()
+    fig_total = cache_stats()
+    with st.sidebar.expander("⏱️ Render stats", expanded=True):
+        st.markdown(f"""
+        <div style='font-size:0.72rem;color:#9ca3af;line-height:1.7;'>
+            Script run: <span style='color:#f9fafb;'>{(time.perf_counter() - _run_started) * 1000:.0f} ms</span><br>
+            Figures this run: {fig_run["hits"]} cached · {fig_run["misses"]} built ({fig_run["build_ms"]:.0f} ms)<br>
+            Saved by figure cache: <span style='color:#58CC02;'>{fig_run["saved_ms"]:.0f} ms</span><br>
+            Figure cache: {fig_total["entries"]} entries · {fig_total["hits"]} hits · {fig_total["misses"]} misses
+        </div>
+        """, unsafe_allow_html=True)
+        run_times = st.session_state.get("run_times_ms", {})
+        if run_times:
+            rows = "".join([f"{name}: {ms:.0f} ms<br>" for name, ms in run_times.items()])
+            st.markdown(f"<div style='font-size:0.72rem;color:#9ca3af;line-height:1.7;margin-top:0.4rem;'>Last fragment runs:<br>{rows}</div>", unsafe_allow_html=True)
+        pf = st.session_state.prefetcher.stats
+        st.markdown(f"<div style='font-size:0.72rem;color:#9ca3af;line-height:1.7;margin-top:0.4rem;'>Prefetch: {pf['scheduled']} started · {pf['adopted']} adopted · {pf['hits']} used · {pf['wasted']} wasted · {pf['released']} released</div>", unsafe_allow_html=True)
+        timing = st.session_state.render_timing
+        if timing.get("key"):
+            personalised = f"{timing['personalised']:.1f} s" if timing.get("personalised") is not None else "pending"
+            st.markdown(f"<div style='font-size:0.72rem;color:#9ca3af;line-height:1.7;margin-top:0.4rem;'>Last scenario ({timing['source']}): first paint {(timing.get('first_paint') or 0) * 1000:.0f} ms · personalised {personalised}</div>", unsafe_allow_html=True)
+        ui_rows = ui_timing_summary()
+        if ui_rows:
+            rows = "".join([f"{r['stage']} · {r['source']}: {r['count']} · p50 {r['p50']:.2f}s · p95 {r['p95']:.2f}s<br>"
+                            for r in ui_rows])
+            st.markdown(f"<div style='font-size:0.72rem;color:#9ca3af;line-height:1.7;margin-top:0.4rem;'>Results timing:<br>{rows}</div>", unsafe_allow_html=True)
+        queue = SCHEDULER.status()
+        rows  = "".join([f"{name}: {queue['queued'][name]} queued · next wait {queue['wait'][name]:.1f}s<br>"
+                         for name in queue["queued"]])
+        st.markdown(f"<div style='font-size:0.72rem;color:#9ca3af;line-height:1.7;margin-top:0.4rem;'>Gemini quota queue:<br>{rows}</div>", unsafe_allow_html=True)
+        memory = memory_report(st.session_state)
+        rows   = "".join([f"{key}: {size / 1024:.1f} KB<br>" for key, size in memory["keys"][:6]])
+        st.markdown(f"<div style='font-size:0.72rem;color:#9ca3af;line-height:1.7;margin-top:0.4rem;'>Session memory: {memory['total'] / 1024:.0f} KB · {memory['scenarios']}/{memory['budget']} scenarios held<br>{rows}</div>", unsafe_allow_html=True)
+        llm_rows = latency_summary()
+        if llm_rows:
+            rows = "".join([f"{r['function']}: {r['count']} calls · p50 {r['p50']:.1f}s · p95 {r['p95']:.1f}s<br>"
+                            for r in llm_rows])
+            st.markdown(f"<div style='font-size:0.72rem;color:#9ca3af;line-height:1.7;margin-top:0.4rem;'>Gemini latency:<br>{rows}</div>", unsafe_allow_html=True)
@@ -0,0 +1,245 @@
+"""
+charts.py
+─────────
+Plotly figures for ConvoReady, cached by their real inputs.
+
+Streamlit reruns the whole script on every interaction, so without a cache
+each "✅ I know this" click rebuilds and re-validates every figure even
+though none of their inputs changed. Figures here are built once per key
+and shared across reruns and sessions (process-wide LRU):
+
+  corpus chart     → primary scenario
+  grammar chart    → level
+  dashboard charts → profile version (+ chart filters)
+  readiness donut  → readiness %
+
+Per-rerun instrumentation (hits, misses, build time, time saved) is kept
+per script thread and shown in the debug panel (?debug=1).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import plotly.graph_objects as go
+
+# Grammar pattern mix per level (share of lines, %)
+LEVEL_PATTERN_MIX = {
+    "A1": {"Present tense": 55, "Basic questions": 30, "Greetings": 15},
+    "A2": {"Present tense": 42, "Basic questions": 25, "Polite requests": 20, "Past tense": 13},
+    "B1": {"Present tense": 32, "Questions": 18, "Polite requests": 18, "Past tense": 15, "Conditional": 10, "Future": 7},
+}
+
+# ── Figure cache ─────────────────────────────────────────────────────────────
+
+class FigureCache:
+    """Thread-safe LRU of built figures, remembering how long each took to build."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries    = OrderedDict()   # key -> (figure, build_seconds)
+        self._lock       = threading.Lock()
+        self.hits        = 0
+        self.misses      = 0
+
+    def get(self, key, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            _note(hit=True, seconds=entry[1])
+            return entry[0]
+
+        start   = time.perf_counter()
+        figure  = build()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._entries[key] = (figure, elapsed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.misses += 1
+        _note(hit=False, seconds=elapsed)
+        return figure
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_cache = FigureCache()
+
+# Streamlit runs each session's script in its own thread, so thread-local
+# counters give per-rerun numbers without mixing sessions.
+_rerun = threading.local()
+
+
+def _note(hit: bool, seconds: float):
+    stats = getattr(_rerun, "stats", None)
+    if stats is None:
+        stats = _rerun.stats = _empty_stats()
+    if hit:
+        stats["hits"]     += 1
+        stats["saved_ms"] += seconds * 1000
+    else:
+        stats["misses"]   += 1
+        stats["build_ms"] += seconds * 1000
+
+
+def _empty_stats() -> dict:
+    return {"hits": 0, "misses": 0, "build_ms": 0.0, "saved_ms": 0.0}
+
+
+def reset_rerun_stats():
+    """Call at the top of each script run."""
+    _rerun.stats = _empty_stats()
+
+
+def rerun_stats() -> dict:
+    """Figure cache activity for the current script run."""
+    return dict(getattr(_rerun, "stats", None) or _empty_stats())
+
+
+def cache_stats() -> dict:
+    """Process-wide figure cache counters."""
+    return {"entries": len(_cache), "hits": _cache.hits, "misses": _cache.misses}
+
+
+# ── Tab 1 ────────────────────────────────────────────────────────────────────
+
+def corpus_figure(primary_key: str, top_words: dict, scenario_label: str) -> go.Figure:
+    def build():
+        fig = go.Figure(go.Bar(
+            x=list(top_words.keys()),
+            y=list(top_words.values()),
+            marker=dict(
+                color=list(top_words.values()),
+                colorscale=[[0, '#1a2e1a'], [1, '#1CB0F6']],
+                showscale=False,
+                line=dict(color='#374151', width=1)
+            ),
+            hovertemplate='<b>%{x}</b><br>%{y} per 100k words<extra></extra>',
+        ))
+        fig.update_layout(
+            title=dict(text=f"Most frequent words in real '{scenario_label}' conversations", font=dict(color='#9ca3af', size=12)),
+            paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#f9fafb', family='DM Sans'),
+            xaxis=dict(showgrid=False, tickangle=-35, tickfont=dict(size=11)),
+            yaxis=dict(showgrid=True, gridcolor='#374151', showticklabels=True,
+                       title=dict(text='freq / 100k words', font=dict(size=10, color='#9ca3af'))),
+            margin=dict(l=10, r=10, t=50, b=70), height=280,
+        )
+        return fig
+    return _cache.get(("corpus", primary_key), build)
+
+
+def grammar_figure(level_code: str) -> go.Figure:
+    def build():
+        gp = LEVEL_PATTERN_MIX[level_code]
+        fig = go.Figure(go.Bar(
+            x=list(gp.values()), y=list(gp.keys()), orientation='h',
+            marker=dict(color=list(gp.values()), colorscale=[[0,'#374151'],[1,'#58CC02']], showscale=False),
+            text=[f"{v}%" for v in gp.values()], textposition='outside',
+            textfont=dict(color='#f9fafb', size=11),
+            hovertemplate='%{y}: %{x}%<extra></extra>',
+        ))
+        fig.update_layout(
+            title=dict(text=f"Grammar patterns you'll encounter at {level_code}", font=dict(color='#9ca3af', size=12)),
+            paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#f9fafb', family='DM Sans'),
+            xaxis=dict(showgrid=False, showticklabels=False, range=[0, max(gp.values())*1.35]),
+            yaxis=dict(showgrid=False, tickfont=dict(size=11)),
+            margin=dict(l=0, r=50, t=50, b=10), height=220,
+        )
+        return fig
+    return _cache.get(("grammar", level_code), build)
+
+
+# ── Tab 3 ────────────────────────────────────────────────────────────────────
+
+def readiness_donut(readiness: int) -> go.Figure:
+    def build():
+        fig = go.Figure(go.Pie(
+            values=[max(readiness, 1), max(100 - readiness, 1)],
+            hole=0.72, marker=dict(colors=["#58CC02", "#1f2937"]),
+            textinfo="none", hoverinfo="skip",
+        ))
+        fig.add_annotation(text=f"{readiness}%", x=0.5, y=0.5,
+            font=dict(size=28, color="#f9fafb", family="Nunito"), showarrow=False)
+        fig.update_layout(paper_bgcolor="rgba(0,0,0,0)", showlegend=False,
+            margin=dict(l=20, r=20, t=20, b=20), height=200)
+        return fig
+    return _cache.get(("donut", readiness), build)
+
+
+def pattern_history_figure(profile_version: str, perf: dict) -> go.Figure:
+    def build():
+        labels = [v["label"] for v in perf.values()]
+        rates  = [int(v["rate"] * 100) for v in perf.values()]
+        colors = ["#58CC02" if r >= 70 else "#FF9F1C" if r >= 40 else "#e87c7c" for r in rates]
+        fig = go.Figure(go.Bar(
+            x=rates, y=labels, orientation="h",
+            marker=dict(color=colors),
+            text=[f"{r}%" for r in rates], textposition="outside",
+            textfont=dict(color="#f9fafb", size=11),
+            hovertemplate="%{y}: %{x}%<extra></extra>",
+        ))
+        fig.update_layout(
+            title=dict(text="Grammar Pattern History", font=dict(color="#9ca3af", size=12)),
+            paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)",
+            font=dict(color="#f9fafb", family="Nunito"),
+            xaxis=dict(showgrid=False, showticklabels=False, range=[0, 130]),
+            yaxis=dict(showgrid=False, tickfont=dict(size=11)),
+            margin=dict(l=0, r=50, t=40, b=10), height=240,
+        )
+        return fig
+    return _cache.get(("pattern_history", profile_version), build)
+
+
+# ── Sidebar dashboard ────────────────────────────────────────────────────────
+
+def readiness_line_figure(key: tuple, series: dict) -> go.Figure:
+    """Readiness over time from a timeseries.py series; `key` identifies the profile version and filters."""
+    def build():
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=series["x"],
+            y=series["y"],
+            customdata=series["d"],
+            mode="lines+markers" if len(series["x"]) <= 30 else "lines",
+            line=dict(color="#58CC02", width=2),
+            marker=dict(size=6, color="#58CC02"),
+            hovertemplate="Session %{x} · %{customdata}<br>%{y}% ready<br>" +
+                          "<extra></extra>",
+        ))
+        fig.update_layout(
+            height=140, margin=dict(l=0, r=0, t=4, b=0),
+            paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)",
+            xaxis=dict(showgrid=False, color="#6b7280", tickfont=dict(size=9)),
+            yaxis=dict(showgrid=True, gridcolor="#374151", color="#6b7280",
+                       tickfont=dict(size=9), range=[0, 105]),
+            showlegend=False,
+        )
+        return fig
+    return _cache.get(("readiness_line",) + tuple(key), build)
+
+
+def scenario_bar_figure(profile_version: str, sc_labels: list, sc_counts: list) -> go.Figure:
+    def build():
+        fig = go.Figure()
+        fig.add_trace(go.Bar(
+            x=sc_labels, y=sc_counts,
+            marker_color="#1CB0F6",
+            hovertemplate="%{x}<br>%{y} session(s)<extra></extra>",
+        ))
+        fig.update_layout(
+            height=130, margin=dict(l=0, r=0, t=4, b=0),
+            paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)",
+            xaxis=dict(showgrid=False, color="#6b7280", tickfont=dict(size=9)),
+            yaxis=dict(showgrid=True, gridcolor="#374151", color="#6b7280",
+                       tickfont=dict(size=9)),
+            showlegend=False,
+        )
+        return fig
+    return _cache.get(("scenario_bar", profile_version), build)
@@ -0,0 +1,75 @@
+"""
+chat_history.py
+───────────────
+Structured conversation history for the Conversation Practice tab.
+
+Each turn is parsed and rendered exactly once, when it is appended:
+
+    {"role": "user",      "es": "Quiero una mesa", "en": "",                  "html": "<div ..."}
+    {"role": "assistant", "es": "¡Claro! ...",      "en": "Of course! ...",    "html": "<div ..."}
+
+Reruns only join the cached HTML of the visible window, so rendering cost
+per turn stays constant however long the conversation gets. The prompt
+builders in llm_generator.py read the same turn dicts.
+"""
+
+import html
+import json
+
+# Turns shown by default; older turns are paged in on request
+CHAT_WINDOW = 20
+
+_USER_BUBBLE = (
+    "<div style='display:flex;justify-content:flex-end;margin-bottom:0.8rem;'>"
+    "<div style='background:#1d4ed8;color:#f9fafb;border-radius:16px 16px 4px 16px;"
+    "padding:0.8rem 1.1rem;max-width:75%;font-size:0.9rem;line-height:1.5;'>"
+    "{es}</div></div>"
+)
+
+_ASSISTANT_BUBBLE = (
+    "<div style='display:flex;justify-content:flex-start;margin-bottom:0.8rem;'>"
+    "<div style='background:#1f2937;border:1px solid #374151;color:#f9fafb;"
+    "border-radius:16px 16px 16px 4px;padding:0.8rem 1.1rem;"
+    "max-width:75%;font-size:0.9rem;line-height:1.5;'>"
+    "<div style='font-weight:700;margin-bottom:0.3rem;'>{es}</div>"
+    "<div style='color:#9ca3af;font-size:0.8rem;font-style:italic;'>{en}</div>"
+    "</div></div>"
+)
+
+
+def user_turn(message: str) -> dict:
+    return {
+        "role": "user",
+        "es":   message,
+        "en":   "",
+        "html": _USER_BUBBLE.format(es=html.escape(message)),
+    }
+
+
+def assistant_turn(response: dict) -> dict:
+    """Build a turn from a chat_with_local() response ({"spanish", "english"})."""
+    es = response.get("spanish", "")
+    en = response.get("english", "")
+    return {
+        "role": "assistant",
+        "es":   es,
+        "en":   en,
+        "html": _ASSISTANT_BUBBLE.format(es=html.escape(es), en=html.escape(en)),
+    }
+
+
+def model_text(turn: dict) -> str:
+    """The text Gemini sees for this turn — assistant turns in the JSON shape it was asked for."""
+    if turn["role"] == "user":
+        return turn["es"]
+    return json.dumps({"spanish": turn["es"], "english": turn["en"]}, ensure_ascii=False)
+
+
+def transcript_line(turn: dict) -> str:
+    return f"{'User' if turn['role'] == 'user' else 'AI'}: {turn['es']}"
+
+
+def visible_window(history: list, window: int = CHAT_WINDOW):
+    """Return (number of hidden earlier turns, HTML for the newest `window` turns)."""
+    hidden = max(0, len(history) - window)
+    return hidden, "".join(turn["html"] for turn in history[hidden:])
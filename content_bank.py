@@ -0,0 +1,269 @@
+"""
+content_bank.py
+───────────────
+Offline bank of pre-generated phrases and dialogues.
+
+Covers every scenario category × level × common sub-situation (SITUATIONS),
+so the app has real, level-appropriate content to show when Gemini is slow
+or unavailable, instead of the one-phrase emergency fallback.
+
+The bank is a small SQLite file (one zlib-compressed JSON blob per entry,
+keyed by category, level and situation) loaded into memory at startup.
+closest_entry() picks the entry whose situation best matches the user's
+scenario text — same category and level first, then neighbouring levels,
+then "general" — in well under a millisecond.
+
+Build or top up the bank (needs a Gemini key; resumes where it left off):
+
+    python content_bank.py --out content_bank.sqlite --concurrency 4 --rpm 30
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+BANK_PATH = os.environ.get(
+    "CONVOREADY_CONTENT_BANK",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "content_bank.sqlite"),
+)
+
+LEVELS = ["A1", "A2", "B1"]
+
+# Common sub-situations per category, phrased like user input. The first
+# one is the most generic and wins ties.
+SITUATIONS = {
+    "restaurant": [
+        "Ordering a meal at a restaurant",
+        "Booking a table by phone for tonight",
+        "Asking for the bill and paying by card",
+        "Explaining a food allergy to the waiter",
+        "Complaining that my order is wrong or cold",
+        "Ordering tapas and drinks at a bar",
+    ],
+    "transport": [
+        "Taking a taxi from the airport to the hotel",
+        "Buying a train ticket at the station",
+        "Asking for directions to the metro",
+        "My flight is delayed and I missed my connection",
+        "Renting a car and asking about insurance",
+        "Asking the bus driver which stop to get off",
+    ],
+    "shopping": [
+        "Buying clothes and asking about sizes",
+        "Returning a faulty item and asking for a refund",
+        "Shopping for food at the market",
+        "Asking for a discount or the price of something",
+        "Buying a SIM card at a phone shop",
+        "Looking for a gift in a shop",
+    ],
+    "hotel": [
+        "Checking in at a hotel with a reservation",
+        "Complaining about a noisy or dirty room",
+        "Asking about breakfast times and wifi",
+        "Checking out and paying the hotel bill",
+        "Booking a room for several nights",
+        "Asking reception to recommend places nearby",
+    ],
+    "health": [
+        "Feeling sick and asking for medicine at a pharmacy",
+        "Making an appointment with a doctor",
+        "Describing symptoms to a doctor",
+        "Going to the emergency room after an accident",
+        "Picking up a prescription",
+        "Seeing a dentist because of toothache",
+    ],
+    "work": [
+        "Job interview at a Spanish company",
+        "Introducing myself to new colleagues",
+        "Discussing a project deadline in a meeting",
+        "Asking my manager for a day off",
+        "Calling a client to arrange a meeting",
+        "Negotiating salary and working hours",
+    ],
+    "social": [
+        "Meeting new people at a party",
+        "First date at a tapas bar",
+        "Making plans with friends for the weekend",
+        "Talking about hobbies and free time",
+        "Inviting a neighbour for dinner",
+        "Apologising for arriving late",
+    ],
+    "housing": [
+        "Complaining to the landlord about a broken heater",
+        "Viewing a flat to rent",
+        "Asking about the deposit and the contract",
+        "Reporting a leak to the landlord",
+        "Talking to a neighbour about noise",
+        "Setting up internet and utilities in a new flat",
+    ],
+    "general": [
+        "Asking a stranger for help",
+        "Asking for directions in the street",
+        "Introducing myself and where I am from",
+        "Saying I don't understand and asking to repeat",
+        "Making small talk about the weather",
+        "Asking someone to recommend something",
+    ],
+}
+
+_STOPWORDS = {"a", "an", "the", "to", "at", "in", "on", "of", "for", "and", "or", "my", "me", "i",
+              "is", "it", "with", "about", "by", "from", "some", "something", "someone", "asking",
+              "need", "want", "going", "how", "can", "would", "like", "tonight", "today"}
+
+
+def _terms(text: str) -> set:
+    words = re.findall(r"[a-záéíóúñ]{3,}", text.lower())
+    return {re.sub(r"(ing|ed|es|s)$", "", w) if len(w) > 4 else w
+            for w in words if w not in _STOPWORDS}
+
+
+def _similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / math.sqrt(len(a) * len(b))
+
+
+# ── Bank ─────────────────────────────────────────────────────────────────────
+
+class ContentBank:
+    """Read-only, in-memory view of the bank file. Empty if it hasn't been built."""
+
+    def __init__(self, path: str = BANK_PATH):
+        self.path     = path
+        self._entries = {}     # (category, level) -> [(situation, terms, blob)]
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            rows = conn.execute("SELECT category, level, situation, content FROM entries").fetchall()
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning("Could not load content bank %s: %s", self.path, e)
+            return
+        for category, level, situation, blob in rows:
+            self._entries.setdefault((category, level), []).append(
+                (situation, _terms(situation), blob))
+        order = {s: i for situations in SITUATIONS.values() for i, s in enumerate(situations)}
+        for entries in self._entries.values():
+            entries.sort(key=lambda e: order.get(e[0], len(order)))
+
+    def __len__(self):
+        return sum(len(v) for v in self._entries.values())
+
+    def closest(self, text: str, category: str, level: str):
+        """Best-matching entry as {"phrases", "dialogue", "primary_key", "situation", "level"}, or None."""
+        terms = _terms(text)
+        pos   = LEVELS.index(level) if level in LEVELS else 0
+        order = sorted(LEVELS, key=lambda l: abs(LEVELS.index(l) - pos))
+        for cat in dict.fromkeys([category, "general"]):
+            for lvl in order:
+                entries = self._entries.get((cat, lvl))
+                if not entries:
+                    continue
+                situation, _, blob = max(entries, key=lambda e: _similarity(terms, e[1]))
+                data = json.loads(zlib.decompress(blob))
+                return {"phrases": data["phrases"], "dialogue": data["dialogue"],
+                        "primary_key": category, "situation": situation, "level": lvl}
+        return None
+
+
+BANK = ContentBank()
+
+
+def closest_entry(text: str, category: str, level: str):
+    """Closest pre-generated content for a scenario — see ContentBank.closest."""
+    return BANK.closest(text, category, level)
+
+
+# ── Batch generator ──────────────────────────────────────────────────────────
+
+def _open_for_write(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                        category  TEXT NOT NULL,
+                        level     TEXT NOT NULL,
+                        situation TEXT NOT NULL,
+                        content   BLOB NOT NULL,
+                        PRIMARY KEY (category, level, situation)
+                    ) WITHOUT ROWID""")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    return conn
+
+
+def build(out: str, categories: list, levels: list, concurrency: int, rpm: float,
+          force: bool = False) -> dict:
+    """Generate every missing (category, level, situation) entry into `out`."""
+    from llm_generator import generate_scenario_content
+    from warmup import Throttle
+
+    conn = _open_for_write(out)
+    done = set() if force else set(conn.execute("SELECT category, level, situation FROM entries"))
+    jobs = [(c, l, s) for c in categories for s in SITUATIONS[c] for l in levels
+            if (c, l, s) not in done]
+    print(f"{len(jobs)} entries to generate ({len(done)} already in {out})")
+
+    throttle = Throttle(60.0 / rpm)
+    stats    = {"generated": 0, "failed": 0}
+
+    def work(job):
+        category, level, situation = job
+        throttle.wait()
+        return job, generate_scenario_content(situation, category, level)
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(work, job) for job in jobs]
+        for i, future in enumerate(as_completed(futures), 1):
+            try:
+                (category, level, situation), data = future.result()
+            except Exception as e:
+                logger.warning("Generation failed: %s", e)
+                data = None
+            if not data:
+                stats["failed"] += 1
+                continue
+            blob = zlib.compress(json.dumps({"phrases": data["phrases"], "dialogue": data["dialogue"]},
+                                            ensure_ascii=False).encode(), 9)
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                         (category, level, situation, blob))
+            conn.commit()
+            stats["generated"] += 1
+            print(f"  [{i}/{len(jobs)}] {category} {level} — {situation}")
+
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('built', ?)", (time.strftime("%Y-%m-%dT%H:%M:%S"),))
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    print(f"Done in {time.time() - started:.0f}s: {stats['generated']} generated, "
+          f"{stats['failed']} failed; {os.path.getsize(out) / 1024:.0f} KB")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the offline ConvoReady content bank.")
+    parser.add_argument("--out", default=BANK_PATH, help="bank file to create or top up")
+    parser.add_argument("--categories", nargs="+", default=list(SITUATIONS), choices=list(SITUATIONS))
+    parser.add_argument("--levels", nargs="+", default=LEVELS, choices=LEVELS)
+    parser.add_argument("--concurrency", type=int, default=4, help="generations in flight at once")
+    parser.add_argument("--rpm", type=float, default=30.0, help="max generation starts per minute")
+    parser.add_argument("--force", action="store_true", help="regenerate entries already in the bank")
+    args = parser.parse_args(argv)
+    stats = build(args.out, args.categories, args.levels, args.concurrency, args.rpm, args.force)
+    return 0 if stats["generated"] or not stats["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+content_store.py
+────────────────
+Process-wide store of generated scenario content, shared by all sessions.
+
+Keyed by (normalised scenario text, level), holding the same dict that
+app.build_scenario_data() returns: {"phrases", "dialogue", "primary_key"}.
+Only personalised (non-fallback) content is stored; closest() finds the
+stored scenario most similar to a new one, to show while that one is
+generated. The store is an LRU
+bounded to MAX_ENTRIES and persisted to a local JSON file, so a restart
+keeps what has already been generated. Writes are batched: put() only
+marks the store dirty and a background timer saves it SAVE_DELAY later,
+so a burst of puts (warm-up, prefetch) costs one file write and no caller
+waits on the disk. Anything still unsaved is written at exit.
+
+It also counts how often each scenario is requested, with exponential
+decay, so the warm-up job can rank "popular recent" scenarios.
+"""
+
+import atexit
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+STORE_PATH     = os.environ.get("CONVOREADY_CONTENT_STORE", os.path.join(".convoready", "content_store.json"))
+MAX_ENTRIES    = 500
+MAX_TRACKED    = 2000          # scenario texts kept in the request counter
+HALF_LIFE_DAYS = 7.0           # popularity decay
+SAVE_DELAY     = 2.0           # seconds a put waits for others to share its save
+SAVE_INTERVAL  = 60.0          # seconds between saves triggered by request counting
+MIN_SIMILARITY = 0.25          # closest(): below this, another scenario is too different to show
+
+
+def normalise(text: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive scenario key."""
+    return re.sub(r"\s+", " ", text.strip().lower()).strip(" .!?¡¿")
+
+
+class ContentStore:
+
+    def __init__(self, path: str = STORE_PATH, max_entries: int = MAX_ENTRIES):
+        self.path        = path
+        self.max_entries = max_entries
+        self._entries    = OrderedDict()   # "level|text" -> data
+        self._requests   = {}              # text -> [decayed score, last seen, original text]
+        self._lock       = threading.Lock()
+        self._last_save  = 0.0
+        self._dirty      = False
+        self._timer      = None            # pending batched save
+        self._load()
+
+    # ── content ──────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _key(text: str, level: str) -> str:
+        return f"{level}|{normalise(text)}"
+
+    def get(self, text: str, level: str):
+        key = self._key(text, level)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, text: str, level: str, data: dict):
+        with self._lock:
+            key = self._key(text, level)
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._schedule_save(SAVE_DELAY)
+
+    def closest(self, text: str, category: str, level: str):
+        """Stored content for the most similar other scenario of this category and level, or None."""
+        terms  = _terms(text)
+        prefix = f"{level}|"
+        best, best_score = None, MIN_SIMILARITY
+        with self._lock:
+            for key, data in self._entries.items():
+                if not key.startswith(prefix) or data.get("primary_key") != category:
+                    continue
+                other = _terms(key[len(prefix):])
+                if not terms or not other:
+                    continue
+                score = len(terms & other) / math.sqrt(len(terms) * len(other))
+                if score >= best_score:
+                    best, best_score = data, score
+        return best
+
+    def __contains__(self, item) -> bool:
+        text, level = item
+        with self._lock:
+            return self._key(text, level) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ── request frequency ────────────────────────────────────────────────────
+
+    def note_request(self, text: str):
+        """Count one request for this scenario (decayed by HALF_LIFE_DAYS)."""
+        now  = time.time()
+        norm = normalise(text)
+        with self._lock:
+            score, last, _ = self._requests.get(norm, (0.0, now, text))
+            self._requests[norm] = [_decay(score, now - last) + 1.0, now, text]
+            if len(self._requests) > MAX_TRACKED:
+                weakest = min(self._requests, key=lambda k: _decay(self._requests[k][0],
+                                                                    now - self._requests[k][1]))
+                del self._requests[weakest]
+        if now - self._last_save > SAVE_INTERVAL:
+            self._schedule_save(0.0)
+
+    def popular(self, n: int = 10) -> list:
+        """The n most requested scenario texts, by decayed request count."""
+        now = time.time()
+        with self._lock:
+            ranked = sorted(self._requests.values(),
+                            key=lambda r: _decay(r[0], now - r[1]), reverse=True)
+        return [r[2] for r in ranked[:n]]
+
+    # ── persistence ──────────────────────────────────────────────────────────
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                raw = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._entries  = OrderedDict(raw.get("entries", []))
+        self._requests = raw.get("requests", {})
+
+    def _schedule_save(self, delay: float):
+        """Mark the store dirty and start a save timer unless one is already pending."""
+        with self._lock:
+            self._dirty = True
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(delay, self.save)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Save now if anything changed since the last save."""
+        if self._dirty:
+            self.save()
+
+    def save(self):
+        self._last_save = time.time()
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._dirty = False
+            payload = {"entries": list(self._entries.items()), "requests": dict(self._requests)}
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            self._dirty = True
+            logger.warning("Could not save content store: %s", e)
+
+
+def _terms(text: str) -> set:
+    return {re.sub(r"(ing|ed|es|s)$", "", w) if len(w) > 4 else w
+            for w in re.findall(r"[a-záéíóúüñ]{4,}", normalise(text))}
+
+
+def _decay(score: float, age_seconds: float) -> float:
+    return score * math.pow(0.5, age_seconds / (HALF_LIFE_DAYS * 86400))
+
+
+STORE = ContentStore()
+atexit.register(STORE.flush)
@@ -0,0 +1,452 @@
+"""
+core.py
+───────
+ConvoReady's engine, without the UI.
+
+Everything a learner's journey needs, as plain functions that never touch
+Streamlit — app.py renders them, api_server.py serves them as JSON, and
+load tests call them directly:
+
+  analyse(text)                      scenario categories, match scores, keywords
+  scenario_content(text, level)      phrases + dialogue: stored, generated, or
+                                     provisional with a job id to poll
+  record_marks(scenario, level, ...) confidence marks into the learning profile
+  conversation_prompt / chat / feedback
+                                     the Conversation Practice tutor
+
+Profile functions act on the learner bound with LEARNERS.use(user_id); in
+the Streamlit app nothing is bound and user_model falls back to the
+browser session, as before.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import wait as wait_for
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+import user_model
+from chat_history import transcript_line
+from content_bank import closest_entry
+from content_store import STORE, normalise
+from grammar_tagger import tag_batch
+from jobs import DONE, JOBS
+from llm_generator import (
+    LATENCY_BUDGETS,
+    build_conversation_system_prompt,
+    chat_with_local,
+    generate_conversation_feedback,
+    generate_scenario_content,
+    generate_smart_recommendation,
+    weak_pattern_text,
+)
+from telemetry import cache_hit
+
+LEVEL_ORDER  = ["A1", "A2", "B1"]
+MAX_LEARNERS = 10_000      # headless learners whose profile stays cached
+
+# ── TF-IDF scenario profiles ────────────────────────────────────────────────
+# Each scenario profile is a rich bag of words drawn from phrases, dialogues,
+# and keywords. The vectoriser learns what language belongs to each scenario
+# and matches user input via cosine similarity — no keyword lists needed.
+
+SCENARIO_PROFILES = {
+    "restaurant": """
+        mesa comer cuenta agua carta vino hambre café comida cena pedido pedir
+        desayuno cocina cerveza carne camarero restaurante menú reserva tapas
+        mesa para dos por favor trae carta recomienda pedir cuenta bebida
+        eat food dinner lunch breakfast cafe bar cook cuisine burger pizza
+        milkshake shake coffee sandwich juice ice cream dessert pastry bakery
+        snack takeaway fast food soda smoothie chicken fish steak soup salad
+        table for two bring the menu what do you recommend i want to order
+        could you bring the bill do you accept card is service included
+        grab a bite starving somewhere to eat book a table tonight hungry
+    """,
+    "transport": """
+        tren viaje calle dirección taxi avión izquierda derecha estación salida
+        equipaje esquina mapa billete vuelo autobús llegada conductor parada
+        bus station airport directions lost route ticket ride drive uber tram
+        straight ahead turn right how much does it cost stop here how long
+        where is the stop keep the change accept card far take me to address
+        getting a cab going to airport catching a train taking the bus metro
+        subway navigate aeropuerto autobus coach ferry port platform
+    """,
+    "shopping": """
+        dinero ropa vestido pagar comprar cambio tienda caja zapatos precio
+        color camisa centro oferta marca talla caro barato probador devolución
+        shop store buy purchase clothes size market mall souvenir gift sale
+        discount fitting return exchange looking for a gift buying clothes
+        how much does this cost do you have my size can i try it on
+        i will take it do you accept returns where is the checkout
+        need a different size another color gift wrap receipt refund
+        salon beauty hair eyebrows nails threading waxing haircut hairdresser
+        peluquería cejas uñas depilación hilo corte pelo tinte manicura
+        beautician stylist barber blow dry trim highlights treatment spa
+        how much is a cut keep the same shape a little shorter same style
+        just a trim keep the shape make them neat tidy up clean up
+        asking price beauty treatment grooming appointment book a time
+    """,
+    "hotel": """
+        noche habitación cama hotel servicio llave doble piso baño maleta
+        recepción pasaporte desayuno toalla ducha wifi equipaje ascensor
+        accommodation room stay check in check out booking reservation bed
+        breakfast key reception airbnb luggage towel hostel
+        i have a reservation what time is breakfast is there wifi
+        the key doesnt work can you store my luggage what time is checkout
+        need more towels air conditioning doesnt work wake me up
+    """,
+    "health": """
+        seguro doctor cabeza sangre médico enfermo hospital dolor cita
+        enfermera fiebre medicina estómago herida farmacia receta alergia
+        sick pain hurt appointment ill injury emergency prescription clinic
+        pharmacy medicine fever symptom allergy feeling unwell
+        i need a doctor my head hurts i have a fever i am allergic
+        where is the nearest pharmacy i need a prescription health insurance
+        been sick for two days need an appointment ache nausea cough
+    """,
+    "work": """
+        trabajo jefe oficina negocio cargo contrato reunión equipo informe
+        experiencia cliente departamento empresa sueldo entrevista candidato
+        job interview office colleague meeting boss salary hire career
+        profession business company cv resume internship
+        my name is i have experience my strengths i would like to work here
+        i work well in a team what would my role be training opportunities
+        when can i start what are the working hours do you have questions
+        apply for a job professional presentation deadline project
+    """,
+    "social": """
+        hablar amigo chica chico fiesta música número teléfono bailar copa
+        beber novia club plan conocer contigo salir quedar pareja invitar
+        friend date party bar meet conversation introduce chat hang out
+        weekend invite relationship dating romance flirt
+        hi my name is where are you from what do you do want to grab a drink
+        what are your plans nice to meet you can i buy you a drink
+        do you have whatsapp shall we exchange numbers how long in spain
+        making friends getting to know people first date night out
+    """,
+    "housing": """
+        casa luz ruido salón dormitorio alquiler casero piso contrato reparar
+        calefacción ducha fontanero avería fianza vecino grifo tubería
+        landlord flat apartment rent lease tenant repair broken deposit
+        contract neighbour noise heat heater water electric boiler plumber
+        shower filter install pipe leak tap drain bathroom kitchen sink
+        electrician fix maintenance wall floor ceiling window door lock
+        there is a problem with the heating the tap is broken
+        when can you send someone to fix it been without hot water
+        is water included in the rent need a copy of the contract
+        calling a plumber neighbours making noise return my deposit
+    """,
+}
+
+# Build TF-IDF matrix at import time (fast — runs once on startup)
+_scenario_names  = list(SCENARIO_PROFILES.keys())
+_vectorizer      = TfidfVectorizer(ngram_range=(1, 2), min_df=1, sublinear_tf=True)
+_scenario_matrix = _vectorizer.fit_transform([SCENARIO_PROFILES[s] for s in _scenario_names])
+
+_STOPWORDS = {"i", "a", "the", "to", "in", "at", "my", "me", "and", "for", "with",
+              "of", "on", "is", "it", "an", "want", "need", "going", "will", "be",
+              "have", "about", "that", "this", "how", "would", "can", "when", "do"}
+
+
+# ── Scenario analysis ────────────────────────────────────────────────────────
+
+def _similarities(user_text: str):
+    return cosine_similarity(_vectorizer.transform([user_text.lower()]), _scenario_matrix)[0]
+
+
+def detect_scenarios(user_text: str) -> list:
+    """
+    Match user text against scenario profiles using TF-IDF cosine similarity.
+    Returns ranked list of scenario keys. Falls back to [general] if no match.
+    """
+    ranked = [
+        (name, score)
+        for name, score in zip(_scenario_names, _similarities(user_text))
+        if score > 0.02  # minimum similarity threshold
+    ]
+    ranked.sort(key=lambda x: x[1], reverse=True)
+    return [name for name, _ in ranked] if ranked else ["general"]
+
+
+def get_match_confidence(user_text: str, matched_keys: list) -> dict:
+    """Return 0–100 cosine similarity scores per matched scenario."""
+    score_map = dict(zip(_scenario_names, _similarities(user_text)))
+    return {
+        key: min(100, int(score_map.get(key, 0) * 200))
+        for key in matched_keys
+    }
+
+
+def primary_scenario(matched_keys: list) -> str:
+    return matched_keys[0] if matched_keys and matched_keys != ["general"] else "general"
+
+
+def extract_keywords(user_text: str) -> list:
+    words = re.findall(r'\b[a-z]{3,}\b', user_text.lower())
+    return [w for w in words if w not in _STOPWORDS][:8]
+
+
+def analyse(user_text: str) -> dict:
+    """Scenario categories (best first), 0–100 match scores and keywords for a learner's text."""
+    matched = detect_scenarios(user_text)
+    return {"scenarios":  matched,
+            "primary":    primary_scenario(matched),
+            "confidence": get_match_confidence(user_text, matched),
+            "keywords":   extract_keywords(user_text)}
+
+
+# ── Scenario content ─────────────────────────────────────────────────────────
+
+def content_key(user_text: str, level_code: str) -> tuple:
+    return ("content", normalise(user_text), level_code)
+
+
+def recommendation_key(user_text: str, level_code: str, struggled_phrases: list,
+                       pattern_stats: dict) -> tuple:
+    """Identity of a recommendation: everything its prompt is built from, including the learner's weak patterns."""
+    weak = hashlib.sha256(weak_pattern_text(pattern_stats).encode()).hexdigest()[:16]
+    return ("recommendation", normalise(user_text), level_code,
+            tuple(sorted(p["es"] for p in struggled_phrases)), weak)
+
+
+def projected_pattern_stats(pattern_stats: dict, confidence_map: dict, dialogue: list) -> dict:
+    """pattern_stats as they will be once record_marks() has saved these marks."""
+    you_es    = [l["es"] for l in dialogue if l["speaker"] == "You"]
+    patterns  = dict(zip(you_es, tag_batch(you_es)))
+    projected = {p: dict(counts) for p, counts in pattern_stats.items()}
+    for key, verdict in confidence_map.items():
+        idx = int(key.split("_")[-1])
+        if idx < len(dialogue) and dialogue[idx]["speaker"] == "You":
+            counts = projected.setdefault(patterns.get(dialogue[idx]["es"]), {"confident": 0, "struggled": 0})
+            counts["confident" if verdict == "✅" else "struggled"] += 1
+    return projected
+
+
+def _generate_recommendation(struggled_phrases: list, pattern_stats: dict,
+                             primary_key: str, level_code: str) -> str:
+    """Job body. Raises on fallback, so a failed recommendation isn't persisted and is retried."""
+    text = generate_smart_recommendation(struggled_phrases, pattern_stats, primary_key, level_code, None)
+    if not text:
+        raise RuntimeError("recommendation generation fell back")
+    return text
+
+
+def submit_recommendation(user_text: str, primary_key: str, level_code: str,
+                          struggled_phrases: list, pattern_stats: dict) -> str:
+    """Start (or find) the background job for the Survival Kit recommendation."""
+    return start_recommendation(user_text, primary_key, level_code, struggled_phrases, pattern_stats)[0]
+
+
+def start_recommendation(user_text: str, primary_key: str, level_code: str,
+                         struggled_phrases: list, pattern_stats: dict) -> tuple:
+    """submit_recommendation(), as (job id, whether this call started it) — for prefetch accounting."""
+    return JOBS.start("recommendation",
+                      recommendation_key(user_text, level_code, struggled_phrases, pattern_stats),
+                      _generate_recommendation, struggled_phrases, pattern_stats,
+                      primary_key, level_code)
+
+
+def _generate_feedback(history: list, user_text: str, level_code: str, weaknesses: list) -> dict:
+    """Job body. Raises on fallback, so "try again" makes a fresh call instead of reading back None."""
+    result = generate_conversation_feedback(history, user_text, level_code, weaknesses)
+    if not result:
+        raise RuntimeError("conversation feedback fell back")
+    return result
+
+
+def submit_feedback(history: list, user_text: str, level_code: str, weaknesses: list) -> str:
+    """Conversation feedback for a finished chat as a background job — one per transcript."""
+    return JOBS.submit("feedback",
+                       [normalise(user_text), level_code, [transcript_line(t) for t in history]],
+                       _generate_feedback, history, user_text, level_code, weaknesses)
+
+
+def _generate_scenario(user_text: str, primary_key: str, level_code: str) -> dict:
+    """Job body. Raises on fallback, so a failed generation isn't persisted and is retried."""
+    data = generate_scenario_content(user_text, primary_key, level_code)
+    if not data:
+        raise RuntimeError("scenario generation fell back")
+    STORE.put(user_text, level_code, data)
+    return data
+
+
+def submit_scenario(user_text: str, primary_key: str, level_code: str) -> str:
+    """Personalised phrases + dialogue as a background job — one per scenario + level."""
+    return start_scenario(user_text, primary_key, level_code)[0]
+
+
+def start_scenario(user_text: str, primary_key: str, level_code: str) -> tuple:
+    """submit_scenario(), as (job id, whether this call started it) — for prefetch accounting."""
+    return JOBS.start("scenario", [normalise(user_text), level_code],
+                      _generate_scenario, user_text, primary_key, level_code)
+
+
+# Minimal content for when there is nothing generated, stored or banked to show
+EMERGENCY_PHRASES  = [{"es": "Por favor, ¿puede ayudarme?", "en": "Please, can you help me?", "tip": "💡 Universal phrase when all else fails.", "level": "A1", "pattern": "polite_request"}]
+EMERGENCY_DIALOGUE = [
+    {"speaker": "Local",  "es": "¡Hola! ¿En qué puedo ayudarle?", "en": "Hello! How can I help you?"},
+    {"speaker": "You",    "es": "Hola, necesito ayuda, por favor.", "en": "Hello, I need help, please."},
+]
+
+
+def scenario_content(user_text: str, level_code: str, matched_keys: list = None,
+                     hit_source: str = "store", waiting=nullcontext) -> dict:
+    """
+    Phrases and dialogue for a scenario, without waiting on Gemini when
+    anything close is at hand. Personalised content comes from the shared
+    store or a finished job; otherwise the closest stored scenario or offline
+    bank entry is returned as provisional content, with "job" set to the
+    generation to poll for. "source" says which. Only when there is nothing
+    to show does it wait for the generation, inside the `waiting()` context.
+    """
+    primary_key = primary_scenario(matched_keys or detect_scenarios(user_text))
+
+    # Shared store — filled by the warm-up job, prefetches and other sessions
+    stored = STORE.get(user_text, level_code)
+    if stored is not None:
+        cache_hit("build_scenario_data", hit_source)
+        return {**stored, "source": "store"}
+
+    job = submit_scenario(user_text, primary_key, level_code)
+    if JOBS.status(job) == DONE:
+        cache_hit("build_scenario_data", "job")
+        return {**JOBS.result(job), "source": "job"}
+
+    # Provisional content — a similar stored scenario, else the closest offline bank entry
+    provisional, source = STORE.closest(user_text, primary_key, level_code), "similar"
+    if provisional is None:
+        provisional, source = closest_entry(user_text, primary_key, level_code), "bank"
+    if provisional is None:
+        # Nothing close enough to show — wait for the generation
+        future = JOBS.future(job)
+        if future is not None:
+            budget = LATENCY_BUDGETS["generate_phrases"].budget + LATENCY_BUDGETS["generate_dialogue"].budget
+            with waiting():
+                wait_for([future], timeout=budget)
+        if JOBS.status(job) == DONE:
+            return {**JOBS.result(job), "source": "job"}
+        provisional, source = {"phrases": EMERGENCY_PHRASES, "dialogue": EMERGENCY_DIALOGUE}, "emergency"
+
+    return {"phrases": provisional["phrases"], "dialogue": provisional["dialogue"],
+            "primary_key": primary_key, "source": source, "job": job}
+
+
+def job_result(jid: str) -> dict:
+    """{"status", "result"} of a background job, for callers polling a provisional response."""
+    return {"status": JOBS.status(jid), "result": JOBS.result(jid)}
+
+
+# ── Learners ─────────────────────────────────────────────────────────────────
+
+class Learners:
+    """
+    user_model state per headless learner, most recently used first. A
+    learner's calls are serialised (their profile is read-modify-write);
+    different learners run in parallel. One Supabase client is shared.
+    Learners inside use() are never evicted, so two calls for the same
+    learner always share one lock.
+    """
+
+    def __init__(self, max_learners: int = MAX_LEARNERS, client=None):
+        self.max_learners = max_learners
+        self.client       = client
+        self._learners    = OrderedDict()     # user_id -> [state, lock, calls inside use()]
+        self._lock        = threading.Lock()
+
+    @contextmanager
+    def use(self, user_id: str):
+        """Bind user_model to this learner's state for the duration of the block."""
+        with self._lock:
+            if self.client is None:
+                self.client = user_model.connect()
+            entry = self._learners.pop(user_id, None)
+            if entry is None:
+                state = {"user_id": user_id}
+                if self.client is not None:
+                    state["supabase_client"] = self.client
+                entry = [state, threading.Lock(), 0]
+            entry[2] += 1
+            self._learners[user_id] = entry
+            self._evict()
+        state, lock, _ = entry
+        try:
+            with lock, user_model.bind_state(state):
+                yield state
+        finally:
+            with self._lock:
+                entry[2] -= 1
+
+    def _evict(self):
+        """Drop least recently used learners beyond max_learners, skipping any still in use."""
+        excess = len(self._learners) - self.max_learners
+        if excess <= 0:
+            return
+        idle = (u for u, e in self._learners.items() if e[2] == 0)
+        for user_id in list(islice(idle, excess)):
+            del self._learners[user_id]
+
+    def __len__(self):
+        return len(self._learners)
+
+
+LEARNERS = Learners()
+
+
+# ── Sessions and conversation ────────────────────────────────────────────────
+
+def record_marks(scenario: str, level_code: str, confidence_map: dict, dialogue: list) -> int:
+    """
+    Save confidence marks ({"conf_<line>": "✅" | "❌"}) on a dialogue to the
+    current learner's profile; returns the session's readiness %.
+    """
+    you_es        = [l["es"] for l in dialogue if l["speaker"] == "You"]
+    line_patterns = dict(zip(you_es, tag_batch(you_es)))
+    return user_model.record_session(
+        scenario          = scenario,
+        level             = level_code,
+        confidence_map    = confidence_map,
+        dialogue          = dialogue,
+        phrase_pattern_fn = line_patterns.get,
+    )
+
+
+def conversation_prompt(primary_key: str, user_text: str, level_code: str) -> str:
+    """Tutor system prompt for a scenario, aimed at the current learner's weak patterns."""
+    _, weaknesses = user_model.get_strengths_and_weaknesses()
+    return build_conversation_system_prompt(
+        scenario_category = primary_key,
+        user_scenario     = user_text,
+        level_code        = level_code,
+        weak_patterns     = weaknesses,
+    )
+
+
+def chat(history: list, message: str, system_prompt: str) -> dict:
+    """The tutor's {"spanish", "english"} reply to `message` after `history` (chat_history turns)."""
+    return chat_with_local(chat_history=history, user_message=message, system_prompt=system_prompt)
+
+
+def weaknesses() -> list:
+    """The current learner's weak patterns, for the tutor prompt and feedback."""
+    return user_model.get_strengths_and_weaknesses()[1]
+
+
+def feedback(history: list, user_text: str, level_code: str, weak_patterns: list):
+    """Conversation feedback for a finished chat, aimed at `weak_patterns` (see weaknesses())."""
+    return generate_conversation_feedback(history, user_text, level_code, weak_patterns)
+
+
+def profile_summary() -> dict:
+    """The current learner's headline numbers."""
+    strengths, weaknesses = user_model.get_strengths_and_weaknesses()
+    return {"sessions":       user_model.get_session_count(),
+            "scenarios":      user_model.get_scenario_history(),
+            "strengths":      [s["label"] for s in strengths],
+            "weaknesses":     [w["label"] for w in weaknesses],
+            "due_reviews":    user_model.get_due_reviews(),
+            "version":        user_model.get_profile_version()}
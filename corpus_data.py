@@ -23,10 +23,15 @@ Scenario token counts:
   housing     212,375 tokens (49,422 lines)
 
 Note: Phrase generation and dialogue are handled by llm_generator.py (Gemini API).
-This module is retained solely for the corpus frequency chart — real linguistic data
-that the LLM cannot replicate.
+This module is retained for the corpus frequency chart and the corpus index
+lookups (collocations and example lines) — real linguistic data that the LLM cannot replicate.
+The index file is built offline by process_corpus.py.
 """
 
+import os
+import sqlite3
+import threading
+
 # ── Per-scenario word frequencies (per 100k words) ─────────────────────────
 # Source: OpenSubtitles v2024 Spanish corpus (opus.nlpl.eu)
 # Pipeline: process_corpus.py — 4,664,874 lines processed,
@@ -203,3 +208,71 @@ PATTERN_LABELS = {
 def get_corpus_frequencies(scenario_key: str) -> dict:
     """Return real corpus word frequencies for a given scenario."""
     return CORPUS_FREQUENCIES.get(scenario_key, CORPUS_FREQUENCIES["general"])
+
+# ── Corpus index (built by process_corpus.py) ──────────────────────────────
+
+CORPUS_INDEX_PATH = os.environ.get(
+    "CONVOREADY_CORPUS_INDEX",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus_index.sqlite"),
+)
+
+_index_conn = None
+_index_lock = threading.Lock()
+
+def _corpus_index():
+    """Open the corpus index read-only, once per process. None if it hasn't been built."""
+    global _index_conn
+    if _index_conn is None and os.path.exists(CORPUS_INDEX_PATH):
+        try:
+            _index_conn = sqlite3.connect(f"file:{CORPUS_INDEX_PATH}?mode=ro",
+                                          uri=True, check_same_thread=False)
+        except sqlite3.Error:
+            return None
+    return _index_conn
+
+def get_collocations(scenario_key: str, head: str = None, limit: int = 10) -> list:
+    """
+    Return the strongest corpus collocations (bigrams and trigrams) for a
+    scenario, ranked by log-likelihood. With `head`, only chunks containing
+    that word. Returns [] if the corpus index is unavailable.
+    """
+    conn = _corpus_index()
+    if conn is None:
+        return []
+    try:
+        with _index_lock:
+            rows = conn.execute(
+                "SELECT ngram, n, count, pmi, llr FROM ngrams "
+                "WHERE scenario = ? AND head = ? ORDER BY rank LIMIT ?",
+                (scenario_key, head.lower() if head else "*", limit),
+            ).fetchall()
+    except sqlite3.Error:
+        return []
+    return [{"ngram": g, "n": n, "count": c, "pmi": p, "llr": l} for g, n, c, p, l in rows]
+
+
+def get_examples(scenario_key: str, word: str, limit: int = 3) -> list:
+    """
+    Return real subtitle lines using `word`, preferring lines from the given
+    scenario and falling back to any scenario. Returns [] if the corpus index
+    is unavailable or the word isn't indexed.
+    """
+    conn = _corpus_index()
+    if conn is None or not word:
+        return []
+    word = word.lower()
+    try:
+        with _index_lock:
+            rows = conn.execute(
+                "SELECT line FROM examples WHERE scenario = ? AND word = ? "
+                "ORDER BY rank LIMIT ?",
+                (scenario_key, word, limit),
+            ).fetchall()
+            if not rows:
+                rows = conn.execute(
+                    "SELECT line FROM examples WHERE word = ? ORDER BY rank LIMIT ?",
+                    (word, limit),
+                ).fetchall()
+    except sqlite3.Error:
+        return []
+    return [line for (line,) in rows]
@@ -0,0 +1,302 @@
+"""
+export_sessions.py
+──────────────────
+Columnar export of learner session history for offline analysis.
+
+Flattens the nested "sessions" of user_model profiles into two Parquet
+datasets, Hive-partitioned by the month of the session date:
+
+  <out>/sessions/month=YYYY-MM/part-*.parquet   one row per session
+  <out>/results/month=YYYY-MM/part-*.parquet    one row per marked dialogue line
+
+Both carry a `date` column for finer filtering. Monthly partitions keep
+part files large enough to scan quickly — daily ones would leave each
+flush spread over hundreds of tiny files.
+
+Profiles are streamed one at a time (from Supabase in pages, or from JSON
+files) and rows are buffered column-wise up to BATCH_ROWS before being
+written, so memory stays bounded however many users there are. Exports
+are incremental: <out>/_export_state.json records how many sessions of
+each user have been written, plus the timestamp of their first session,
+and later runs only append new part files for sessions after that. A
+profile whose first session changed was reset and starts over, whether it
+is now shorter or has already grown past the exported count; its new
+session_ids carry a "~<n>" reset count so they never collide with the rows
+already written for the old history.
+
+Read back with pyarrow.dataset or pandas, e.g.
+
+    from export_sessions import load_results
+    df = load_results(columns=["pattern", "level", "confident"])
+    df.groupby(["level", "pattern"])["confident"].mean()
+
+Usage:
+
+    python export_sessions.py                               # all Supabase profiles
+    python export_sessions.py --profiles a.json b.json
+    python export_sessions.py --out /tmp/bench --synthetic 20000 --query
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from profile_codec import decode
+
+EXPORT_DIR = os.environ.get("CONVOREADY_EXPORT_DIR", os.path.join(".convoready", "exports"))
+BATCH_ROWS = 250_000       # buffered result rows before a flush
+PAGE_SIZE  = 200           # profiles per Supabase request
+STATE_FILE = "_export_state.json"
+
+SESSION_SCHEMA = pa.schema([
+    ("user_id",    pa.string()),
+    ("session_id", pa.string()),
+    ("date",       pa.date32()),
+    ("timestamp",  pa.timestamp("us")),
+    ("scenario",   pa.string()),
+    ("level",      pa.string()),
+    ("readiness",  pa.int16()),
+    ("lines",      pa.int16()),
+])
+
+RESULT_SCHEMA = pa.schema([
+    ("user_id",    pa.string()),
+    ("session_id", pa.string()),
+    ("date",       pa.date32()),
+    ("timestamp",  pa.timestamp("us")),
+    ("scenario",   pa.string()),
+    ("level",      pa.string()),
+    ("line",       pa.int16()),
+    ("pattern",    pa.string()),
+    ("phrase",     pa.string()),
+    ("confident",  pa.bool_()),
+])
+
+
+# ── Exporter ─────────────────────────────────────────────────────────────────
+
+class Exporter:
+    """Buffers flattened rows per month partition and appends them as Parquet part files."""
+
+    def __init__(self, out: str = EXPORT_DIR, batch_rows: int = BATCH_ROWS):
+        self.out        = out
+        self.batch_rows = batch_rows
+        self.run_id     = time.strftime("%Y%m%dT%H%M%S")
+        self.state      = self._load_state()
+        self.stats      = {"users": 0, "sessions": 0, "results": 0, "files": 0}
+        self._sessions  = defaultdict(lambda: {f.name: [] for f in SESSION_SCHEMA})   # month -> columns
+        self._results   = defaultdict(lambda: {f.name: [] for f in RESULT_SCHEMA})
+        self._pending   = {}     # user -> (sessions exported, first timestamp), once flushed
+        self._rows      = 0
+        self._seq       = 0
+
+    def add_profile(self, user_id: str, profile: dict):
+        """Buffer the sessions of one profile not exported yet."""
+        sessions = profile.get("sessions", [])
+        first    = str(sessions[0].get("timestamp")) if sessions else None
+        done     = self.state["users"].get(user_id, 0)
+        seen     = self.state.setdefault("first", {}).get(user_id, first)
+        resets   = self.state.setdefault("resets", {})
+        if len(sessions) < done or seen not in (None, first):
+            done = 0           # profile was reset since the last export
+            resets[user_id] = resets.get(user_id, 0) + 1
+        prefix   = f"{user_id}~{resets[user_id]}" if user_id in resets else user_id
+        for i in range(done, len(sessions)):
+            session = sessions[i]
+            ts      = _timestamp(session.get("timestamp"))
+            month   = ts.strftime("%Y-%m")
+            sid     = f"{prefix}:{i}"
+            results = session.get("results", [])
+            cols    = self._sessions[month]
+            for name, value in (("user_id", user_id), ("session_id", sid), ("date", ts.date()),
+                                ("timestamp", ts), ("scenario", session.get("scenario")),
+                                ("level", session.get("level")),
+                                ("readiness", session.get("readiness")), ("lines", len(results))):
+                cols[name].append(value)
+            cols = self._results[month]
+            for j, result in enumerate(results):
+                cols["user_id"].append(user_id)
+                cols["session_id"].append(sid)
+                cols["date"].append(ts.date())
+                cols["timestamp"].append(ts)
+                cols["scenario"].append(session.get("scenario"))
+                cols["level"].append(session.get("level"))
+                cols["line"].append(j)
+                cols["pattern"].append(result.get("pattern"))
+                cols["phrase"].append(result.get("phrase"))
+                cols["confident"].append(bool(result.get("confident")))
+            self._rows             += len(results) + 1
+            self.stats["sessions"] += 1
+            self.stats["results"]  += len(results)
+        self._pending[user_id] = (len(sessions), first)
+        self.stats["users"] += 1
+        if self._rows >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows as new part files, then record the users they cover."""
+        for dataset, buffers, schema in (("sessions", self._sessions, SESSION_SCHEMA),
+                                         ("results", self._results, RESULT_SCHEMA)):
+            for month, cols in buffers.items():
+                if not cols["session_id"]:
+                    continue
+                directory = os.path.join(self.out, dataset, f"month={month}")
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f"part-{self.run_id}-{self._seq:05d}.parquet")
+                tmp  = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                pq.write_table(pa.table(cols, schema=schema), tmp, compression="zstd")
+                os.replace(tmp, path)
+                self._seq += 1
+                self.stats["files"] += 1
+            buffers.clear()
+        for user_id, (count, first) in self._pending.items():
+            self.state["users"][user_id] = count
+            self.state["first"][user_id] = first
+        self.state["last_run"] = self.run_id
+        self._pending.clear()
+        self._rows = 0
+        self._save_state()
+
+    # ── state ────────────────────────────────────────────────────────────────
+
+    def _load_state(self) -> dict:
+        try:
+            with open(os.path.join(self.out, STATE_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"users": {}, "first": {}, "resets": {}}
+
+    def _save_state(self):
+        path = os.path.join(self.out, STATE_FILE)
+        os.makedirs(self.out, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, path)
+
+
+def _timestamp(value) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return datetime(1970, 1, 1)
+
+
+# ── Profile sources ──────────────────────────────────────────────────────────
+
+def supabase_profiles(page_size: int = PAGE_SIZE):
+    """(user_id, profile) for every row of user_profile, fetched a page at a time."""
+    from supabase import create_client
+    client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+    start  = 0
+    while True:
+        rows = (client.table("user_profile")
+                      .select("id, data")
+                      .order("id")
+                      .range(start, start + page_size - 1)
+                      .execute()).data
+        for row in rows:
+            yield row["id"], decode(row["data"] or {})
+        if len(rows) < page_size:
+            return
+        start += page_size
+
+
+def file_profiles(paths: list):
+    """(user_id, profile) from JSON files holding one profile (id = file name) or {user_id: profile}."""
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        if "sessions" in data or "codec" in data:
+            yield os.path.splitext(os.path.basename(path))[0], decode(data)
+        else:
+            for user_id, profile in data.items():
+                yield user_id, decode(profile)
+
+
+def synthetic_profiles(users: int, seed: int = 11):
+    """Profiles with random session histories, for benchmarking."""
+    from user_model import PATTERN_DIFFICULTY
+    rng       = random.Random(seed)
+    patterns  = list(PATTERN_DIFFICULTY)
+    scenarios = ["restaurant", "transport", "shopping", "hotel", "health", "work", "social", "housing"]
+    start     = datetime(2025, 1, 1)
+    for u in range(users):
+        sessions = []
+        for _ in range(rng.randint(5, 40)):
+            results = [{"pattern": rng.choice(patterns), "phrase": f"frase {rng.randrange(5000)}",
+                        "confident": rng.random() < 0.65} for _ in range(rng.randint(3, 7))]
+            sessions.append({
+                "timestamp": (start + timedelta(minutes=rng.randrange(365 * 1440))).isoformat(),
+                "scenario":  rng.choice(scenarios),
+                "level":     rng.choice(["A1", "A2", "B1"]),
+                "results":   results,
+                "readiness": int(100 * sum(r["confident"] for r in results) / len(results)),
+            })
+        sessions.sort(key=lambda s: s["timestamp"])
+        yield f"user{u:06d}", {"sessions": sessions}
+
+
+# ── Reading back ─────────────────────────────────────────────────────────────
+
+def load_results(out: str = EXPORT_DIR, columns: list = None, filter=None):
+    """The results dataset (optionally a column subset / pyarrow filter) as a pandas DataFrame."""
+    import pyarrow.dataset as ds
+    dataset = ds.dataset(os.path.join(out, "results"), format="parquet", partitioning="hive")
+    return dataset.to_table(columns=columns, filter=filter).to_pandas()
+
+
+def load_sessions(out: str = EXPORT_DIR, columns: list = None, filter=None):
+    """The sessions dataset as a pandas DataFrame."""
+    import pyarrow.dataset as ds
+    dataset = ds.dataset(os.path.join(out, "sessions"), format="parquet", partitioning="hive")
+    return dataset.to_table(columns=columns, filter=filter).to_pandas()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export ConvoReady session history to Parquet.")
+    parser.add_argument("--out", default=EXPORT_DIR, help="export directory (appended to on later runs)")
+    parser.add_argument("--profiles", nargs="+", help="profile JSON files instead of Supabase")
+    parser.add_argument("--synthetic", type=int, help="export this many simulated users instead")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS, help="buffered rows per flush")
+    parser.add_argument("--query", action="store_true", help="time a grouped query over the export")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        profiles = synthetic_profiles(args.synthetic)
+    elif args.profiles:
+        profiles = file_profiles(args.profiles)
+    else:
+        profiles = supabase_profiles()
+
+    exporter = Exporter(args.out, args.batch_rows)
+    started  = time.perf_counter()
+    for user_id, profile in profiles:
+        exporter.add_profile(user_id, profile)
+    exporter.flush()
+    s = exporter.stats
+    print(f"Exported {s['sessions']:,} sessions / {s['results']:,} results from {s['users']:,} users "
+          f"into {s['files']:,} files in {time.perf_counter() - started:.1f}s")
+
+    if args.query:
+        started = time.perf_counter()
+        df      = load_results(args.out, columns=["level", "pattern", "confident"])
+        loaded  = time.perf_counter() - started
+        rates   = df.groupby(["level", "pattern"])["confident"].mean().unstack("level")
+        print(rates.round(2).to_string())
+        print(f"{len(df):,} results: loaded in {loaded:.2f}s, grouped in "
+              f"{time.perf_counter() - started - loaded:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
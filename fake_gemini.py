@@ -0,0 +1,184 @@
+"""
+fake_gemini.py
+──────────────
+Local fault-injecting stand-in for the google-genai client.
+
+Implements the slice of the SDK that llm_generator.py uses —
+client.models.generate_content() and generate_content_stream() — and
+answers with canned, well-formed ConvoReady responses chosen from the
+prompt. Latency, tail latency, error rate and error code are configurable,
+so resilience, rate limiting and load tests can run without network access.
+
+Enable it in the app with CONVOREADY_FAKE_GEMINI=1 (optionally
+CONVOREADY_FAKE_LATENCY / CONVOREADY_FAKE_ERROR_RATE).
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import time
+
+
+class FakeAPIError(Exception):
+    """Mirrors google.genai.errors.APIError: carries an HTTP status in `code`."""
+
+    def __init__(self, code: int, message: str = "injected fault"):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class _Usage:
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count     = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class _Response:
+    def __init__(self, text: str, usage=None):
+        self.text           = text
+        self.usage_metadata = usage
+
+
+# ── Canned responses ─────────────────────────────────────────────────────────
+
+_PHRASES = [
+    {"es": "Quería una mesa para dos, por favor.", "en": "I'd like a table for two, please.",
+     "tip": "💡 'Quería' sounds softer than 'quiero'.", "level": "A2", "pattern": "polite_request"},
+    {"es": "¿Qué me recomienda?", "en": "What do you recommend?",
+     "tip": "💡 Lets the waiter do the work.", "level": "A1", "pattern": "basic_question"},
+    {"es": "Para mí, el menú del día.", "en": "For me, the set menu.",
+     "tip": "💡 The cheapest lunch option in Spain.", "level": "A1", "pattern": "present_simple"},
+    {"es": "No como carne.", "en": "I don't eat meat.",
+     "tip": "💡 Say it before ordering.", "level": "A1", "pattern": "negation"},
+    {"es": "Voy a tomar el pescado.", "en": "I'm going to have the fish.",
+     "tip": "💡 'Voy a tomar' is the natural way to order.", "level": "A2", "pattern": "future"},
+    {"es": "¿Nos trae la cuenta, por favor?", "en": "Could you bring us the bill, please?",
+     "tip": "💡 Waiters won't bring it until you ask.", "level": "A1", "pattern": "polite_request"},
+]
+
+_DIALOGUE = [
+    {"speaker": "Waiter", "es": "¡Buenas noches! ¿Cuántos son?", "en": "Good evening! How many are you?"},
+    {"speaker": "You",    "es": "Somos dos, por favor.", "en": "There are two of us, please."},
+    {"speaker": "Waiter", "es": "Aquí tienen la carta.", "en": "Here is the menu."},
+    {"speaker": "You",    "es": "¿Qué me recomienda?", "en": "What do you recommend?"},
+    {"speaker": "Waiter", "es": "El pescado está muy bueno hoy.", "en": "The fish is very good today."},
+    {"speaker": "You",    "es": "Vale, voy a tomar el pescado.", "en": "OK, I'll have the fish."},
+]
+
+_CHAT = {"spanish": "¡Muy bien! ¿Y para beber?", "english": "Very good! And to drink?"}
+
+_FEEDBACK = {
+    "score": 72,
+    "summary": "You communicated clearly with a few small grammar slips.",
+    "strengths": ["Polite requests with 'por favor'", "Good use of 'quería'"],
+    "improvements": ["'Yo quiero agua' → 'Quería agua'", "Watch gender: 'la menú' → 'el menú'"],
+    "next_focus": "Practise ordering with 'me pone…' and 'quería…'.",
+}
+
+_RECOMMENDATION = ("You hesitated on '¿Nos trae la cuenta, por favor?'. Say it aloud five times "
+                   "today, swapping 'la cuenta' for 'la carta' and 'agua'.")
+
+
+def _dialogue(prompt: str) -> list:
+    """The canned dialogue, with the prompt's other speaker and number of lines."""
+    speaker = re.search(r'Speakers: "You" \(the learner\) and "([^"]+)"', prompt)
+    lines   = re.search(r"Number of lines: exactly (\d+)", prompt)
+    n       = int(lines.group(1)) if lines else len(_DIALOGUE)
+    other   = speaker.group(1) if speaker else "Waiter"
+    return [{**line, "speaker": "You" if line["speaker"] == "You" else other}
+            for line in (_DIALOGUE * (n // len(_DIALOGUE) + 1))[:n]]
+
+
+def canned_text(contents) -> str:
+    """Pick a plausible response for an llm_generator prompt."""
+    if isinstance(contents, list):
+        return json.dumps(_CHAT, ensure_ascii=False)
+    if "survival phrases" in contents:
+        return json.dumps(_PHRASES, ensure_ascii=False)
+    if "practice dialogue" in contents:
+        return json.dumps(_dialogue(contents), ensure_ascii=False)
+    if "analysing a practice conversation" in contents:
+        return json.dumps(_FEEDBACK, ensure_ascii=False)
+    return _RECOMMENDATION
+
+
+# ── Client ───────────────────────────────────────────────────────────────────
+
+class _Models:
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model: str, contents, config=None):
+        text = self._client._serve(contents)
+        return _Response(text, self._client._usage(contents, text))
+
+    def generate_content_stream(self, model: str, contents, config=None):
+        text   = self._client._serve(contents)
+        pieces = [text[i:i + 64] for i in range(0, len(text), 64)] or [""]
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(self._client.chunk_delay)
+            last = i == len(pieces) - 1
+            yield _Response(piece, self._client._usage(contents, text) if last else None)
+
+
+class FakeGeminiClient:
+    """
+    Stand-in for genai.Client.
+
+    latency       base seconds per call (± jitter)
+    tail_rate     probability a call takes `tail_latency` instead
+    error_rate    probability a call raises FakeAPIError(error_code)
+    responder     optional fn(contents) -> text, overriding canned_text
+    """
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.1, tail_rate: float = 0.0,
+                 tail_latency: float = 5.0, error_rate: float = 0.0, error_code: int = 503,
+                 chunk_delay: float = 0.0, responder=None, seed: int = None):
+        self.latency      = latency
+        self.jitter       = jitter
+        self.tail_rate    = tail_rate
+        self.tail_latency = tail_latency
+        self.error_rate   = error_rate
+        self.error_code   = error_code
+        self.chunk_delay  = chunk_delay
+        self.responder    = responder or canned_text
+        self.models       = _Models(self)
+        self.calls        = 0
+        self._rng         = random.Random(seed)
+        self._lock        = threading.Lock()
+
+    def _serve(self, contents) -> str:
+        with self._lock:
+            self.calls += 1
+            tail  = self._rng.random() < self.tail_rate
+            fail  = self._rng.random() < self.error_rate
+            delay = self.tail_latency if tail else max(
+                0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter) * self.latency)
+        time.sleep(delay)
+        if fail:
+            raise FakeAPIError(self.error_code)
+        return self.responder(contents)
+
+    @staticmethod
+    def _usage(contents, text: str) -> _Usage:
+        prompt = contents if isinstance(contents, str) else json.dumps(contents)
+        return _Usage(len(prompt) // 4, len(text) // 4)
+
+
+_env_client = None
+_env_lock   = threading.Lock()
+
+
+def from_env() -> FakeGeminiClient:
+    """Process-wide stand-in configured from CONVOREADY_FAKE_* environment variables."""
+    global _env_client
+    with _env_lock:
+        if _env_client is None:
+            _env_client = FakeGeminiClient(
+                latency    = float(os.environ.get("CONVOREADY_FAKE_LATENCY", "0.8")),
+                error_rate = float(os.environ.get("CONVOREADY_FAKE_ERROR_RATE", "0")),
+            )
+    return _env_client
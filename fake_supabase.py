@@ -0,0 +1,105 @@
+"""
+fake_supabase.py
+────────────────
+In-memory stand-in for the supabase-py client.
+
+Implements the slice of the query builder that user_model.py and
+export_sessions.py use — table().select().eq().order().range().execute()
+and table().upsert().execute() — over a dict per table, with configurable
+round-trip latency. Rows are stored as JSON text, so a save pays the same
+serialisation cost it would going over the wire.
+
+    client = FakeSupabase(latency=0.03)
+    core.LEARNERS.client = client        # headless learners now load/save here
+"""
+
+import json
+import random
+import threading
+import time
+
+
+class _Result:
+    def __init__(self, data: list):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, client, table: str):
+        self._client  = client
+        self._table   = table
+        self._columns = None
+        self._filters = []
+        self._order   = None
+        self._range   = None
+        self._upsert  = None
+
+    def select(self, columns: str = "*"):
+        self._columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def eq(self, column: str, value):
+        self._filters.append((column, value))
+        return self
+
+    def order(self, column: str):
+        self._order = column
+        return self
+
+    def range(self, start: int, end: int):
+        self._range = (start, end)
+        return self
+
+    def upsert(self, row: dict):
+        self._upsert = row
+        return self
+
+    def execute(self) -> _Result:
+        return self._client._execute(self)
+
+
+class FakeSupabase:
+    """
+    Stand-in for supabase.Client. `latency` (± jitter) is slept per
+    request; `key` is the primary-key column of every table.
+    """
+
+    def __init__(self, latency: float = 0.03, jitter: float = 0.3, key: str = "id", seed: int = None):
+        self.latency = latency
+        self.jitter  = jitter
+        self.key     = key
+        self.reads   = 0
+        self.writes  = 0
+        self._tables = {}        # table -> {key: JSON text of the row}
+        self._rng    = random.Random(seed)
+        self._lock   = threading.Lock()
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def _execute(self, query: _Query) -> _Result:
+        with self._lock:
+            delay = max(0.0, self.latency * (1 + self._rng.uniform(-self.jitter, self.jitter)))
+        time.sleep(delay)
+        if query._upsert is not None:
+            text = json.dumps(query._upsert, ensure_ascii=False)
+            with self._lock:
+                self._tables.setdefault(query._table, {})[query._upsert[self.key]] = text
+                self.writes += 1
+            return _Result([query._upsert])
+
+        with self._lock:
+            rows = list(self._tables.get(query._table, {}).values())
+            self.reads += 1
+        rows = [json.loads(r) for r in rows]
+        rows = [r for r in rows if all(r.get(c) == v for c, v in query._filters)]
+        if query._order:
+            rows.sort(key=lambda r: r.get(query._order))
+        if query._range:
+            rows = rows[query._range[0]:query._range[1] + 1]
+        if query._columns:
+            rows = [{c: r.get(c) for c in query._columns} for r in rows]
+        return _Result(rows)
+
+    def __len__(self):
+        return sum(len(t) for t in self._tables.values())
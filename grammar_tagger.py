@@ -0,0 +1,491 @@
+"""
+grammar_tagger.py
+─────────────────
+Local Spanish grammar-pattern tagger for phrases and dialogue lines.
+
+Assigns each sentence one of the user_model.PATTERN_LABELS keys — the
+pattern a learner has to produce to say it — from precompiled rules and
+morphology tables, with no model call:
+
+  subjunctive     ojalá / que / si / cuando … + a subjunctive form
+  polite_request  quería, quisiera, podría, me gustaría, ¿me trae…?, por favor
+  conditional     infinitive + -ía endings, irregular stems (tendría, haría…)
+  past_simple     preterite / imperfect forms, he/ha + participle
+  future          ir + a + infinitive, synthetic future (-aré, tendré…)
+  complex         a subordinate clause (porque, cuando, aunque, que …)
+  negation        no / nunca / nadie / nada / tampoco / ningún
+  basic_question  ¿…? or a question word
+  greeting        hola, buenos días, ¿qué tal?, encantado …
+  number          digits, or number words in a short line
+  present_simple  everything else
+
+Rules are tried in that order (most specific first); the first match wins.
+Conjugated forms come from a table of common verbs, generated once at
+import, so lookups are set membership. tag_batch() tags a whole dialogue in
+one call; results are memoised.
+
+Run `python grammar_tagger.py` for accuracy on the development set the
+rules were written against, on a held-out set, and the per-line tagging
+time.
+"""
+
+import re
+import time
+from functools import lru_cache
+
+# ── Morphology tables ────────────────────────────────────────────────────────
+
+# Common verbs in ConvoReady scenarios. Irregular yo-forms drive the present
+# subjunctive stem (tengo → tenga); stem changes are given as yo-forms too.
+VERBS = [
+    "hablar", "llamar", "llegar", "pagar", "buscar", "tomar", "comprar", "necesitar", "ayudar",
+    "esperar", "trabajar", "reservar", "cambiar", "probar", "costar", "encontrar", "pensar",
+    "empezar", "cerrar", "recomendar", "quedar", "dejar", "llevar", "mirar", "preguntar",
+    "cenar", "desayunar", "almorzar", "alquilar", "arreglar", "funcionar", "explicar", "tocar",
+    "viajar", "visitar", "bajar", "entrar", "gustar", "importar", "preparar", "olvidar",
+    "mandar", "enviar", "usar", "pasar", "volar", "aparcar", "devolver", "firmar", "tardar",
+    "comer", "beber", "vender", "aprender", "comprender", "entender", "leer", "creer", "deber",
+    "volver", "poder", "querer", "tener", "hacer", "poner", "saber", "traer", "ver", "ser",
+    "haber", "romper", "doler", "perder", "conocer", "parecer", "ofrecer", "caer", "coger",
+    "vivir", "abrir", "escribir", "recibir", "subir", "decidir", "pedir", "servir", "seguir",
+    "repetir", "preferir", "sentir", "dormir", "salir", "venir", "decir", "ir", "estar", "dar",
+    "incluir", "elegir", "compartir", "permitir", "añadir", "cubrir", "describir", "medir",
+]
+
+YO_PRESENT = {
+    "tener": "tengo", "hacer": "hago", "poner": "pongo", "salir": "salgo", "venir": "vengo",
+    "decir": "digo", "traer": "traigo", "conocer": "conozco", "parecer": "parezco",
+    "ofrecer": "ofrezco", "caer": "caigo", "pedir": "pido", "servir": "sirvo", "seguir": "sigo",
+    "repetir": "repito", "preferir": "prefiero", "sentir": "siento", "dormir": "duermo",
+    "volver": "vuelvo", "devolver": "devuelvo", "poder": "puedo", "querer": "quiero",
+    "entender": "entiendo", "perder": "pierdo", "doler": "duelo", "probar": "pruebo",
+    "costar": "cuesto", "encontrar": "encuentro", "pensar": "pienso", "empezar": "empiezo",
+    "cerrar": "cierro", "recomendar": "recomiendo", "almorzar": "almuerzo", "volar": "vuelo",
+    "coger": "cojo", "elegir": "elijo", "incluir": "incluyo", "medir": "mido", "ver": "veo",
+}
+
+SUBJUNCTIVE_IRREGULAR = {
+    "ser": ["sea", "seas", "seamos", "sean"], "estar": ["esté", "estés", "estemos", "estén"],
+    "ir": ["vaya", "vayas", "vayamos", "vayan"], "haber": ["haya", "hayas", "hayamos", "hayan"],
+    "saber": ["sepa", "sepas", "sepamos", "sepan"], "dar": ["dé", "des", "demos", "den"],
+}
+
+PRETERITE_IRREGULAR = {
+    "ser": ["fui", "fuiste", "fue", "fuimos", "fueron"], "ir": ["fui", "fuiste", "fue", "fuimos", "fueron"],
+    "tener": ["tuve", "tuviste", "tuvo", "tuvimos", "tuvieron"],
+    "estar": ["estuve", "estuviste", "estuvo", "estuvimos", "estuvieron"],
+    "hacer": ["hice", "hiciste", "hizo", "hicimos", "hicieron"],
+    "poder": ["pude", "pudiste", "pudo", "pudimos", "pudieron"],
+    "poner": ["puse", "pusiste", "puso", "pusimos", "pusieron"],
+    "querer": ["quise", "quisiste", "quiso", "quisimos", "quisieron"],
+    "saber": ["supe", "supiste", "supo", "supimos", "supieron"],
+    "venir": ["vine", "viniste", "vinimos", "vinieron"],
+    "decir": ["dije", "dijiste", "dijo", "dijimos", "dijeron"],
+    "traer": ["trajiste", "trajo", "trajimos", "trajeron"],
+    "dar": ["di", "diste", "dio", "dimos", "dieron"], "ver": ["vi", "viste", "vio", "vimos", "vieron"],
+    "haber": ["hubo"], "dormir": ["durmió", "durmieron"], "pedir": ["pidió", "pidieron"],
+    "sentir": ["sintió", "sintieron"], "seguir": ["siguió", "siguieron"],
+    "servir": ["sirvió", "sirvieron"], "preferir": ["prefirió", "prefirieron"],
+    "leer": ["leyó", "leyeron"], "creer": ["creyó", "creyeron"], "caer": ["cayó", "cayeron"],
+    "incluir": ["incluyó", "incluyeron"], "medir": ["midió", "midieron"],
+    "repetir": ["repitió", "repitieron"],
+}
+
+IMPERFECT_IRREGULAR = {
+    "ser": ["era", "eras", "éramos", "eran"], "ir": ["iba", "ibas", "íbamos", "iban"],
+    "ver": ["veía", "veías", "veíamos", "veían"],
+}
+
+FUTURE_STEMS = {
+    "tener": "tendr", "hacer": "har", "poner": "pondr", "salir": "saldr", "venir": "vendr",
+    "decir": "dir", "poder": "podr", "querer": "querr", "saber": "sabr", "haber": "habr",
+    "caber": "cabr", "valer": "valdr",
+}
+
+PARTICIPLE_IRREGULAR = {
+    "hacer": "hecho", "decir": "dicho", "romper": "roto", "ver": "visto", "poner": "puesto",
+    "escribir": "escrito", "abrir": "abierto", "volver": "vuelto", "devolver": "devuelto",
+    "cubrir": "cubierto", "describir": "descrito", "morir": "muerto",
+}
+
+# Nouns that look like conditional / imperfect forms (cafetería, categoría…)
+FALSE_CONDITIONALS = {
+    "cafetería", "panadería", "librería", "lavandería", "carnicería", "pescadería", "frutería",
+    "joyería", "peluquería", "zapatería", "pastelería", "ferretería", "papelería", "galería",
+    "batería", "lotería", "pizzería", "heladería", "perfumería", "mensajería", "consejería",
+    "conserjería", "tintorería", "cervecería", "marisquería", "gasolinería", "relojería",
+}
+
+# Subjunctive forms far more often met as other words (la tarde, entre, el viaje)
+FALSE_SUBJUNCTIVES = {"tarde", "tardes", "entre", "viaje", "viajes", "firme", "firmes"}
+
+# Words ending in -ar/-er/-ir that are not infinitives
+NON_INFINITIVES = {
+    "bar", "mar", "lugar", "hogar", "altar", "militar", "particular", "popular", "familiar",
+    "collar", "azúcar", "mujer", "ayer", "placer", "taller", "alquiler", "cualquier", "par",
+    "nivel", "hablador", "menor", "mayor", "favor", "por", "señor", "dolor", "calor", "color",
+    "sabor", "mejor", "peor", "ascensor", "exterior", "interior", "anterior", "posterior",
+}
+
+SUBJ_TRIGGERS     = {"que", "ojalá", "cuando", "aunque", "hasta", "si"}
+NEGATORS          = {"no", "nunca", "nadie", "nada", "tampoco", "ningún", "ninguno", "ninguna", "jamás", "ni"}
+QUESTION_WORDS    = {"qué", "dónde", "cuándo", "cuánto", "cuánta", "cuántos", "cuántas", "cómo",
+                     "quién", "quiénes", "cuál", "cuáles", "adónde"}
+SUBORDINATORS     = {"porque", "cuando", "aunque", "mientras", "si", "donde", "que", "como"}
+HABER_AUX         = {"he", "has", "ha", "hemos", "han", "había", "habías", "habíamos", "habían"}
+IR_PRESENT        = {"voy", "vas", "va", "vamos", "vais", "van"}
+CLITICS           = ("me", "te", "se", "le", "lo", "la", "les", "los", "las", "nos")
+NUMBER_WORDS      = {
+    "uno", "dos", "tres", "cuatro", "cinco", "seis", "siete", "ocho", "nueve", "diez",
+    "once", "doce", "quince", "veinte", "treinta", "cuarenta", "cincuenta", "cien", "ciento",
+    "doscientos", "quinientos", "mil", "euros", "euro", "céntimos",
+}
+
+GREETINGS = [
+    "hola", "buenos días", "buenas tardes", "buenas noches", "buenas", "adiós", "hasta luego",
+    "hasta mañana", "hasta pronto", "encantado", "encantada", "mucho gusto", "qué tal",
+    "bienvenido", "bienvenida", "bienvenidos", "nos vemos", "cómo estás", "cómo está",
+]
+
+# Courtesy forms — checked before conditional / past / subjunctive, since
+# "quería", "podría", "quisiera" are taught as polite requests
+POLITE_STRONG = [
+    r"\bquer[ií]a\b", r"\bquerr[ií]a\b", r"\bquisiera\b", r"\bpodr[ií]a(s|n)?\b",
+    r"\bpudiera\b", r"\b(me|te|nos|le) gustar[ií]a\b", r"\b(le|te|os|les) importar[ií]a\b",
+    r"\bser[ií]a posible\b", r"\bser[ií]a tan amable\b",
+]
+POLITE_WEAK = [
+    r"\bpor favor\b", r"\bme (pone|pones|trae|traes|da|das|dice|dices|cobra|cobras|ayuda|ayudas|deja|dejas)\b",
+    r"\bnos (pone|trae|da|cobra|deja)\b", r"\b(puede|puedes|pueden) \w+(r|rme|rnos|rle|rlo|rla)\b",
+    r"\bdisculpe\b", r"\bperdone\b",
+]
+
+
+def _before_e(stem: str) -> str:
+    """Spelling change of an -ar stem before e: empiez → empiec, pag → pagu, busc → busqu."""
+    return stem[:-1] + {"z": "c", "g": "gu", "c": "qu"}[stem[-1]] if stem[-1:] in ("z", "g", "c") else stem
+
+
+def _subjunctive_forms(verb: str, stem_yo: str) -> list:
+    if verb in SUBJUNCTIVE_IRREGULAR:
+        return SUBJUNCTIVE_IRREGULAR[verb]
+    stem  = stem_yo[:-1] if stem_yo.endswith("o") else verb[:-2]
+    inf   = verb[:-2]
+    ar    = verb.endswith("ar")
+    if ar:
+        stem = _before_e(stem)
+        inf  = _before_e(inf)
+        return [stem + "e", stem + "es", inf + "emos", stem + "en"]
+    stem = re.sub(r"g$", "j", stem) if verb.endswith(("ger", "gir")) else stem
+    # nosotros keeps the yo-form stem (tengamos, veamos, pidamos) but not its
+    # diphthong: -er verbs go back to the infinitive stem (volvamos), -ir
+    # verbs close it (sintamos, durmamos)
+    nos = stem
+    for diphthong, closed in (("ie", "i"), ("ue", "u")):
+        if diphthong in stem and diphthong not in inf:
+            i   = stem.rindex(diphthong)
+            nos = inf if verb.endswith("er") else stem[:i] + closed + stem[i + 2:]
+    return [stem + "a", stem + "as", nos + "amos", stem + "an"]
+
+
+def _past_forms(verb: str) -> list:
+    stem  = verb[:-2]
+    forms = list(PRETERITE_IRREGULAR.get(verb, [])) + list(IMPERFECT_IRREGULAR.get(verb, []))
+    if verb.endswith("ar"):
+        yo = _before_e(stem) + "é"
+        if verb not in PRETERITE_IRREGULAR:
+            forms += [yo, stem + "aste", stem + "ó", stem + "asteis", stem + "aron"]
+        forms += [stem + "aba", stem + "abas", stem + "ábamos", stem + "aban"]
+    elif verb not in ("ir", "ser"):
+        if verb not in PRETERITE_IRREGULAR:
+            forms += [stem + "í", stem + "iste", stem + "ió", stem + "isteis", stem + "ieron"]
+            if verb.endswith("er"):
+                forms.append(stem + "imos")
+        if verb not in IMPERFECT_IRREGULAR:
+            forms += [stem + "ía", stem + "ías", stem + "íamos", stem + "ían"]
+    participle = PARTICIPLE_IRREGULAR.get(verb) or stem + ("ado" if verb.endswith("ar") else "ido")
+    return forms, participle
+
+
+def _future_conditional(verb: str):
+    stem = FUTURE_STEMS.get(verb, verb)
+    future      = [stem + e for e in ("é", "ás", "á", "emos", "éis", "án")]
+    conditional = [stem + e for e in ("ía", "ías", "íamos", "íais", "ían")]
+    return future, conditional
+
+
+def _build_tables():
+    subj, past, parts, fut, cond = set(), set(), set(), set(), set()
+    for verb in VERBS:
+        yo = YO_PRESENT.get(verb, verb[:-2] + "o")
+        subj.update(_subjunctive_forms(verb, yo))
+        forms, participle = _past_forms(verb)
+        past.update(forms)
+        parts.update({participle, participle.replace("ado", "ada"), participle.replace("ido", "ida")})
+        f, c = _future_conditional(verb)
+        fut.update(f)
+        cond.update(c)
+    # Imperfect subjunctive of the commonest verbs
+    subj.update({"fuera", "fueras", "fueran", "tuviera", "tuvieras", "tuvieran", "hiciera",
+                 "pudiera", "quisiera", "supiera", "estuviera", "hubiera", "dijera", "viniera"})
+    # Forms shared with other tenses are resolved by rule order, not here
+    past -= cond
+    subj -= FALSE_SUBJUNCTIVES
+    return subj, past, parts, fut, cond
+
+
+SUBJUNCTIVE, PAST, PARTICIPLES, FUTURE, CONDITIONAL = _build_tables()
+
+_TOKEN          = re.compile(r"[a-záéíóúüñ]+|\d+")
+_POLITE_STRONG  = re.compile("|".join(POLITE_STRONG))
+_POLITE_WEAK    = re.compile("|".join(POLITE_WEAK))
+_GREETING       = re.compile(r"\b(" + "|".join(sorted(GREETINGS, key=len, reverse=True)) + r")\b")
+_COND_ENDING    = re.compile(r"(ar|er|ir|tendr|har|pondr|saldr|vendr|dir|podr|querr|sabr|habr|cabr|valdr)(ía|ías|íamos|íais|ían)$")
+_FUT_ENDING     = re.compile(r"(ar|er|ir|tendr|har|pondr|saldr|vendr|dir|podr|querr|sabr|habr)(é|ás|á|emos|éis|án)$")
+_INFINITIVE     = re.compile(r"[a-záéíóúñ]{2,}(ar|er|ir|ír)(" + "|".join(CLITICS) + r")?(" + "|".join(CLITICS) + r")?$")
+
+
+# ── Rules ────────────────────────────────────────────────────────────────────
+
+def _is_infinitive(word: str) -> bool:
+    return word not in NON_INFINITIVES and bool(_INFINITIVE.match(word))
+
+
+def _is_conditional(word: str) -> bool:
+    return word not in FALSE_CONDITIONALS and (word in CONDITIONAL or bool(_COND_ENDING.search(word)))
+
+
+def _is_future(word: str) -> bool:
+    return word in FUTURE or (len(word) > 4 and bool(_FUT_ENDING.search(word)) and word not in NON_INFINITIVES)
+
+
+def _subjunctive(text, tokens):
+    if "ojalá" in tokens:
+        return True
+    for i, tok in enumerate(tokens):
+        if tok in SUBJ_TRIGGERS:
+            window = tokens[i + 1:i + 5]
+            if any(w in SUBJUNCTIVE for w in window):
+                return True
+    return False
+
+
+def _past(text, tokens):
+    for i, tok in enumerate(tokens):
+        if tok in PAST:
+            return True
+        if tok in HABER_AUX and i + 1 < len(tokens) and tokens[i + 1] in PARTICIPLES:
+            return True
+        if tok in HABER_AUX and i + 2 < len(tokens) and tokens[i + 2] in PARTICIPLES:
+            return True
+    return False
+
+
+def _future(text, tokens):
+    for i, tok in enumerate(tokens[:-2]):
+        if tok in IR_PRESENT and tokens[i + 1] == "a" and _is_infinitive(tokens[i + 2]):
+            return True
+    return any(_is_future(t) for t in tokens)
+
+
+def _complex(text, tokens):
+    content = [t for t in tokens if not t.isdigit()]
+    if len(content) < 7:
+        return False
+    return any(t in SUBORDINATORS for t in content[1:])
+
+
+def _greeting(text, tokens):
+    """A short line that is mostly a greeting."""
+    match = _GREETING.findall(text)
+    if not match:
+        return False
+    greeting_words = sum(len(m.split()) for m in match)
+    return len(tokens) - greeting_words <= 2
+
+
+def _question(text, tokens):
+    return "¿" in text or text.rstrip().endswith("?") or (tokens and tokens[0] in QUESTION_WORDS)
+
+
+RULES = [
+    ("subjunctive",    _subjunctive),
+    ("polite_request", lambda text, tokens: bool(_POLITE_STRONG.search(text))),
+    ("conditional",    lambda text, tokens: any(_is_conditional(t) for t in tokens)),
+    ("past_simple",    _past),
+    ("future",         _future),
+    ("polite_request", lambda text, tokens: bool(_POLITE_WEAK.search(text))),
+    ("greeting",       _greeting),
+    ("complex",        _complex),
+    ("negation",       lambda text, tokens: any(t in NEGATORS for t in tokens)),
+    ("basic_question", _question),
+    ("number",         lambda text, tokens: any(t.isdigit() for t in tokens)
+                                            or (len(tokens) <= 5 and any(t in NUMBER_WORDS for t in tokens))),
+]
+
+
+# ── Public API ───────────────────────────────────────────────────────────────
+
+@lru_cache(maxsize=4096)
+def tag(sentence: str) -> str:
+    """The grammar pattern (a PATTERN_LABELS key) a learner needs to say `sentence`."""
+    text   = sentence.lower().strip()
+    tokens = _TOKEN.findall(text)
+    for pattern, rule in RULES:
+        if rule(text, tokens):
+            return pattern
+    return "present_simple"
+
+
+def tag_batch(sentences) -> list:
+    """Tag many sentences (e.g. every line of a dialogue) in one call."""
+    return [tag(s) for s in sentences]
+
+
+# ── Accuracy benchmark ───────────────────────────────────────────────────────
+
+LABELLED = [
+    ("Hola, buenas tardes.", "greeting"),
+    ("¡Buenos días! ¿Qué tal?", "greeting"),
+    ("Encantada de conocerte.", "greeting"),
+    ("Hasta luego, gracias.", "greeting"),
+    ("¿Dónde está la estación?", "basic_question"),
+    ("¿Cuánto cuesta este abrigo?", "basic_question"),
+    ("¿Tiene una talla más grande?", "basic_question"),
+    ("¿A qué hora sale el tren?", "basic_question"),
+    ("¿Hay una farmacia cerca?", "basic_question"),
+    ("Quería una mesa para dos, por favor.", "polite_request"),
+    ("¿Me trae la cuenta, por favor?", "polite_request"),
+    ("¿Podría ayudarme con la maleta?", "polite_request"),
+    ("Me gustaría reservar una habitación.", "polite_request"),
+    ("Quisiera cambiar la cita.", "polite_request"),
+    ("¿Me pone un café con leche?", "polite_request"),
+    ("Un agua sin gas, por favor.", "polite_request"),
+    ("¿Le importaría cerrar la ventana?", "polite_request"),
+    ("¿Puede repetirlo más despacio?", "polite_request"),
+    ("No como carne.", "negation"),
+    ("No tengo reserva.", "negation"),
+    ("Nunca he estado aquí.", "past_simple"),
+    ("No hay agua caliente.", "negation"),
+    ("Tampoco funciona la luz.", "negation"),
+    ("Voy a tomar el pescado.", "future"),
+    ("Vamos a llegar tarde.", "future"),
+    ("Mañana te llamaré.", "future"),
+    ("Va a hacer calor esta tarde.", "future"),
+    ("Tendré que volver mañana.", "future"),
+    ("Ayer llegué a Madrid.", "past_simple"),
+    ("La calefacción se rompió el lunes.", "past_simple"),
+    ("He perdido mi pasaporte.", "past_simple"),
+    ("El grifo no funcionaba esta mañana.", "past_simple"),
+    ("Fui al médico la semana pasada.", "past_simple"),
+    ("Cuando era pequeño vivía en Sevilla.", "past_simple"),
+    ("Trabajé tres años en Londres.", "past_simple"),
+    ("Compraría el más barato.", "conditional"),
+    ("Yo en tu lugar iría en metro.", "conditional"),
+    ("Sería mejor salir temprano.", "conditional"),
+    ("Tendría que hablar con el casero.", "conditional"),
+    ("Espero que te guste la comida.", "subjunctive"),
+    ("Quiero que arregle la calefacción hoy.", "subjunctive"),
+    ("Ojalá haga buen tiempo.", "subjunctive"),
+    ("Es importante que llegues a tiempo.", "subjunctive"),
+    ("Necesito que me ayudes.", "subjunctive"),
+    ("Cuando llegues, llámame.", "subjunctive"),
+    ("Si tuviera tiempo, viajaría más.", "subjunctive"),
+    ("Llevo dos semanas sin calefacción porque el técnico está de vacaciones.", "complex"),
+    ("Creo que el apartamento es demasiado caro para nosotros.", "complex"),
+    ("Tengo experiencia en marketing y hablo tres idiomas con fluidez.", "present_simple"),
+    ("La chica que trabaja en la tienda es muy simpática.", "complex"),
+    ("Son veinte euros.", "number"),
+    ("Somos cuatro.", "number"),
+    ("Mi número es el 6 5 4.", "number"),
+    ("Me duele la cabeza.", "present_simple"),
+    ("Busco un piso en el centro.", "present_simple"),
+    ("Estoy de vacaciones.", "present_simple"),
+    ("Trabajo en una empresa de software.", "present_simple"),
+    ("Soy alérgico a los frutos secos.", "present_simple"),
+    ("Necesito un taxi al aeropuerto.", "present_simple"),
+    ("La cafetería está en la esquina.", "present_simple"),
+    ("Me encanta esta camisa.", "present_simple"),
+    ("Creo que vamos a llegar tarde.", "future"),
+    ("Si llueve, no vamos.", "negation"),
+]
+
+# Written after the rules were frozen and never used to tune them — the
+# honest estimate of accuracy on new lines. LABELLED is the development set.
+HELD_OUT = [
+    ("Buenas noches, ¿qué tal el día?", "greeting"),
+    ("Mucho gusto, soy Ana.", "greeting"),
+    ("¿Cuándo abre el museo?", "basic_question"),
+    ("¿Cómo se llama usted?", "basic_question"),
+    ("¿Está libre esta mesa?", "basic_question"),
+    ("¿Quién es el último de la cola?", "basic_question"),
+    ("¿Me da una bolsa, por favor?", "polite_request"),
+    ("¿Podrías abrir la puerta?", "polite_request"),
+    ("Me gustaría probar el vino de la casa.", "polite_request"),
+    ("Dos cafés, por favor.", "polite_request"),
+    ("No entiendo la pregunta.", "negation"),
+    ("No queda ninguna habitación.", "negation"),
+    ("Nadie contesta al teléfono.", "negation"),
+    ("Voy a pedir la paella.", "future"),
+    ("El tren va a salir con retraso.", "future"),
+    ("Volveremos el año que viene.", "future"),
+    ("Te escribiré un mensaje.", "future"),
+    ("Ayer cenamos en un restaurante japonés.", "past_simple"),
+    ("El vuelo salió a las ocho.", "past_simple"),
+    ("Hemos reservado una habitación doble.", "past_simple"),
+    ("Antes vivíamos en el campo.", "past_simple"),
+    ("Me dejé las llaves en el coche.", "past_simple"),
+    ("Preferiría una habitación con vistas.", "conditional"),
+    ("Con más dinero compraría una casa.", "conditional"),
+    ("Deberías descansar un poco.", "conditional"),
+    ("Quiero que me expliques el contrato.", "subjunctive"),
+    ("Ojalá no llueva mañana.", "subjunctive"),
+    ("Cuando salgas, cierra la puerta.", "subjunctive"),
+    ("Es mejor que pidamos un taxi.", "subjunctive"),
+    ("Aunque sea caro, lo compro.", "subjunctive"),
+    ("Pienso que el barrio es tranquilo y bastante seguro por la noche.", "complex"),
+    ("Me quedo en casa porque estoy muy cansado hoy.", "complex"),
+    ("El hombre que vive arriba hace mucho ruido.", "complex"),
+    ("Son las tres y media.", "number"),
+    ("Quiero tres billetes.", "number"),
+    ("Tengo una reserva a nombre de García.", "present_simple"),
+    ("Estudio español en una academia.", "present_simple"),
+    ("El autobús para en la plaza.", "present_simple"),
+    ("Mi hermana trabaja en un hospital.", "present_simple"),
+    ("Hace mucho frío aquí.", "present_simple"),
+]
+
+
+if __name__ == "__main__":
+    from collections import Counter
+
+    def evaluate(name: str, labelled: list):
+        correct, baseline, confusion = 0, 0, Counter()
+        for sentence, gold in labelled:
+            predicted = tag(sentence)
+            correct  += predicted == gold
+            baseline += gold == "present_simple"
+            if predicted != gold:
+                confusion[(gold, predicted)] += 1
+                print(f"  ✗ {sentence!r}: expected {gold}, got {predicted}")
+        n = len(labelled)
+        print(f"{name}: {correct}/{n} = {correct / n:.0%}"
+              f"  (old 'present_simple' default: {baseline / n:.0%})")
+        for (gold, predicted), count in confusion.most_common():
+            print(f"  {gold:>15} → {predicted:<15} ×{count}")
+
+    evaluate("development set (rules written against it)", LABELLED)
+    evaluate("held-out accuracy", HELD_OUT)
+
+    sentences = [s for s, _ in LABELLED + HELD_OUT]
+    n = len(sentences)
+    tag.cache_clear()
+    start = time.perf_counter()
+    tag_batch(sentences)
+    cold = (time.perf_counter() - start) / n * 1e6
+    start = time.perf_counter()
+    for _ in range(100):
+        tag_batch(sentences)
+    warm = (time.perf_counter() - start) / (100 * n) * 1e6
+    print(f"\ntagging: {cold:.0f} µs/line uncached, {warm:.2f} µs/line memoised"
+          f"  ({len(SUBJUNCTIVE) + len(PAST) + len(FUTURE) + len(CONDITIONAL)} table forms)")
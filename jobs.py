@@ -0,0 +1,186 @@
+"""
+jobs.py
+───────
+Background jobs for slow model calls (recommendation, conversation feedback).
+
+submit() starts the work on a bounded worker pool and returns a job id at
+once, so the page renders immediately and fills the result in when it
+lands. Job ids are derived from the job's kind and identity, so submitting
+the same work twice — from a rerun, a reload or a speculative prefetch —
+returns the same id instead of a second model call.
+
+Finished results are persisted as JSON under JOBS_DIR and served from
+there for RESULT_TTL, so a page reload doesn't redo the work. In memory
+only the MAX_RESULTS most recently used are kept, and they expire after
+RESULT_TTL too; older ones are read back from disk when asked for. Failed
+jobs are not persisted; submitting them again retries.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR    = os.environ.get("CONVOREADY_JOBS_DIR", os.path.join(".convoready", "jobs"))
+MAX_WORKERS = 4
+RESULT_TTL  = 7 * 86400          # seconds a persisted result stays valid
+MAX_RESULTS = 1000               # finished results kept in memory (LRU)
+
+PENDING, RUNNING, DONE, FAILED, UNKNOWN = "pending", "running", "done", "failed", "unknown"
+
+
+def job_id(kind: str, identity) -> str:
+    """Stable id for a job: same kind + identity → same id, across sessions and restarts."""
+    raw = json.dumps([kind, identity], sort_keys=True, ensure_ascii=False, default=str)
+    return f"{kind}-{hashlib.sha256(raw.encode()).hexdigest()[:16]}"
+
+
+class JobQueue:
+
+    def __init__(self, directory: str = JOBS_DIR, max_workers: int = MAX_WORKERS,
+                 max_results: int = MAX_RESULTS):
+        self.directory   = directory
+        self.max_results = max_results
+        self._pool       = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._futures    = {}                # id -> Future, while queued or running
+        self._results    = OrderedDict()     # id -> (finished, result), least recently used first
+        self._failed     = set()
+        self._lock       = threading.Lock()
+
+    # ── submit / subscribe ───────────────────────────────────────────────────
+
+    def submit(self, kind: str, identity, fn, *args, **kwargs) -> str:
+        """Run fn(*args, **kwargs) in the background unless this job is done or in flight."""
+        return self.start(kind, identity, fn, *args, **kwargs)[0]
+
+    def start(self, kind: str, identity, fn, *args, **kwargs) -> tuple:
+        """submit(), returning (job id, True if this call started the work rather than finding it)."""
+        jid = job_id(kind, identity)
+        with self._lock:
+            if jid in self._futures or self._cached(jid):
+                return jid, False
+        if self._load(jid):
+            return jid, False
+        with self._lock:
+            if jid in self._futures or self._cached(jid):
+                return jid, False
+            self._failed.discard(jid)
+            future = self._pool.submit(self._run, jid, fn, args, kwargs)
+            self._futures[jid] = future
+        future.add_done_callback(lambda f, jid=jid: self._forget_cancelled(jid, f))
+        return jid, True
+
+    def subscribe(self, jid: str, callback):
+        """Call callback(result) once the job finishes (immediately if it already has)."""
+        with self._lock:
+            future = self._futures.get(jid)
+        if future is not None:
+            future.add_done_callback(lambda f: callback(self.result(jid)))
+        elif self.status(jid) == DONE:
+            callback(self.result(jid))
+
+    def future(self, jid: str):
+        """The in-flight Future for a job, or None once it has finished."""
+        with self._lock:
+            return self._futures.get(jid)
+
+    # ── polling ──────────────────────────────────────────────────────────────
+
+    def status(self, jid: str) -> str:
+        with self._lock:
+            if self._cached(jid):
+                return DONE
+            if jid in self._failed:
+                return FAILED
+            future = self._futures.get(jid)
+        if future is not None:
+            return RUNNING if future.running() else PENDING
+        return DONE if self._load(jid) else UNKNOWN
+
+    def result(self, jid: str):
+        """The job's result, or None if it hasn't finished (or failed)."""
+        with self._lock:
+            if self._cached(jid):
+                return self._results[jid][1]
+        if not self._load(jid):
+            return None
+        with self._lock:
+            entry = self._results.get(jid)
+            return entry[1] if entry else None
+
+    # ── internals ────────────────────────────────────────────────────────────
+
+    def _run(self, jid: str, fn, args, kwargs):
+        started = time.time()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            logger.warning("Job %s failed: %s", jid, e)
+            with self._lock:
+                self._failed.add(jid)
+                self._futures.pop(jid, None)
+            raise
+        with self._lock:
+            self._remember(jid, time.time(), result)
+            self._futures.pop(jid, None)
+        self._save(jid, result, time.time() - started)
+        return result
+
+    def _cached(self, jid: str) -> bool:
+        """Whether a fresh result for jid is held in memory; drops it once expired. Call with the lock."""
+        entry = self._results.get(jid)
+        if entry is None:
+            return False
+        if time.time() - entry[0] > RESULT_TTL:
+            del self._results[jid]
+            return False
+        self._results.move_to_end(jid)
+        return True
+
+    def _remember(self, jid: str, finished: float, result):
+        """Hold a result in memory, evicting the least recently used beyond max_results. Call with the lock."""
+        self._results[jid] = (finished, result)
+        self._results.move_to_end(jid)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    def _forget_cancelled(self, jid: str, future):
+        if future.cancelled():
+            with self._lock:
+                self._futures.pop(jid, None)
+
+    def _path(self, jid: str) -> str:
+        return os.path.join(self.directory, f"{jid}.json")
+
+    def _load(self, jid: str) -> bool:
+        try:
+            with open(self._path(jid)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return False
+        finished = record.get("finished", 0)
+        if time.time() - finished > RESULT_TTL:
+            return False
+        with self._lock:
+            self._remember(jid, finished, record.get("result"))
+        return True
+
+    def _save(self, jid: str, result, seconds: float):
+        record = {"id": jid, "result": result, "finished": time.time(), "seconds": round(seconds, 3)}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f"{self._path(jid)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp, self._path(jid))
+        except (OSError, TypeError) as e:
+            logger.warning("Could not persist job %s: %s", jid, e)
+
+
+JOBS = JobQueue()
@@ -0,0 +1,346 @@
+"""
+lang_id.py
+──────────
+Local English / Spanish identification for conversation practice messages.
+
+A compact character n-gram model (1–4-grams, add-k smoothing) trained at
+import from the short seed texts below — no network, no dependencies. Each
+word is scored separately, so mixed messages can be judged by how much of
+them is English:
+
+  "en"       mostly English, with English function words, no Spanish ones
+             and at least MIN_EN_WORDS words — answered locally with
+             ENGLISH_REPLY
+  "es"       mostly Spanish — sent to the model as usual
+  "mixed"    both (e.g. a Spanish attempt with an English word in it) —
+             sent to the model, which corrects it in character
+  "unknown"  too short to judge ("ok", "jaja", "?", "Thank you")
+
+Only "en" is answered without the model, so it is deliberately strict:
+unaccented Spanish ("Hablas ingles?", "Puedo ver el menu") can read as
+English letter by letter, and a wrong "en" sends a Spanish speaker the
+canned English reply. Anything doubtful goes to the model instead.
+
+Run `python lang_id.py` for precision / recall on the labelled test set,
+precision of "en" on a held-out set of learner messages, and per-message
+latency.
+"""
+
+import math
+import re
+import time
+from collections import Counter
+from functools import lru_cache
+
+ENGLISH_REPLY = {"spanish": "¡En español, por favor!", "english": "Try to say it in Spanish. 💪"}
+
+EN_THRESHOLD = 0.6      # English share of words at or above which a message is "en"
+ES_THRESHOLD = 0.3      # ... at or below which it is "es"
+MIN_LETTERS  = 4
+MIN_EN_WORDS = 3        # fewer words than this are never judged "en"
+NGRAM_ORDERS = (1, 2, 3, 4)
+SMOOTHING    = 0.5
+
+# ── Seed texts ───────────────────────────────────────────────────────────────
+# Everyday messages of the kind learners type in practice conversations.
+
+_SEED = {
+    "en": """
+    hello hi good morning good evening how are you I am fine thank you thanks a lot please
+    sorry excuse me I don't understand can you repeat that more slowly what does that mean
+    I would like a table for two do you have a menu in english what do you recommend
+    can I have the bill please how much is it where is the bathroom is there a pharmacy near here
+    I need a taxi to the airport how long does it take I am looking for the train station
+    my heater is broken and the landlord has not fixed it yet I want to complain about the noise
+    I have a reservation under my name for three nights is breakfast included
+    I am allergic to nuts I don't eat meat could I get the fish with some water
+    what time does the shop close do you have this in a bigger size can I try it on
+    I feel sick I have a headache and a fever since yesterday I need to see a doctor
+    nice to meet you my name is and I work as a software engineer in the city
+    I think that is too expensive is there anything cheaper what about this one
+    I was there last week and it was really good we should go again tomorrow night
+    yes no maybe of course that sounds great okay let me think about it
+    the weather is nice today would you like to have a drink with me after work
+    I don't know how to say this in spanish sorry my spanish is not very good
+    could you help me with my luggage where should I put it thank you very much
+    this is the first time I have been to spain I really love the food here
+    what should I say next I'm not sure which one is right how do you say
+    """,
+    "es": """
+    hola buenos días buenas tardes buenas noches qué tal cómo estás estoy bien gracias
+    por favor perdón disculpe no entiendo puede repetir más despacio qué significa eso
+    quería una mesa para dos tiene una carta en inglés qué me recomienda
+    me trae la cuenta por favor cuánto cuesta dónde está el baño hay una farmacia cerca de aquí
+    necesito un taxi al aeropuerto cuánto tarda busco la estación de tren
+    la calefacción está rota y el casero todavía no la ha arreglado quiero quejarme del ruido
+    tengo una reserva a mi nombre para tres noches está incluido el desayuno
+    soy alérgico a los frutos secos no como carne me pone el pescado con un poco de agua
+    a qué hora cierra la tienda tiene esto en una talla más grande me lo puedo probar
+    me encuentro mal me duele la cabeza y tengo fiebre desde ayer necesito ver a un médico
+    encantado de conocerte me llamo y trabajo como ingeniero de software en la ciudad
+    creo que es demasiado caro hay algo más barato y este qué tal
+    estuve allí la semana pasada y estaba muy bueno deberíamos volver mañana por la noche
+    sí no quizás claro que sí me parece genial vale déjame pensarlo
+    hace buen tiempo hoy te apetece tomar algo conmigo después del trabajo
+    no sé cómo decir esto en español lo siento mi español no es muy bueno
+    me puede ayudar con el equipaje dónde lo pongo muchas gracias
+    es la primera vez que vengo a españa me encanta la comida de aquí
+    qué debería decir ahora no estoy seguro de cuál es correcto cómo se dice
+    yo quiero un café con leche y una tostada para llevar vamos a pedir la cuenta
+    """,
+}
+
+# High-frequency function words: strong evidence on their own
+_STOPWORDS = {
+    "en": {"the", "is", "are", "you", "what", "where", "how", "can", "could", "would", "please",
+           "thanks", "thank", "i", "i'm", "my", "it", "this", "that", "with", "have", "do", "does",
+           "don't", "want", "need", "like", "and", "of", "to", "for", "yes", "hello", "sorry",
+           "we", "they", "he", "she", "was", "were", "be", "will", "get", "which", "there"},
+    "es": {"el", "la", "los", "las", "es", "está", "qué", "dónde", "cómo", "puede", "por",
+           "favor", "gracias", "yo", "mi", "que", "de", "con", "tengo", "quiero", "necesito",
+           "una", "un", "y", "para", "sí", "hola", "perdón", "muy", "no"},
+}
+
+# An "en" verdict needs at least one of these: English function words that
+# are not also Spanish words (so no "a", "he", "me", "no")
+_EN_FUNCTION_WORDS = {"the", "an", "is", "are", "am", "was", "were", "be", "do", "does", "did",
+                      "don't", "doesn't", "didn't", "i", "i'm", "i'd", "you", "your", "it", "it's",
+                      "this", "that", "what", "where", "when", "how", "which", "can", "could",
+                      "would", "will", "have", "has", "my", "we", "they", "she", "to", "of",
+                      "and", "for", "in", "on", "at", "with", "there"}
+
+# ... and none of these, or it is a Spanish attempt with English words in it
+_ES_FUNCTION_WORDS = _STOPWORDS["es"] - _STOPWORDS["en"] - {"no"}
+
+# Spanish-only letters settle a word immediately
+_SPANISH_CHARS = set("ñáéíóúü¿¡")
+_WORD          = re.compile(r"[a-zA-Záéíóúüñ']+")
+_NOISE         = re.compile(r"^(ja|je|ji|ha|he|hi|xd|lol|ok|okay|mm+|ah+|eh+|uh+)+$")
+
+
+def _words(message: str) -> list:
+    """Words of the message, without laughter / filler tokens."""
+    return [w for w in _WORD.findall(message.lower()) if not _NOISE.match(w)]
+
+
+def _ngrams(word: str):
+    padded = f"^{word}$"
+    for n in NGRAM_ORDERS:
+        for i in range(len(padded) - n + 1):
+            yield padded[i:i + n]
+
+
+def _train():
+    models = {}
+    for lang, text in _SEED.items():
+        counts = Counter()
+        for word in _WORD.findall(text.lower()):
+            counts.update(_ngrams(word))
+        totals = Counter()
+        for gram, c in counts.items():
+            totals[len(gram)] += c
+        models[lang] = (counts, totals)
+    vocab = {n: len({g for m in models.values() for g in m[0] if len(g) == n}) for n in NGRAM_ORDERS}
+    return models, vocab
+
+
+_MODELS, _VOCAB = _train()
+
+
+def _log_prob(word: str, lang: str) -> float:
+    counts, totals = _MODELS[lang]
+    return sum(math.log((counts.get(g, 0) + SMOOTHING) / (totals[len(g)] + SMOOTHING * _VOCAB[len(g)]))
+               for g in _ngrams(word))
+
+
+@lru_cache(maxsize=8192)
+def word_english_probability(word: str) -> float:
+    """P(English | word) under equal priors."""
+    word = word.lower()
+    if any(c in _SPANISH_CHARS for c in word):
+        return 0.0
+    if word in _STOPWORDS["en"] and word not in _STOPWORDS["es"]:
+        return 0.97
+    if word in _STOPWORDS["es"] and word not in _STOPWORDS["en"]:
+        return 0.03
+    diff = _log_prob(word, "en") - _log_prob(word, "es")
+    return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, diff))))
+
+
+def english_share(message: str) -> float:
+    """Share of the message's words that read as English (0–1)."""
+    words = _words(message)
+    if not words:
+        return 0.0
+    return sum(word_english_probability(w) for w in words) / len(words)
+
+
+def detect_language(message: str) -> str:
+    """'en', 'es', 'mixed' or 'unknown' — see module docstring."""
+    if any(c in "¿¡ñ" for c in message):
+        return "es" if english_share(message) < EN_THRESHOLD else "mixed"
+    words   = _words(message)
+    letters = sum(len(w) for w in words)
+    if letters < MIN_LETTERS:
+        return "unknown"
+    share = english_share(message)
+    if share >= EN_THRESHOLD:
+        if len(words) < MIN_EN_WORDS:
+            return "unknown"
+        if _EN_FUNCTION_WORDS.intersection(words) and not _ES_FUNCTION_WORDS.intersection(words):
+            return "en"
+        return "mixed"
+    if share <= ES_THRESHOLD:
+        return "es"
+    return "mixed"
+
+
+# ── Evaluation ───────────────────────────────────────────────────────────────
+
+TEST_SET = [
+    ("Hi, can I get a coffee please?", "en"),
+    ("How do you say bill in Spanish?", "en"),
+    ("I don't know what to say", "en"),
+    ("Where is the nearest metro station", "en"),
+    ("My room is too cold, the heating doesn't work", "en"),
+    ("Sorry, I didn't understand", "en"),
+    ("What time is checkout tomorrow?", "en"),
+    ("I'd like to book a table for tonight", "en"),
+    ("Can you speak slower", "en"),
+    ("ok thanks, how much does the taxi cost", "en"),
+    ("I want the paella", "en"),
+    ("Is the museum open on Mondays?", "en"),
+    ("Can I have la cuenta please", "mixed"),
+    ("yes that works for me", "en"),
+    ("we are four people", "en"),
+    ("Hola, quiero una mesa para dos", "es"),
+    ("¿Cuánto cuesta el taxi al aeropuerto?", "es"),
+    ("Mi calefaccion no funciona desde el lunes", "es"),
+    ("Me duele la cabeza", "es"),
+    ("Quiero pagar con tarjeta", "es"),
+    ("Yo tengo una reserva para tres noches", "es"),
+    ("Perdon, no entiendo", "es"),
+    ("Buenas tardes, busco una farmacia", "es"),
+    ("La habitacion es muy pequena", "es"),
+    ("Vale, gracias, hasta luego", "es"),
+    ("Necesito un medico urgente", "es"),
+    ("Donde esta la estacion de tren", "es"),
+    ("Soy de Inglaterra y trabajo en Madrid", "es"),
+    ("Quiero el pescado por favor", "es"),
+    ("Tiene esto en talla mediana", "es"),
+    ("Perfect, see you at eight then", "en"),
+    ("The soup was cold when it arrived", "en"),
+    ("Es posible cambiar la fecha del vuelo", "es"),
+    ("Pues nada, me quedo con la camisa azul", "es"),
+    ("Quiero un sandwich de jamón, please", "mixed"),
+    ("Yo quiero the chicken por favor", "mixed"),
+    ("Quiero cambiar my booking", "mixed"),
+    ("ok", "unknown"),
+    ("jaja", "unknown"),
+]
+
+# Held out: learner-style messages written apart from _SEED (which TEST_SET
+# borrows from), mostly unaccented and many only one to three words long.
+# Precision of "en" here is the figure that matters: a false "en" sends a
+# Spanish speaker the canned English reply.
+HELD_OUT = [
+    ("Hablas ingles?", "es"),
+    ("Tengo hambre", "es"),
+    ("No se", "es"),
+    ("Me llamo Tom", "es"),
+    ("Puedo ver el menu", "es"),
+    ("Si", "es"),
+    ("Claro", "es"),
+    ("Gracias", "es"),
+    ("Hasta manana", "es"),
+    ("Tienes wifi", "es"),
+    ("Una cerveza", "es"),
+    ("Cuanto es", "es"),
+    ("Donde vives", "es"),
+    ("Hace frio", "es"),
+    ("Como te llamas", "es"),
+    ("Tienen mesa libre", "es"),
+    ("Pienso que si", "es"),
+    ("Estoy cansado", "es"),
+    ("Me encanta Madrid", "es"),
+    ("Tal vez manana", "es"),
+    ("Puedes hablar mas lento", "es"),
+    ("Mi hermano vive en Londres", "es"),
+    ("A que hora sale el autobus", "es"),
+    ("Hay que pagar la entrada", "es"),
+    ("El hotel tiene piscina", "es"),
+    ("Prefiero el vino tinto", "es"),
+    ("Ayer fui al cine con mis amigos", "es"),
+    ("No tengo cambio, lo siento", "es"),
+    ("Me pone otra cerveza", "es"),
+    ("Tiene un mapa de la ciudad", "es"),
+    ("Thanks", "en"),
+    ("Thank you", "en"),
+    ("Help", "en"),
+    ("I'm lost", "en"),
+    ("Yes please", "en"),
+    ("Too fast", "en"),
+    ("sorry what?", "en"),
+    ("I have no idea what you said", "en"),
+    ("What does that word mean", "en"),
+    ("Can you repeat", "en"),
+    ("Speak English please", "en"),
+    ("I don't get it", "en"),
+    ("Where is it", "en"),
+    ("How do I say check", "en"),
+    ("See you later", "en"),
+    ("Is it far from here", "en"),
+    ("My phone battery died", "en"),
+    ("Could we sit outside", "en"),
+    ("The bus is late again", "en"),
+    ("I forgot the word for fork", "en"),
+    ("Quiero the window seat", "mixed"),
+    ("Necesito un charger para mi phone", "mixed"),
+    ("ok", "unknown"),
+    ("jajaja", "unknown"),
+    ("?", "unknown"),
+]
+
+
+def _report(predictions, label):
+    tp = sum(1 for _, g, p in predictions if g == label and p == label)
+    fp = sum(1 for _, g, p in predictions if g != label and p == label)
+    fn = sum(1 for _, g, p in predictions if g == label and p != label)
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall    = tp / (tp + fn) if tp + fn else 0.0
+    return precision, recall, tp + fn
+
+
+if __name__ == "__main__":
+    predictions = [(text, gold, detect_language(text)) for text, gold in TEST_SET]
+    for label in ("en", "es"):
+        precision, recall, n = _report(predictions, label)
+        print(f"{label}: precision {precision:.0%}  recall {recall:.0%}  ({n} messages)")
+    accuracy = sum(1 for _, g, p in predictions if g == p) / len(predictions)
+    print(f"overall accuracy (en / es / mixed / unknown): {accuracy:.0%}")
+    for text, gold, predicted in predictions:
+        if gold != predicted:
+            print(f"  ✗ {text!r}: expected {gold}, got {predicted} (English share {english_share(text):.2f})")
+
+    held_out = [(text, gold, detect_language(text)) for text, gold in HELD_OUT]
+    precision, recall, n = _report(held_out, "en")
+    wrong    = [(t, g) for t, g, p in held_out if p == "en" and g != "en"]
+    deferred = sum(1 for _, g, p in held_out if g == "en" and p != "en")
+    print(f"held out ({len(held_out)} messages): en precision {precision:.0%}  recall {recall:.0%} "
+          f"({n} English; {deferred} left to the model)")
+    for text, gold in wrong:
+        print(f"  ✗ {text!r}: {gold} message answered as English")
+
+    messages = [t for t, _ in TEST_SET]
+    word_english_probability.cache_clear()
+    start = time.perf_counter()
+    for m in messages:
+        detect_language(m)
+    cold = (time.perf_counter() - start) / len(messages) * 1e6
+    start = time.perf_counter()
+    for _ in range(200):
+        for m in messages:
+            detect_language(m)
+    warm = (time.perf_counter() - start) / (200 * len(messages)) * 1e6
+    grams = sum(len(m[0]) for m in _MODELS.values())
+    print(f"latency: {cold:.0f} µs/message cold, {warm:.1f} µs/message warm  ({grams} n-grams)")
@@ -10,10 +10,42 @@ Generates:
 
 Uses gemini-1.5-flash (free tier, fast, sufficient quality for this use case).
 Falls back gracefully to static knowledge base content if API call fails.
+
+Every entry point runs inside telemetry.track_call(), which records latency,
+time-to-first-byte, token usage, parse failures and fallbacks per function.
+Model calls go through resilience.py: per-function latency budgets, retries
+on retryable errors, hedged requests and a shared circuit breaker, so a
+Gemini outage falls through to the fallbacks immediately instead of hanging.
+JSON responses are requested against a schema and decoded by
+response_decoding.py, which repairs or drops bad items instead of
+discarding the whole response. Before any of that, each call is admitted
+by rate_limiter.SCHEDULER, which enforces the key's RPM / TPM quota across
+all sessions with chat ahead of scenarios ahead of background work; a call
+whose queue wait would eat its budget is shed straight to its fallback.
+Identical requests in flight at the same time (a class all opening the same
+example scenario) share one call through singleflight.py.
 """
 
 import json
-import streamlit as st
+import logging
+import os
+import threading
+
+try:
+    import streamlit as st
+except ImportError:            # headless: core.py / api_server.py
+    st = None
+
+from chat_history import model_text, transcript_line
+from lang_id import ENGLISH_REPLY, detect_language
+from rate_limiter import BACKGROUND, CHAT, SCENARIO, SCHEDULER, RateLimited
+from resilience import CallTimeout, CircuitBreaker, CircuitOpen, Policy, call_with_resilience
+from response_decoding import (
+    CHAT_SCHEMA, FEEDBACK_SCHEMA, PHRASES_SCHEMA,
+    DecodeError, JsonStream, decode, dialogue_schema, request_config,
+)
+from singleflight import FLIGHTS, flight_key
+from telemetry import REGISTRY, cache_hit, track_call
 
 LEVEL_DESCRIPTIONS = {
     "A1": "absolute beginner — only present tense, very short sentences, basic vocabulary",
@@ -23,34 +55,196 @@ LEVEL_DESCRIPTIONS = {
 
 DIALOGUE_LENGTHS = {"A1": 6, "A2": 8, "B1": 10}
 
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+def _warn(message: str):
+    """Show a warning in the Streamlit page, or log it when running headless."""
+    if st is not None and st.runtime.exists():
+        st.warning(message)
+    else:
+        logger.warning(message)
+
+
+def _gemini_key():
+    if os.environ.get("GEMINI_KEY"):
+        return os.environ["GEMINI_KEY"]
+    return st.secrets.get("GEMINI_KEY", None) if st is not None else None
+
 
 def _get_gemini_client():
-    """Initialise and return Gemini client. Returns None if unavailable."""
+    """Initialise (once per process) and return Gemini client. Returns None if unavailable."""
+    global _client
+    if os.environ.get("CONVOREADY_FAKE_GEMINI"):
+        import fake_gemini
+        return fake_gemini.from_env()
+    if _client is not None:
+        return _client
     try:
         from google import genai
-        key = st.secrets.get("GEMINI_KEY", None)
+        key = _gemini_key()
         if not key:
-            st.warning("⚠️ GEMINI_KEY not found in secrets.")
+            _warn("⚠️ GEMINI_KEY not found in secrets.")
             return None
-        return genai.Client(api_key=key)
+        _client = genai.Client(api_key=key)
+        return _client
     except Exception as e:
-        st.warning(f"⚠️ Could not initialise Gemini: {e}")
+        _warn(f"⚠️ Could not initialise Gemini: {e}")
         return None
 
 MODEL = "gemini-2.5-flash"
 
+# Latency budget per entry point: whole call (incl. retries), per attempt,
+# retries, and when to race a hedged duplicate request.
+LATENCY_BUDGETS = {
+    "generate_phrases":               Policy(budget=25, attempt_timeout=15, retries=1, hedge_after=10),
+    "generate_dialogue":              Policy(budget=25, attempt_timeout=15, retries=1, hedge_after=10),
+    "generate_smart_recommendation":  Policy(budget=12, attempt_timeout=8,  retries=1),
+    "chat_with_local":                Policy(budget=10, attempt_timeout=6,  retries=1, hedge_after=4),
+    "generate_conversation_feedback": Policy(budget=25, attempt_timeout=20, retries=1),
+}
+
+# Queue priority per entry point, and the output tokens each typically
+# produces — the TPM estimate a call is admitted on until usage is known.
+PRIORITIES = {
+    "chat_with_local":                (CHAT,       150),
+    "generate_phrases":               (SCENARIO,   900),
+    "generate_dialogue":              (SCENARIO,  1200),
+    "generate_smart_recommendation":  (BACKGROUND, 150),
+    "generate_conversation_feedback": (BACKGROUND, 600),
+}
+
+# One breaker for the model: an outage affects every entry point alike
+_BREAKER = CircuitBreaker(window=20, min_calls=5, threshold=0.5, cooldown=30.0)
+
+
+def _generate(client, call, contents, schema: dict = None, priority: int = None) -> str:
+    """
+    Model text for `contents`. Identical requests already in flight from
+    other sessions are joined rather than repeated: this caller then waits
+    (up to its latency budget) for the shared call and gets its result, or
+    its error.
+    """
+    name = call.labels["function"]
+    key  = flight_key(name, MODEL, contents, schema)
+    text, _ = FLIGHTS.do(key, lambda: _call_model(client, call, contents, schema, priority),
+                         timeout=LATENCY_BUDGETS[name].budget, labels=call.labels)
+    return text
+
+
+def _call_model(client, call, contents, schema: dict = None, priority: int = None) -> str:
+    """
+    Run one model call under its function's latency budget and the circuit
+    breaker. With a schema, the model is asked for matching JSON; if an array
+    response times out mid-stream, the items already received are used.
+    `priority` overrides the function's queue priority from PRIORITIES, e.g.
+    BACKGROUND for scenario content nobody is waiting for yet.
+
+    The call first queues for quota; it may wait for whatever its budget has
+    left after one attempt, and the wait is taken out of that budget.
+    Raises RateLimited if it would wait longer. Hedged duplicates and retries
+    are upstream requests too: each takes its own quota, without queueing,
+    and fails with RateLimited if there is none. Token use is settled per
+    request once the model reports it.
+    """
+    name    = call.labels["function"]
+    config  = request_config(schema) if schema else None
+    streams = []
+    policy  = LATENCY_BUDGETS[name]
+    default, output_tokens = PRIORITIES[name]
+    priority = default if priority is None else priority
+    estimate = len(str(contents)) // 4 + output_tokens
+    waited   = SCHEDULER.acquire(priority, estimate, policy.budget - policy.attempt_timeout)
+    call.queued(waited)
+    if waited:
+        policy = Policy(policy.budget - waited, policy.attempt_timeout, policy.retries,
+                        policy.hedge_after, policy.backoff)
+    admitted = [True]              # quota already taken for the first request
+    lock     = threading.Lock()
+
+    def attempt():
+        with lock:
+            prepaid = admitted.pop() if admitted else False
+        if not prepaid:
+            SCHEDULER.acquire(priority, estimate, 0.0)
+        stream = JsonStream() if schema and schema["type"] == "ARRAY" else None
+        if stream is not None:
+            streams.append(stream)
+        text, used = _stream(client, call, contents, config, stream)
+        SCHEDULER.settle(estimate, used)
+        return text
+
+    try:
+        return call_with_resilience(attempt, policy, _BREAKER, name)
+    except CallTimeout:
+        best = max(streams, key=lambda s: len(s.items), default=None)
+        if best is None or len(best.items) < schema.get("minItems", 1):
+            raise
+        REGISTRY.inc("convoready_llm_resilience_events_total", {"function": name, "event": "salvaged"})
+        return json.dumps(best.items, ensure_ascii=False)
+
+
+def _decode(call, text: str, schema: dict, defaults: dict = None):
+    """Decode a JSON response against its schema, counting clean / repaired / dropped-item outcomes."""
+    value, repaired, dropped = decode(text, schema, defaults)
+    outcome = "dropped" if dropped else "repaired" if repaired else "clean"
+    REGISTRY.inc("convoready_llm_decode_total", {**call.labels, "outcome": outcome})
+    return value
+
+
+def _fallback_reason(exc: Exception) -> str:
+    if isinstance(exc, CircuitOpen):
+        return "circuit_open"
+    if isinstance(exc, RateLimited):
+        return "rate_limited"
+    if isinstance(exc, CallTimeout):
+        return "timeout"
+    return "error"
+
+
+def _stream(client, call, contents, config=None, stream: JsonStream = None) -> tuple:
+    """
+    Run one streaming generate_content call and return (full text, tokens
+    used — None if the model didn't say). Streaming lets `call` record
+    time-to-first-byte; token usage comes from the usage metadata on the
+    final chunk. Chunks are also fed to `stream`.
+    """
+    chunks, usage = [], None
+    for chunk in client.models.generate_content_stream(model=MODEL, contents=contents, config=config):
+        call.first_byte()
+        if chunk.text:
+            chunks.append(chunk.text)
+            if stream is not None:
+                stream.feed(chunk.text)
+        if getattr(chunk, "usage_metadata", None) is not None:
+            usage = chunk.usage_metadata
+    if usage is None:
+        return "".join(chunks), None
+    call.usage(usage.prompt_token_count, usage.candidates_token_count)
+    return "".join(chunks), (usage.prompt_token_count or 0) + (usage.candidates_token_count or 0)
+
 
 # ── Phrase generation ────────────────────────────────────────────────────────
 
 def generate_phrases(user_scenario: str, scenario_category: str,
-                     level_code: str, fallback_phrases: list) -> list:
+                     level_code: str, fallback_phrases: list, priority: int = None) -> list:
     """
     Generate 6 survival phrases tailored to the user's exact scenario.
     Returns list of {es, en, tip} dicts.
     Falls back to static phrases on any error.
     """
+    with track_call("generate_phrases", MODEL) as call:
+        return _generate_phrases(call, user_scenario, scenario_category,
+                                 level_code, fallback_phrases, priority)
+
+
+def _generate_phrases(call, user_scenario, scenario_category, level_code, fallback_phrases,
+                      priority=None):
     client = _get_gemini_client()
     if client is None:
+        call.fallback("no_client")
         return fallback_phrases
 
     level_desc = LEVEL_DESCRIPTIONS.get(level_code, LEVEL_DESCRIPTIONS["A1"])
@@ -88,18 +282,17 @@ Example format:
 ]"""
 
     try:
-        response = client.models.generate_content(model=MODEL, contents=prompt)
-        text = response.text.strip()
-        # Strip markdown code fences if present
-        if text.startswith("```"):
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
-        phrases = json.loads(text.strip())
-        if isinstance(phrases, list) and len(phrases) > 0:
-            return phrases[:6]
+        text = _generate(client, call, prompt, PHRASES_SCHEMA, priority)
+        return _decode(call, text, PHRASES_SCHEMA,
+                       defaults={"level": level_code, "pattern": "present_simple"})
+    except DecodeError as e:
+        call.parse_failure()
+        call.fallback("parse_failure")
+        _warn(f"⚠️ LLM phrase generation failed: {e} — using static fallback.")
     except Exception as e:
-        st.warning(f"⚠️ LLM phrase generation failed: {e} — using static fallback.")
+        call.error(e)
+        call.fallback(_fallback_reason(e))
+        _warn(f"⚠️ LLM phrase generation failed: {e} — using static fallback.")
 
     return fallback_phrases
 
@@ -107,14 +300,22 @@ Example format:
 # ── Dialogue generation ──────────────────────────────────────────────────────
 
 def generate_dialogue(user_scenario: str, scenario_category: str,
-                      level_code: str, fallback_dialogue: list) -> list:
+                      level_code: str, fallback_dialogue: list, priority: int = None) -> list:
     """
     Generate a practice dialogue tailored to the user's exact scenario.
     Returns list of {speaker, es, en} dicts alternating between 'You' and other party.
     Falls back to static dialogue on any error.
     """
+    with track_call("generate_dialogue", MODEL) as call:
+        return _generate_dialogue(call, user_scenario, scenario_category,
+                                  level_code, fallback_dialogue, priority)
+
+
+def _generate_dialogue(call, user_scenario, scenario_category, level_code, fallback_dialogue,
+                       priority=None):
     client = _get_gemini_client()
     if client is None:
+        call.fallback("no_client")
         return fallback_dialogue
 
     level_desc   = LEVEL_DESCRIPTIONS.get(level_code, LEVEL_DESCRIPTIONS["A1"])
@@ -145,22 +346,43 @@ Rules:
 - Make it realistic and immediately practical
 - No markdown, no explanation, just the JSON array"""
 
+    schema = dialogue_schema(other_speaker)
     try:
-        response = client.models.generate_content(model=MODEL, contents=prompt)
-        text = response.text.strip()
-        if text.startswith("```"):
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
-        dialogue = json.loads(text.strip())
-        if isinstance(dialogue, list) and len(dialogue) >= 4:
-            return dialogue
+        text = _generate(client, call, prompt, schema, priority)
+        return _decode(call, text, schema)
+    except DecodeError as e:
+        call.parse_failure()
+        call.fallback("parse_failure")
+        _warn(f"⚠️ LLM dialogue generation failed: {e} — using static fallback.")
     except Exception as e:
-        st.warning(f"⚠️ LLM dialogue generation failed: {e} — using static fallback.")
+        call.error(e)
+        call.fallback(_fallback_reason(e))
+        _warn(f"⚠️ LLM dialogue generation failed: {e} — using static fallback.")
 
     return fallback_dialogue
 
 
+# ── Scenario content (phrases + dialogue) ────────────────────────────────────
+
+def generate_scenario_content(user_scenario: str, scenario_category: str,
+                              level_code: str, priority: int = None) -> dict:
+    """
+    Generate phrases and dialogue for one scenario without any UI.
+    Returns {"phrases", "dialogue", "primary_key"}, or None if either call
+    fell back — used by background jobs that must not store fallback content.
+    Both calls queue at SCENARIO priority unless `priority` says otherwise.
+    """
+    phrases = generate_phrases(user_scenario, scenario_category, level_code,
+                               fallback_phrases=None, priority=priority)
+    if not phrases:
+        return None
+    dialogue = generate_dialogue(user_scenario, scenario_category, level_code,
+                                 fallback_dialogue=None, priority=priority)
+    if not dialogue:
+        return None
+    return {"phrases": phrases, "dialogue": dialogue, "primary_key": scenario_category}
+
+
 # ── Smart recommendation ─────────────────────────────────────────────────────
 
 def generate_smart_recommendation(struggled_phrases: list,
@@ -173,15 +395,13 @@ def generate_smart_recommendation(struggled_phrases: list,
     actually struggled with in this session.
     Falls back to rule-based recommendation on any error.
     """
-    client = _get_gemini_client()
-    if client is None:
-        return fallback
+    with track_call("generate_smart_recommendation", MODEL) as call:
+        return _generate_smart_recommendation(call, struggled_phrases, pattern_stats,
+                                              scenario, level_code, fallback)
 
-    if not struggled_phrases:
-        return None
-
-    struggled_text = "\n".join([f"- {p['es']} ({p['en']})" for p in struggled_phrases[:5]])
 
+def weak_pattern_text(pattern_stats: dict) -> str:
+    """The learner's weak patterns as the recommendation prompt states them."""
     weak_patterns = []
     for pattern, counts in pattern_stats.items():
         total = counts.get("confident", 0) + counts.get("struggled", 0)
@@ -190,7 +410,21 @@ def generate_smart_recommendation(struggled_phrases: list,
             if rate < 0.7:
                 weak_patterns.append(f"{pattern} ({int(rate*100)}% confident)")
 
-    pattern_text = ", ".join(weak_patterns[:3]) if weak_patterns else "insufficient data yet"
+    return ", ".join(weak_patterns[:3]) if weak_patterns else "insufficient data yet"
+
+
+def _generate_smart_recommendation(call, struggled_phrases, pattern_stats,
+                                   scenario, level_code, fallback):
+    client = _get_gemini_client()
+    if client is None:
+        call.fallback("no_client")
+        return fallback
+
+    if not struggled_phrases:
+        return None
+
+    struggled_text = "\n".join([f"- {p['es']} ({p['en']})" for p in struggled_phrases[:5]])
+    pattern_text   = weak_pattern_text(pattern_stats)
 
     prompt = f"""You are a Spanish language tutor giving personalised feedback to a learner.
 
@@ -211,12 +445,13 @@ Write a SHORT (2-3 sentences max), specific, actionable recommendation.
 - Plain text only, no markdown, no bullet points"""
 
     try:
-        response = client.models.generate_content(model=MODEL, contents=prompt)
-        text = response.text.strip()
+        text = _generate(client, call, prompt).strip()
         if text:
             return text
-    except Exception:
-        pass
+        call.fallback("empty_response")
+    except Exception as e:
+        call.error(e)
+        call.fallback(_fallback_reason(e))
 
     return fallback
 
@@ -253,38 +488,47 @@ Your rules:
 def chat_with_local(chat_history: list, user_message: str,
                     system_prompt: str) -> dict:
     """
-    Send a user message and chat history to Gemini.
+    Send a user message and chat history (chat_history.py turn dicts) to Gemini.
     Returns dict with 'spanish' and 'english' keys.
+    English messages get the fixed "¡En español, por favor!" reply locally
+    (rule 3 of the system prompt) without a model call.
     Falls back to a safe default on error.
     """
+    if detect_language(user_message) == "en":
+        cache_hit("chat_with_local", "lang_id", MODEL)
+        return dict(ENGLISH_REPLY)
+
+    with track_call("chat_with_local", MODEL) as call:
+        return _chat_with_local(call, chat_history, user_message, system_prompt)
+
+
+def _chat_with_local(call, chat_history, user_message, system_prompt):
     client = _get_gemini_client()
     if client is None:
+        call.fallback("no_client")
         return {"spanish": "Lo siento, hay un problema técnico.", "english": "Sorry, there is a technical problem."}
 
     # Build contents list — system prompt as first user turn (Gemini style)
     contents = [{"role": "user",  "parts": [{"text": system_prompt}]},
                 {"role": "model", "parts": [{"text": '{"spanish": "¡Hola! ¿En qué puedo ayudarle?", "english": "Hello! How can I help you?"}'}]}]
 
-    for msg in chat_history:
+    for turn in chat_history:
         contents.append({
-            "role":  "user" if msg["role"] == "user" else "model",
-            "parts": [{"text": msg["content"]}]
+            "role":  "user" if turn["role"] == "user" else "model",
+            "parts": [{"text": model_text(turn)}]
         })
 
     contents.append({"role": "user", "parts": [{"text": user_message}]})
 
     try:
-        response = client.models.generate_content(model=MODEL, contents=contents)
-        text = response.text.strip()
-        if text.startswith("```"):
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
-        parsed = json.loads(text.strip())
-        if "spanish" in parsed and "english" in parsed:
-            return parsed
+        text = _generate(client, call, contents, CHAT_SCHEMA)
+        return _decode(call, text, CHAT_SCHEMA)
+    except DecodeError:
+        call.parse_failure()
+        call.fallback("parse_failure")
     except Exception as e:
-        pass
+        call.error(e)
+        call.fallback(_fallback_reason(e))
 
     return {"spanish": "No entiendo. ¿Puede repetir?", "english": "I don't understand. Can you repeat?"}
 
@@ -295,17 +539,21 @@ def generate_conversation_feedback(chat_history: list, scenario: str,
     Analyse the full conversation and return structured feedback.
     Returns dict with: score (int), summary, strengths, improvements, next_focus
     """
+    with track_call("generate_conversation_feedback", MODEL) as call:
+        return _generate_conversation_feedback(call, chat_history, scenario,
+                                               level_code, weak_patterns)
+
+
+def _generate_conversation_feedback(call, chat_history, scenario, level_code, weak_patterns):
     client = _get_gemini_client()
     if client is None:
+        call.fallback("no_client")
         return None
 
     if len(chat_history) < 2:
         return None
 
-    conversation_text = "\n".join([
-        f"{'User' if m['role'] == 'user' else 'AI'}: {m['content']}"
-        for m in chat_history
-    ])
+    conversation_text = "\n".join([transcript_line(turn) for turn in chat_history])
 
     weak_text = ", ".join([p["label"] for p in weak_patterns[:3]]) if weak_patterns else "none"
 
@@ -328,17 +576,15 @@ Analyse the learner's Spanish and return ONLY a JSON object with these exact fie
 Return only the JSON, no markdown, no explanation."""
 
     try:
-        response = client.models.generate_content(model=MODEL, contents=prompt)
-        text = response.text.strip()
-        if text.startswith("```"):
-            text = text.split("```")[1]
-            if text.startswith("json"):
-                text = text[4:]
-        parsed = json.loads(text.strip())
-        if "score" in parsed and "summary" in parsed:
-            return parsed
-    except Exception:
-        pass
+        text = _generate(client, call, prompt, FEEDBACK_SCHEMA)
+        return _decode(call, text, FEEDBACK_SCHEMA,
+                       defaults={"strengths": [], "improvements": [], "next_focus": ""})
+    except DecodeError:
+        call.parse_failure()
+        call.fallback("parse_failure")
+    except Exception as e:
+        call.error(e)
+        call.fallback(_fallback_reason(e))
 
     return None
 
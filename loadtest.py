@@ -0,0 +1,336 @@
+"""
+loadtest.py
+───────────
+How many simultaneous learners can one server take?
+
+Simulates N virtual learners, each looping a realistic journey against the
+headless engine (core.py) — or a running api_server.py with --url:
+
+  scenario   analyse a scenario and get its phrases + dialogue
+  session    mark every "You" line and record the session to the profile
+  chat       several conversation turns with the tutor
+  feedback   feedback on the finished conversation
+
+Gemini is replaced by fake_gemini.py and Supabase by fake_supabase.py, both
+with configurable latency, and all runtime state goes to a temporary
+directory. Concurrency is ramped through --stages; each stage runs for
+--duration seconds and reports journeys/s and per-step p50/p95/p99. The
+saturation point is the first stage where doubling the learners no longer
+buys MIN_GAIN more throughput; the bottleneck is the step whose latency
+grew the most getting there.
+
+Usage:
+
+    python loadtest.py                                   # 1 … 32 learners, 10 s each
+    python loadtest.py --stages 4,16,64 --gemini-latency 1.5 --rpm 600
+    python loadtest.py --url http://127.0.0.1:8765       # against api_server.py
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+STEPS    = ("scenario", "session", "chat", "feedback")
+MIN_GAIN = 0.10          # throughput gain from the next stage below which the server is saturated
+
+CHAT_MESSAGES = [
+    "Hola, buenas tardes.",
+    "Quería una mesa para dos, por favor.",
+    "¿Cuánto cuesta, por favor?",
+    "¿Me puede ayudar? No entiendo.",
+    "Vale, muchas gracias.",
+    "¿A qué hora cierra?",
+]
+
+
+# ── Targets ──────────────────────────────────────────────────────────────────
+
+class InProcessTarget:
+    """Calls core.py directly, with each virtual learner bound as its own user."""
+
+    def __init__(self, supabase):
+        import core
+        self.core = core
+        core.LEARNERS.client = supabase
+
+    def scenario(self, user_id, text, level):
+        analysis = self.core.analyse(text)
+        self.core.STORE.note_request(text)
+        return {**analysis, **self.core.scenario_content(text, level, analysis["scenarios"])}
+
+    def session(self, user_id, scenario, level, confidence, dialogue):
+        with self.core.LEARNERS.use(user_id):
+            return self.core.record_marks(scenario, level, confidence, dialogue)
+
+    def chat(self, user_id, text, level, history, message):
+        with self.core.LEARNERS.use(user_id):
+            prompt = self.core.conversation_prompt(self.core.primary_scenario(
+                self.core.detect_scenarios(text)), text, level)
+        return self.core.chat(history, message, prompt)
+
+    def feedback(self, user_id, text, level, history):
+        with self.core.LEARNERS.use(user_id):
+            weaknesses = self.core.weaknesses()
+        return self.core.feedback(history, text, level, weaknesses)
+
+
+class HTTPTarget:
+    """The same journey against api_server.py, one keep-alive connection per learner thread."""
+
+    def __init__(self, url: str):
+        parts       = urlsplit(url)
+        self.host   = parts.hostname
+        self.port   = parts.port or 80
+        self._local = threading.local()
+
+    def _post(self, path: str, body: dict):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+        data = json.dumps(body, ensure_ascii=False).encode()
+        try:
+            conn.request("POST", path, data, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            payload  = json.loads(response.read())
+        except (OSError, http.client.HTTPException):
+            self._local.conn = None
+            raise
+        if response.status != 200:
+            raise RuntimeError(f"{path}: HTTP {response.status} {payload.get('error')}")
+        return payload
+
+    def scenario(self, user_id, text, level):
+        return self._post("/scenario", {"user_id": user_id, "text": text, "level": level})
+
+    def session(self, user_id, scenario, level, confidence, dialogue):
+        return self._post("/sessions", {"user_id": user_id, "scenario": scenario, "level": level,
+                                        "confidence": confidence, "dialogue": dialogue})["readiness"]
+
+    def chat(self, user_id, text, level, history, message):
+        return self._post("/chat", {"user_id": user_id, "text": text, "level": level,
+                                    "history": history, "message": message})["reply"]
+
+    def feedback(self, user_id, text, level, history):
+        return self._post("/feedback", {"user_id": user_id, "text": text, "level": level,
+                                        "history": history})["feedback"]
+
+
+# ── Journeys ─────────────────────────────────────────────────────────────────
+
+class Recorder:
+    """Step latencies and errors for one stage."""
+
+    def __init__(self):
+        self.latencies = {s: [] for s in STEPS}
+        self.errors    = {s: 0 for s in STEPS}
+        self.journeys  = 0
+        self._lock     = threading.Lock()
+
+    def step(self, name: str, fn, *args):
+        started = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception:
+            with self._lock:
+                self.errors[name] += 1
+            raise
+        with self._lock:
+            self.latencies[name].append(time.perf_counter() - started)
+        return result
+
+
+def journey(target, recorder: Recorder, user_id: str, rng: random.Random,
+            scenarios: list, unique: float, chat_turns: int, think: float):
+    from chat_history import assistant_turn, user_turn
+    text  = rng.choice(scenarios)
+    if rng.random() < unique:
+        text = f"{text} near {rng.choice(['Madrid', 'Sevilla', 'Valencia', 'Bilbao'])} {rng.randrange(10**6)}"
+    level = rng.choice(["A1", "A2", "B1"])
+
+    data = recorder.step("scenario", target.scenario, user_id, text, level)
+    time.sleep(think)
+    confidence = {f"conf_{i}": "✅" if rng.random() < 0.65 else "❌"
+                  for i, line in enumerate(data["dialogue"]) if line["speaker"] == "You"}
+    recorder.step("session", target.session, user_id, data["primary"], level, confidence, data["dialogue"])
+
+    history = []
+    for _ in range(chat_turns):
+        time.sleep(think)
+        message = rng.choice(CHAT_MESSAGES)
+        reply   = recorder.step("chat", target.chat, user_id, text, level,
+                                [{"role": t["role"], "es": t["es"], "en": t["en"]} for t in history], message)
+        history += [user_turn(message), assistant_turn(reply)]
+    time.sleep(think)
+    recorder.step("feedback", target.feedback, user_id, text, level,
+                  [{"role": t["role"], "es": t["es"], "en": t["en"]} for t in history])
+    with recorder._lock:
+        recorder.journeys += 1
+
+
+def run_stage(target, learners: int, duration: float, args, seed: int) -> dict:
+    from warmup import EXAMPLE_SCENARIOS
+    recorder = Recorder()
+    stop     = threading.Event()
+
+    def learner(n):
+        rng = random.Random(seed * 1000 + n)
+        while not stop.is_set():
+            try:
+                journey(target, recorder, f"vu{n:04d}", rng, EXAMPLE_SCENARIOS,
+                        args.unique, args.chat_turns, args.think)
+            except Exception:
+                pass               # counted by the recorder; start the next journey
+
+    threads = [threading.Thread(target=learner, args=(n,), daemon=True) for n in range(learners)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    steps   = {s: _percentiles(recorder.latencies[s]) for s in STEPS}
+    for s in STEPS:
+        steps[s]["errors"] = recorder.errors[s]
+    return {"learners": learners, "seconds": elapsed, "journeys": recorder.journeys,
+            "throughput": recorder.journeys / elapsed,
+            "steps_per_s": sum(len(v) for v in recorder.latencies.values()) / elapsed,
+            "steps": steps}
+
+
+def _percentiles(values: list) -> dict:
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None}
+    values = sorted(values)
+    pick   = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {"count": len(values), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+# ── Analysis ─────────────────────────────────────────────────────────────────
+
+def saturation(stages: list):
+    """(last stage that still scaled, first that didn't), or None if every stage scaled."""
+    for prev, cur in zip(stages, stages[1:]):
+        if cur["throughput"] < prev["throughput"] * (1 + MIN_GAIN):
+            return prev, cur
+    return None
+
+
+def bottleneck(first: dict, saturated: dict):
+    """The step whose p95 grew most from the first stage to the saturated one, with the growth factor."""
+    growth = {}
+    for s in STEPS:
+        a, b = first["steps"][s]["p95"], saturated["steps"][s]["p95"]
+        if a and b:
+            growth[s] = b / a
+    if not growth:
+        return None, None
+    step = max(growth, key=growth.get)
+    return step, growth[step]
+
+
+def _ms(value) -> str:
+    return "      —" if value is None else f"{value * 1000:7.0f}"
+
+
+def report(stages: list, fakes: dict):
+    print()
+    print(f"{'learners':>8} {'journeys/s':>11} {'steps/s':>8} │ " +
+          " │ ".join(f"{s:^23}" for s in STEPS))
+    print(f"{'':>8} {'':>11} {'':>8} │ " + " │ ".join(f"{'p50':>7}{'p95':>8}{'p99':>8}" for _ in STEPS)
+          + "   (ms)")
+    for st in stages:
+        cells = " │ ".join(_ms(st["steps"][s]["p50"]) + " " + _ms(st["steps"][s]["p95"])
+                           + " " + _ms(st["steps"][s]["p99"]) for s in STEPS)
+        errors = sum(st["steps"][s]["errors"] for s in STEPS)
+        print(f"{st['learners']:>8} {st['throughput']:>11.2f} {st['steps_per_s']:>8.1f} │ {cells}"
+              + (f"   {errors} errors" if errors else ""))
+    print()
+    if fakes:
+        print(f"Upstream: {fakes['gemini_calls']:,} Gemini calls · Supabase {fakes['reads']:,} reads / "
+              f"{fakes['writes']:,} writes")
+    found = saturation(stages)
+    if found is None:
+        print(f"No saturation up to {stages[-1]['learners']} learners — add stages to find the limit.")
+        return
+    ok, sat = found
+    step, factor = bottleneck(stages[0], sat)
+    print(f"Saturation: throughput stops scaling past {ok['learners']} learners "
+          f"({ok['throughput']:.2f} journeys/s; {sat['learners']} learners managed {sat['throughput']:.2f}).")
+    if step:
+        share = {s: (sat["steps"][s]["p50"] or 0) * sat["steps"][s]["count"] for s in STEPS}
+        total = sum(share.values()) or 1
+        print(f"Bottleneck: {step} — p95 grew {factor:.1f}× from {stages[0]['learners']} to "
+              f"{sat['learners']} learners and is {share[step] / total:.0%} of journey time there.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ramp simulated learners and find the saturation point.")
+    parser.add_argument("--stages", default="1,2,4,8,16,32", help="comma-separated learner counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per stage")
+    parser.add_argument("--chat-turns", type=int, default=3)
+    parser.add_argument("--think", type=float, default=0.0, help="seconds a learner pauses between steps")
+    parser.add_argument("--unique", type=float, default=0.3,
+                        help="share of journeys with a scenario nobody has asked for yet")
+    parser.add_argument("--gemini-latency", type=float, default=0.3, help="fake Gemini seconds per call")
+    parser.add_argument("--gemini-errors", type=float, default=0.0, help="fake Gemini error rate")
+    parser.add_argument("--supabase-latency", type=float, default=0.03, help="fake Supabase seconds per request")
+    parser.add_argument("--rpm", type=float, default=100_000, help="Gemini requests/minute the rate limiter allows")
+    parser.add_argument("--url", help="load-test a running api_server.py instead of in-process")
+    parser.add_argument("--json", help="also write the results here")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)     # fallbacks are counted, not printed
+
+    # Configure the stand-ins and a scratch state directory before the app modules load
+    scratch = tempfile.mkdtemp(prefix="convoready-load-")
+    os.environ.setdefault("CONVOREADY_FAKE_GEMINI", "1")
+    os.environ["CONVOREADY_FAKE_LATENCY"]    = str(args.gemini_latency)
+    os.environ["CONVOREADY_FAKE_ERROR_RATE"] = str(args.gemini_errors)
+    os.environ["CONVOREADY_GEMINI_RPM"]      = str(args.rpm)
+    os.environ["CONVOREADY_GEMINI_TPM"]      = str(args.rpm * 10_000)
+    os.environ["CONVOREADY_CONTENT_STORE"]   = os.path.join(scratch, "content_store.json")
+    os.environ["CONVOREADY_JOBS_DIR"]        = os.path.join(scratch, "jobs")
+    os.environ["CONVOREADY_METRICS_FILE"]    = os.path.join(scratch, "metrics.json")
+
+    fakes = None
+    if args.url:
+        target = HTTPTarget(args.url)
+        print(f"Load-testing {args.url}")
+    else:
+        import fake_gemini
+        from fake_supabase import FakeSupabase
+        supabase = FakeSupabase(latency=args.supabase_latency)
+        target   = InProcessTarget(supabase)
+        print(f"Load-testing core.py in-process · Gemini {args.gemini_latency * 1000:.0f} ms "
+              f"(errors {args.gemini_errors:.0%}) · Supabase {args.supabase_latency * 1000:.0f} ms "
+              f"· {args.rpm:,.0f} RPM · state in {scratch}")
+
+    stages = []
+    for i, learners in enumerate(int(n) for n in args.stages.split(",")):
+        stage = run_stage(target, learners, args.duration, args, seed=i)
+        stages.append(stage)
+        print(f"  {learners:>4} learners: {stage['journeys']:>5} journeys in {stage['seconds']:.1f}s "
+              f"({stage['throughput']:.2f}/s)")
+
+    if not args.url:
+        fakes = {"gemini_calls": fake_gemini.from_env().calls,
+                 "reads": supabase.reads, "writes": supabase.writes}
+    report(stages, fakes)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"stages": stages, "upstream": fakes}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
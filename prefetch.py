@@ -0,0 +1,84 @@
+"""
+prefetch.py
+───────────
+Speculative prefetch of the next step's LLM content.
+
+While the learner reviews the dialogue, the app guesses what the next
+click will need and starts it early as a background job (jobs.py):
+
+  • the Survival Kit recommendation for the likely struggled lines
+  • phrases + dialogue for the adjacent levels of the current scenario
+
+Each session owns a Prefetcher tracking those jobs' futures by key.
+adopt(key, future, started) takes one on, counted as "scheduled" if this
+session's submit started it and "adopted" if it found the job already in
+flight (another session's, say) — only the former is speculative work
+this session caused. claim(key) is the hand-off: the foreground now needs
+the result and polls the job itself, counted as a hit. retain(keys) lets
+go of everything else, without cancelling: jobs are deduplicated across
+sessions, so another learner may be waiting on any of them. Jobs this
+session started are counted as waste, adopted ones as released. Outcomes
+are counted per kind in telemetry (convoready_prefetch_total).
+"""
+
+import threading
+
+from telemetry import REGISTRY
+
+
+def _count(kind: str, outcome: str):
+    REGISTRY.inc("convoready_prefetch_total", {"kind": kind, "outcome": outcome})
+
+
+class Prefetcher:
+    """Keyed speculative tasks for one session. Keys are tuples whose first item is the kind."""
+
+    def __init__(self):
+        self._tasks   = {}
+        self._adopted = set()       # keys of jobs found already in flight
+        self._lock    = threading.Lock()
+        self.stats    = {"scheduled": 0, "adopted": 0, "hits": 0, "wasted": 0, "released": 0}
+
+    def adopt(self, key: tuple, future, started: bool = True):
+        """
+        Track a background job's future as a prefetch. started=False means the
+        job was already in flight (another session's): it is counted as
+        "adopted" rather than "scheduled", and released rather than wasted.
+        """
+        outcome = "scheduled" if started else "adopted"
+        with self._lock:
+            if key in self._tasks:
+                return
+            self._tasks[key] = future
+            if not started:
+                self._adopted.add(key)
+            self.stats[outcome] += 1
+        _count(key[0], outcome)
+
+    def claim(self, key: tuple) -> bool:
+        """The foreground now needs `key`: count a hit and stop tracking it, finished or not."""
+        with self._lock:
+            self._adopted.discard(key)
+            if self._tasks.pop(key, None) is None:
+                return False
+            self.stats["hits"] += 1
+        _count(key[0], "hit")
+        return True
+
+    def pending(self, key: tuple) -> bool:
+        with self._lock:
+            return key in self._tasks
+
+    def retain(self, keep):
+        """Stop tracking every task whose key is not in `keep`; the jobs themselves run on."""
+        keep = set(keep)
+        with self._lock:
+            stale   = [k for k in self._tasks if k not in keep]
+            dropped = [(k, k in self._adopted) for k in stale]
+            for k in stale:
+                del self._tasks[k]
+            self._adopted.difference_update(stale)
+        for key, adopted in dropped:
+            outcome = "released" if adopted else "wasted"
+            self.stats[outcome] += 1
+            _count(key[0], outcome)
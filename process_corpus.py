@@ -0,0 +1,449 @@
+"""
+process_corpus.py
+─────────────────
+Offline corpus pipeline for ConvoReady.
+
+Streams the OpenSubtitles v2024 Spanish extract (es_extracted.txt) line by
+line, assigns each line to a scenario by seed-word matching and writes the
+indexed corpus file that corpus_data.py queries at runtime:
+
+  ngrams   — bigram and trigram collocations per scenario, scored with PMI
+             and Dunning log-likelihood, indexed by (scenario, head word).
+             A trigram's log-likelihood is the better of its two splits
+             (x|yz, xy|z), so "de la cuenta" scores on "la cuenta" even
+             though the all-stopword "de la" is never counted
+  examples — a capped sample of real subtitle lines per (scenario, word),
+             chosen for length and diversity, indexed by word
+
+Memory is bounded regardless of corpus size: n-gram counts live in capped
+counters that prune the long tail when full (lossy counting). A stored count
+may be short by at most the counter's floor; that bound is printed and kept
+in the meta table as ngram_error:<scenario>.
+Examples are collected in a second pass, only for each scenario's most
+frequent words, with a fixed number of slots per word.
+
+Usage:
+    python process_corpus.py es_extracted.txt --out corpus_index.sqlite
+"""
+
+import argparse
+import math
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from corpus_data import CORPUS_FREQUENCIES, CORPUS_INDEX_PATH
+
+# ── Tokenisation ─────────────────────────────────────────────────────────────
+
+_TOKEN_RE = re.compile(r"[a-záéíóúüñ]+")
+
+# Curated ES stopword list — stop words are kept inside n-grams ("la cuenta,
+# por favor") but never count as the head word of a collocation.
+STOPWORDS = frozenset("""
+    a al algo algún alguna algunas alguno algunos ante antes aquí así aun aún
+    bien cada como cómo con contra cual cuál cuando de del desde donde dos el
+    él ella ellas ellos en entre era eres es esa esas ese eso esos esta está
+    estaba estado estamos están estar estas este esto estos estoy fue fueron
+    ha había han has hasta hay he hemos la las le les lo los más me mi mí mis
+    mucho muy nada ni no nos nosotros nunca o os otra otro para pero poco por
+    porque qué que quien quién se sé ser si sí sin sobre soy su sus también
+    tan te tengo ti tiene todo todos tu tú tus un una uno unos usted ustedes
+    va vamos voy y ya yo
+""".split())
+
+MIN_HEAD_LENGTH = 3
+
+
+def tokenize(line: str) -> list:
+    return _TOKEN_RE.findall(line.lower())
+
+
+def is_head(token: str) -> bool:
+    return len(token) >= MIN_HEAD_LENGTH and token not in STOPWORDS
+
+
+# ── Scenario classification ──────────────────────────────────────────────────
+# Seed words are the per-scenario vocabularies already published in
+# corpus_data.py; "general" is the catch-all and is never assigned.
+
+SCENARIO_KEYS = [k for k in CORPUS_FREQUENCIES if k != "general"]
+
+_SEED_INDEX = {}
+for _scenario in SCENARIO_KEYS:
+    for _word in CORPUS_FREQUENCIES[_scenario]:
+        _SEED_INDEX.setdefault(_word, []).append(_scenario)
+
+
+def classify_tokens(tokens: list):
+    """Return the scenario with the most seed-word hits, or None if no hit."""
+    hits = {}
+    for token in tokens:
+        for scenario in _SEED_INDEX.get(token, ()):
+            hits[scenario] = hits.get(scenario, 0) + 1
+    if not hits:
+        return None
+    return max(hits, key=hits.get)
+
+
+def iter_lines(path: str):
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+# ── Bounded counting ─────────────────────────────────────────────────────────
+
+class BoundedCounter:
+    """
+    Lossy frequency counter holding at most `max_keys` distinct keys.
+
+    When full, the lower half by upper-bound count is dropped and the drop
+    threshold is remembered in `floor`. A key that is dropped had a true
+    count of at most `floor` so far, so one that comes back may have lost up
+    to `floor` occurrences: get() is a lower bound and upper() adds the
+    possible loss. Any key whose true count exceeds `floor` is kept.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.counts   = {}
+        self.errors   = {}      # key -> occurrences it may have lost before (re)insertion
+        self.floor    = 0
+
+    def add(self, key, n: int = 1):
+        counts = self.counts
+        c = counts.get(key)
+        if c is not None:
+            counts[key] = c + n
+            return
+        counts[key] = n
+        if self.floor:
+            self.errors[key] = self.floor
+        if len(counts) > self.max_keys:
+            self._prune()
+
+    def _prune(self):
+        errors    = self.errors
+        upper     = {k: v + errors.get(k, 0) for k, v in self.counts.items()}
+        threshold = sorted(upper.values(), reverse=True)[self.max_keys // 2]
+        self.counts = {k: v for k, v in self.counts.items() if upper[k] > threshold}
+        self.errors = {k: e for k, e in errors.items() if k in self.counts}
+        self.floor  = max(self.floor, threshold)
+
+    def get(self, key, default: int = 0) -> int:
+        return self.counts.get(key, default)
+
+    def upper(self, key) -> int:
+        """Largest true count consistent with what was kept."""
+        return self.counts.get(key, self.floor) + self.errors.get(key, 0)
+
+    def items(self):
+        return self.counts.items()
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class ScenarioCounts:
+    """Unigram, bigram and trigram counts for one scenario."""
+
+    def __init__(self, max_unigrams: int, max_ngrams: int):
+        self.lines    = 0
+        self.tokens   = 0
+        self.unigrams = BoundedCounter(max_unigrams)
+        self.bigrams  = BoundedCounter(max_ngrams)
+        self.trigrams = BoundedCounter(max_ngrams)
+
+    @property
+    def ngram_error(self) -> int:
+        """Most occurrences any stored bigram/trigram count may be short by."""
+        return max(self.bigrams.floor, self.trigrams.floor)
+
+    def add_line(self, tokens: list):
+        self.lines  += 1
+        self.tokens += len(tokens)
+        heads = [is_head(t) for t in tokens]
+        for t in tokens:
+            self.unigrams.add(t)
+        for i in range(len(tokens) - 1):
+            if heads[i] or heads[i + 1]:
+                self.bigrams.add(tokens[i] + " " + tokens[i + 1])
+        for i in range(len(tokens) - 2):
+            if heads[i] or heads[i + 1] or heads[i + 2]:
+                self.trigrams.add(" ".join(tokens[i:i + 3]))
+
+
+def count_corpus(lines, max_unigrams: int = 50_000, max_ngrams: int = 100_000,
+                 progress_every: int = 500_000) -> dict:
+    """Stream lines once and return {scenario: ScenarioCounts}."""
+    counts = {s: ScenarioCounts(max_unigrams, max_ngrams) for s in SCENARIO_KEYS}
+    start  = time.time()
+    for n, line in enumerate(lines, 1):
+        tokens   = tokenize(line)
+        scenario = classify_tokens(tokens)
+        if scenario is not None:
+            counts[scenario].add_line(tokens)
+        if progress_every and n % progress_every == 0:
+            matched = sum(c.lines for c in counts.values())
+            print(f"  {n:,} lines read · {matched:,} matched · {time.time() - start:.0f}s",
+                  file=sys.stderr)
+    return counts
+
+
+# ── Association scores ───────────────────────────────────────────────────────
+
+def pmi(joint: int, marginals: list, total: int) -> float:
+    """Pointwise mutual information (log2) of an n-gram given its unigram counts."""
+    expected = total
+    for m in marginals:
+        expected *= m / total
+    return math.log2(joint / expected) if expected > 0 else 0.0
+
+
+def log_likelihood(k11: int, left: int, right: int, total: int) -> float:
+    """Dunning G² for a 2×2 contingency table (left ∧ right = k11)."""
+    k12 = left - k11
+    k21 = right - k11
+    k22 = total - left - right + k11
+    if min(k12, k21, k22) < 0:
+        return 0.0
+    rows = (k11 + k12, k21 + k22)
+    cols = (k11 + k21, k12 + k22)
+    g2 = 0.0
+    for k, r, c in ((k11, rows[0], cols[0]), (k12, rows[0], cols[1]),
+                    (k21, rows[1], cols[0]), (k22, rows[1], cols[1])):
+        if k > 0:
+            g2 += k * math.log(k * total / (r * c))
+    return max(0.0, 2 * g2)
+
+
+def score_scenario(counts: ScenarioCounts, min_count: int = 5, top_k: int = 500) -> list:
+    """Return the top collocations for one scenario, ranked by log-likelihood."""
+    total = counts.tokens
+    uni   = counts.unigrams
+    rows  = []
+
+    for ngram, c in counts.bigrams.items():
+        if c < min_count:
+            continue
+        x, y = ngram.split(" ")
+        cx, cy = uni.get(x), uni.get(y)
+        if not cx or not cy:
+            continue
+        rows.append((ngram, 2, c, pmi(c, [cx, cy], total), log_likelihood(c, cx, cy, total)))
+
+    for ngram, c in counts.trigrams.items():
+        if c < min_count:
+            continue
+        x, y, z = ngram.split(" ")
+        cx, cy, cz = uni.get(x), uni.get(y), uni.get(z)
+        if not (cx and cy and cz):
+            continue
+        # Score the better of the two splits, x|yz and xy|z. Only bigrams
+        # with a head word are counted, so "de la cuenta" has no "de la" —
+        # but every counted trigram has a head, so one of its splits has a
+        # bigram to stand on.
+        cxy = counts.bigrams.get(f"{x} {y}")
+        cyz = counts.bigrams.get(f"{y} {z}")
+        splits = []
+        if cxy:
+            splits.append(log_likelihood(c, cxy, cz, total))
+        if cyz:
+            splits.append(log_likelihood(c, cx, cyz, total))
+        if not splits:
+            continue
+        rows.append((ngram, 3, c, pmi(c, [cx, cy, cz], total), max(splits)))
+
+    rows.sort(key=lambda r: r[4], reverse=True)
+    return rows[:top_k]
+
+
+# ── Example sentences ────────────────────────────────────────────────────────
+
+IDEAL_EXAMPLE_TOKENS = (5, 12)
+MAX_EXAMPLE_CHARS    = 120
+
+
+def example_score(tokens: list, line: str) -> float:
+    """Prefer short, complete lines of 5–12 words; penalise shouting and fragments."""
+    lo, hi = IDEAL_EXAMPLE_TOKENS
+    n      = len(tokens)
+    score  = -max(lo - n, n - hi, 0)
+    if line[:1].isupper() and line[-1:] in ".?!":
+        score += 1
+    if line.isupper():
+        score -= 3
+    return score
+
+
+def _similar(a: frozenset, b: frozenset, threshold: float = 0.6) -> bool:
+    return len(a & b) / len(a | b) >= threshold if a and b else a == b
+
+
+class ExampleSampler:
+    """
+    Keeps at most `per_word` example lines for each tracked (scenario, word).
+
+    A new line takes a free slot, or evicts the worst-scoring sample if it
+    scores higher; lines too similar to an existing sample (token Jaccard)
+    are rejected so the kept examples show the word in different contexts.
+    """
+
+    def __init__(self, vocab: dict, per_word: int = 5):
+        self.vocab    = vocab          # {scenario: set(words)}
+        self.per_word = per_word
+        self.samples  = {}             # {(scenario, word): [(score, line, token_set)]}
+
+    def add_line(self, scenario: str, tokens: list, line: str):
+        if len(line) > MAX_EXAMPLE_CHARS:
+            return
+        words = self.vocab.get(scenario)
+        if not words:
+            return
+        score     = example_score(tokens, line)
+        token_set = frozenset(tokens)
+        for word in token_set & words:
+            slot = self.samples.setdefault((scenario, word), [])
+            if any(_similar(token_set, other) for _, _, other in slot):
+                continue
+            if len(slot) < self.per_word:
+                slot.append((score, line, token_set))
+                continue
+            worst = min(range(len(slot)), key=lambda i: slot[i][0])
+            if score > slot[worst][0]:
+                slot[worst] = (score, line, token_set)
+
+    def rows(self):
+        for (scenario, word), slot in self.samples.items():
+            ranked = sorted(slot, key=lambda s: (-s[0], len(s[1])))
+            for rank, (_, line, _) in enumerate(ranked):
+                yield scenario, word, rank, line
+
+
+def example_vocabulary(counts: dict, words_per_scenario: int = 2000) -> dict:
+    """The most frequent head words per scenario — the words examples are kept for."""
+    vocab = {}
+    for scenario, c in counts.items():
+        ranked = sorted(((n, w) for w, n in c.unigrams.items() if is_head(w)), reverse=True)
+        vocab[scenario] = {w for _, w in ranked[:words_per_scenario]}
+    return vocab
+
+
+def sample_examples(lines, vocab: dict, per_word: int = 5) -> ExampleSampler:
+    """Second streaming pass: collect example lines for the vocabulary."""
+    sampler = ExampleSampler(vocab, per_word)
+    for line in lines:
+        tokens   = tokenize(line)
+        scenario = classify_tokens(tokens)
+        if scenario is not None:
+            sampler.add_line(scenario, tokens, line)
+    return sampler
+
+
+# ── Indexed output ───────────────────────────────────────────────────────────
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+DROP TABLE IF EXISTS examples;      -- rebuilt by write_example_index(), if examples are wanted
+DROP TABLE IF EXISTS ngrams;
+CREATE TABLE ngrams (
+    scenario TEXT    NOT NULL,
+    head     TEXT    NOT NULL,   -- '*' = scenario-wide ranking
+    rank     INTEGER NOT NULL,
+    ngram    TEXT    NOT NULL,
+    n        INTEGER NOT NULL,
+    count    INTEGER NOT NULL,
+    pmi      REAL    NOT NULL,
+    llr      REAL    NOT NULL,
+    PRIMARY KEY (scenario, head, rank)
+) WITHOUT ROWID;
+"""
+
+_EXAMPLES_SCHEMA = """
+DROP TABLE IF EXISTS examples;
+CREATE TABLE examples (
+    scenario TEXT    NOT NULL,
+    word     TEXT    NOT NULL,
+    rank     INTEGER NOT NULL,
+    line     TEXT    NOT NULL,
+    PRIMARY KEY (scenario, word, rank)
+) WITHOUT ROWID;
+CREATE INDEX examples_word ON examples (word, rank);
+"""
+
+
+def write_ngram_index(db_path: str, scored: dict, counts: dict):
+    """Write scored collocations, one row per (scenario, head word) plus '*'."""
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executescript(_SCHEMA)
+        for scenario, rows in scored.items():
+            batch = []
+            for rank, (ngram, n, c, p, llr) in enumerate(rows):
+                record = (rank, ngram, n, c, round(p, 3), round(llr, 1))
+                batch.append((scenario, "*") + record)
+                for head in dict.fromkeys(t for t in ngram.split(" ") if is_head(t)):
+                    batch.append((scenario, head) + record)
+            conn.executemany("INSERT INTO ngrams VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                         (f"tokens:{scenario}", str(counts[scenario].tokens)))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                         (f"lines:{scenario}", str(counts[scenario].lines)))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                         (f"ngram_error:{scenario}", str(counts[scenario].ngram_error)))
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def write_example_index(db_path: str, sampler: ExampleSampler):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executescript(_EXAMPLES_SCHEMA)
+        conn.executemany("INSERT INTO examples VALUES (?, ?, ?, ?)", sampler.rows())
+    conn.execute("VACUUM")
+    conn.close()
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the ConvoReady corpus index.")
+    parser.add_argument("corpus", help="one subtitle line per row, e.g. es_extracted.txt")
+    parser.add_argument("--out", default=CORPUS_INDEX_PATH)
+    parser.add_argument("--max-ngrams", type=int, default=100_000,
+                        help="distinct bigrams/trigrams kept per scenario")
+    parser.add_argument("--min-count", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=500,
+                        help="collocations stored per scenario")
+    parser.add_argument("--example-words", type=int, default=2000,
+                        help="words per scenario that get example lines (0 = skip)")
+    parser.add_argument("--examples-per-word", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"Counting n-grams in {args.corpus} ...", file=sys.stderr)
+    counts = count_corpus(iter_lines(args.corpus), max_ngrams=args.max_ngrams)
+    scored = {s: score_scenario(c, args.min_count, args.top_k) for s, c in counts.items()}
+    write_ngram_index(args.out, scored, counts)
+
+    if args.example_words:
+        print("Sampling example lines ...", file=sys.stderr)
+        vocab   = example_vocabulary(counts, args.example_words)
+        sampler = sample_examples(iter_lines(args.corpus), vocab, args.examples_per_word)
+        write_example_index(args.out, sampler)
+
+    for scenario, c in counts.items():
+        print(f"  {scenario:<11} {c.tokens:>10,} tokens ({c.lines:,} lines) · "
+              f"{len(scored[scenario])} collocations · counts short by ≤ {c.ngram_error}", file=sys.stderr)
+    print(f"Wrote {args.out} ({os.path.getsize(args.out) / 1024:.0f} KB)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+profile_codec.py
+────────────────
+Compact, versioned encoding of stored learner profiles.
+
+The profile's session history is most of its size, and as plain JSON it
+repeats "timestamp", "scenario", "results", "pattern", "phrase" and
+"confident" for every line of every session. encode() keeps everything
+else as ordinary JSON and packs the sessions into one blob:
+
+  • scenarios, levels and patterns interned to small integer codes
+  • phrases dictionary-coded — each distinct phrase stored once
+  • timestamps as zig-zag varint deltas in microseconds, confident flags
+    packed eight to a byte
+  • the lot zlib-compressed and base64'd, so it still fits the JSONB
+    column — no schema change
+
+    {"codec": 2, "meta": {...everything but sessions...}, "n_sessions": 42, "sessions": "<base64>",
+     "tail": [...sessions recorded since the blob was packed...]}
+
+decode() returns a LazyProfile: counters, stats and the review queue are
+readable straight away, and the sessions are only inflated the first time
+something asks for them. append_session() adds a session to the plain-JSON
+tail without inflating, so recording a session doesn't re-encode the whole
+history; the tail is folded into the blob once it reaches TAIL_MAX. Rows
+without "codec" are legacy JSON profiles and are returned unchanged, so old
+and new rows load side by side; a profile is re-encoded the next time it is
+saved. Codec 1 rows (no tail) still decode.
+
+Run `python profile_codec.py` for sizes and load times by history length.
+"""
+
+import base64
+import json
+import os
+import random
+import struct
+import time
+import zlib
+from datetime import datetime, timedelta
+
+CODEC_VERSION = 2
+TAIL_MAX      = 64             # sessions kept unpacked before the blob is re-encoded
+ENCODING      = os.environ.get("CONVOREADY_PROFILE_ENCODING", "binary")   # "json" writes legacy rows
+
+_EPOCH        = datetime(1970, 1, 1)
+_SESSION_KEYS = {"timestamp", "scenario", "level", "results", "readiness"}
+_RESULT_KEYS  = {"pattern", "phrase", "confident"}
+
+
+# ── Varints ──────────────────────────────────────────────────────────────────
+
+def _put_varint(out: bytearray, n: int):
+    n = (n << 1) ^ (n >> 63)            # zig-zag: small negatives stay small
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _get_varint(buf: bytes, pos: int):
+    shift = result = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return (result >> 1) ^ -(result & 1), pos
+        shift += 7
+
+
+# ── Sessions blob ────────────────────────────────────────────────────────────
+
+def _micros(timestamp: str):
+    """Microseconds since 1970 for an isoformat() timestamp, or None if it wouldn't round-trip."""
+    try:
+        dt = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is not None:
+        return None
+    us = (dt - _EPOCH) // timedelta(microseconds=1)
+    return us if (_EPOCH + timedelta(microseconds=us)).isoformat() == timestamp else None
+
+
+def _encode_sessions(sessions: list) -> bytes:
+    tables = {"scenario": {}, "level": {}, "pattern": {}, "phrase": {}}
+    extras = {}            # session index -> keys the binary layout doesn't cover
+    body   = bytearray()
+
+    def code(table, value):
+        return tables[table].setdefault(value, len(tables[table]))
+
+    last_us = 0
+    for i, s in enumerate(sessions):
+        extra = {k: v for k, v in s.items() if k not in _SESSION_KEYS}
+        us    = _micros(s.get("timestamp"))
+        if us is None:
+            extra["timestamp"] = s.get("timestamp")
+            us = last_us
+        results = s.get("results", [])
+        if any(set(r) - _RESULT_KEYS for r in results):
+            extra["results"] = results
+            results = []
+        _put_varint(body, us - last_us)
+        last_us = us
+        _put_varint(body, code("scenario", s.get("scenario")))
+        _put_varint(body, code("level", s.get("level")))
+        _put_varint(body, s.get("readiness", 0))
+        _put_varint(body, len(results))
+        flags = 0
+        for j, r in enumerate(results):
+            _put_varint(body, code("pattern", r.get("pattern")))
+            _put_varint(body, code("phrase", r.get("phrase")))
+            flags |= bool(r.get("confident")) << (j % 8)
+            if j % 8 == 7 or j == len(results) - 1:
+                body.append(flags)
+                flags = 0
+        if extra:
+            extras[i] = extra
+
+    header = json.dumps({"tables": {k: list(v) for k, v in tables.items()},
+                         "extras": extras, "count": len(sessions)},
+                        ensure_ascii=False, separators=(",", ":")).encode()
+    return zlib.compress(struct.pack("<I", len(header)) + header + bytes(body), 6)
+
+
+def _decode_sessions(blob: bytes) -> list:
+    raw         = zlib.decompress(blob)
+    (size,)     = struct.unpack_from("<I", raw)
+    header      = json.loads(raw[4:4 + size])
+    tables      = header["tables"]
+    extras      = header["extras"]
+    scenarios, levels = tables["scenario"], tables["level"]
+    patterns, phrases = tables["pattern"], tables["phrase"]
+    sessions, pos, us = [], 4 + size, 0
+    for i in range(header["count"]):
+        delta, pos     = _get_varint(raw, pos)
+        us            += delta
+        scenario, pos  = _get_varint(raw, pos)
+        level, pos     = _get_varint(raw, pos)
+        readiness, pos = _get_varint(raw, pos)
+        n, pos         = _get_varint(raw, pos)
+        results        = []
+        for j in range(n):
+            pattern, pos = _get_varint(raw, pos)
+            phrase, pos  = _get_varint(raw, pos)
+            results.append([pattern, phrase])
+            if j % 8 == 7 or j == n - 1:
+                flags = raw[pos]
+                pos  += 1
+                base  = j - j % 8
+                for k in range(base, j + 1):
+                    results[k] = {"pattern": patterns[results[k][0]], "phrase": phrases[results[k][1]],
+                                  "confident": bool(flags >> (k - base) & 1)}
+        session = {"timestamp": (_EPOCH + timedelta(microseconds=us)).isoformat(),
+                   "scenario":  scenarios[scenario], "level": levels[level],
+                   "results":   results, "readiness": readiness}
+        session.update(extras.get(str(i), {}))
+        sessions.append(session)
+    return sessions
+
+
+# ── Profiles ─────────────────────────────────────────────────────────────────
+
+class LazyProfile(dict):
+    """
+    A decoded profile whose "sessions" are inflated on first access. Behaves
+    as a plain dict otherwise; encode() reuses the original blob (plus the
+    unpacked tail) if the sessions were never touched.
+    """
+
+    def __init__(self, meta: dict, blob: bytes, count: int, tail: list = None):
+        super().__init__(meta)
+        self._blob  = blob
+        self._count = count
+        self._tail  = list(tail or [])
+
+    def _inflate(self):
+        if self._blob is not None:
+            dict.__setitem__(self, "sessions", _decode_sessions(self._blob) + self._tail)
+            self._blob = None
+            self._tail = []
+
+    def __getitem__(self, key):
+        if key == "sessions":
+            self._inflate()
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key == "sessions":
+            self._inflate()
+        return dict.get(self, key, default)
+
+    def setdefault(self, key, default=None):
+        if key == "sessions":
+            self._inflate()
+        return dict.setdefault(self, key, default)
+
+    def __setitem__(self, key, value):
+        if key == "sessions":
+            self._blob = None
+            self._tail = []
+        dict.__setitem__(self, key, value)
+
+    def __contains__(self, key):
+        return (key == "sessions" and self._blob is not None) or dict.__contains__(self, key)
+
+    def __iter__(self):
+        self._inflate()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._inflate()
+        return dict.__len__(self)
+
+    def keys(self):
+        self._inflate()
+        return dict.keys(self)
+
+    def values(self):
+        self._inflate()
+        return dict.values(self)
+
+    def items(self):
+        self._inflate()
+        return dict.items(self)
+
+    @property
+    def inflated(self) -> bool:
+        return self._blob is None
+
+
+def session_count(profile: dict) -> int:
+    """Number of sessions, without inflating a LazyProfile."""
+    if isinstance(profile, LazyProfile) and not profile.inflated:
+        return profile._count + len(profile._tail)
+    return len(profile.get("sessions", []))
+
+
+def append_session(profile: dict, session: dict):
+    """Add a session to the history, without inflating a LazyProfile."""
+    if isinstance(profile, LazyProfile) and not profile.inflated:
+        profile._tail.append(session)
+    else:
+        profile.setdefault("sessions", []).append(session)
+
+
+def encode(profile: dict) -> dict:
+    """JSON-safe stored form of a profile (legacy plain JSON if ENCODING is "json")."""
+    if ENCODING == "json":
+        return dict(profile.items())
+    if isinstance(profile, LazyProfile) and not profile.inflated and len(profile._tail) < TAIL_MAX:
+        meta, blob = dict(dict.items(profile)), profile._blob
+        count, tail = profile._count, profile._tail
+    else:
+        sessions = profile.get("sessions", [])
+        meta     = {k: v for k, v in profile.items() if k != "sessions"}
+        blob, count, tail = _encode_sessions(sessions), len(sessions), []
+    return {"codec": CODEC_VERSION, "meta": meta, "n_sessions": count,
+            "sessions": base64.b64encode(blob).decode("ascii"), "tail": tail}
+
+
+def decode(data: dict) -> dict:
+    """Profile from its stored form: a LazyProfile, or a legacy JSON profile unchanged."""
+    if not isinstance(data, dict) or "codec" not in data:
+        return data
+    if data["codec"] not in (1, CODEC_VERSION):
+        raise ValueError(f"Unsupported profile codec version {data['codec']}")
+    return LazyProfile(data["meta"], base64.b64decode(data["sessions"]), data["n_sessions"],
+                       data.get("tail"))
+
+
+# ── Benchmark ────────────────────────────────────────────────────────────────
+
+def _synthetic_profile(n_sessions: int, seed: int = 1) -> dict:
+    rng       = random.Random(seed)
+    patterns  = ["present_simple", "basic_question", "greeting", "future", "polite_request",
+                 "negation", "past_simple", "conditional", "subjunctive", "complex", "number"]
+    scenarios = ["restaurant", "transport", "shopping", "hotel", "health", "work", "social", "housing"]
+    phrases   = [f"Frase de ejemplo número {i} para practicar" for i in range(400)]
+    start     = datetime(2024, 1, 1)
+    sessions  = []
+    for i in range(n_sessions):
+        results = [{"pattern": rng.choice(patterns), "phrase": rng.choice(phrases),
+                    "confident": rng.random() < 0.6} for _ in range(rng.randint(3, 7))]
+        sessions.append({
+            "timestamp": (start + timedelta(hours=i * 7, microseconds=rng.randrange(10**6))).isoformat(),
+            "scenario":  rng.choice(scenarios),
+            "level":     rng.choice(["A1", "A2", "B1"]),
+            "results":   results,
+            "readiness": int(100 * sum(r["confident"] for r in results) / len(results)),
+        })
+    pattern_stats = {p: {"confident": rng.randrange(500), "struggled": rng.randrange(300)} for p in patterns}
+    return {"sessions": sessions, "pattern_stats": pattern_stats,
+            "scenario_stats": {s: {"sessions": 10, "avg_readiness": 60} for s in scenarios},
+            "version": "3f9a1c0b2d4e"}
+
+
+if __name__ == "__main__":
+    def _appended(stored: str, session: dict) -> dict:
+        loaded = decode(json.loads(stored))
+        append_session(loaded, session)
+        return loaded
+
+    def timed(fn, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = fn()
+        return result, (time.perf_counter() - start) / repeat * 1000
+
+    for n in (10, 100, 1_000, 10_000):
+        profile  = _synthetic_profile(n)
+        as_json  = json.dumps(profile, ensure_ascii=False)
+        stored   = json.dumps(encode(profile))
+        repeat   = max(3, 2_000 // n)
+        _, json_ms  = timed(lambda: json.loads(as_json), repeat)
+        _, lazy_ms  = timed(lambda: session_count(decode(json.loads(stored))), repeat)
+        _, full_ms  = timed(lambda: decode(json.loads(stored))["sessions"], repeat)
+        _, enc_ms   = timed(lambda: json.dumps(encode(profile)), repeat)
+        _, app_ms   = timed(lambda: json.dumps(encode(_appended(stored, profile["sessions"][0]))), repeat)
+        assert decode(json.loads(stored))["sessions"] == profile["sessions"]
+        assert _appended(stored, profile["sessions"][0])["sessions"] == profile["sessions"] + profile["sessions"][:1]
+        print(f"{n:>6,} sessions: JSON {len(as_json):>10,} B → {len(stored):>9,} B "
+              f"({len(as_json) / len(stored):4.1f}×) · load {json_ms:7.2f} ms JSON, "
+              f"{lazy_ms:6.2f} ms counters, {full_ms:7.2f} ms all sessions · save {enc_ms:6.2f} ms, "
+              f"record one more {app_ms:5.2f} ms")
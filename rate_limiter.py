@@ -0,0 +1,215 @@
+"""
+rate_limiter.py
+───────────────
+Process-wide admission control for Gemini requests.
+
+Every Streamlit session shares one API key, so quota is a property of the
+process, not of a session. Scheduler keeps two token buckets — requests per
+minute and tokens per minute — and admits waiting calls strictly in
+priority order:
+
+  CHAT        a learner is waiting on the reply
+  SCENARIO    phrases and dialogue for an analysed scenario
+  BACKGROUND  recommendations and conversation feedback
+
+Both buckets bank up to a minute of quota, and whatever arrives first
+would take it. So lower priorities leave HEADROOM untouched: SCENARIO
+calls are not admitted into the last 20% of either bucket, BACKGROUND
+ones not into the last 40%. That much is always left for a learner's chat
+reply, even after a burst of prefetches and warm-ups.
+
+Before queueing, acquire() estimates how long the caller would wait behind
+everything of equal or higher priority; if that is more than the caller can
+afford it raises RateLimited at once, and the caller serves its fallback
+(or cached content) instead of blowing its latency budget in the queue.
+Token use is estimated up front and settled against the usage the model
+reports, so long prompts draw down the TPM bucket by what they really cost.
+
+    waited = SCHEDULER.acquire(CHAT, tokens=900, max_wait=4.0)
+    ...
+    SCHEDULER.settle(900, actual_tokens)
+
+Limits come from CONVOREADY_GEMINI_RPM / CONVOREADY_GEMINI_TPM (defaults
+match the gemini-2.5-flash free tier). No Streamlit imports — safe to use
+from background threads.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from telemetry import REGISTRY
+
+CHAT, SCENARIO, BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = {CHAT: "chat", SCENARIO: "scenario", BACKGROUND: "background"}
+
+RPM = float(os.environ.get("CONVOREADY_GEMINI_RPM", "10"))
+TPM = float(os.environ.get("CONVOREADY_GEMINI_TPM", "250000"))
+
+# Share of each bucket's capacity a priority may not draw into
+HEADROOM = {CHAT: 0.0, SCENARIO: 0.2, BACKGROUND: 0.4}
+
+
+class RateLimited(Exception):
+    """The estimated queue wait is longer than the caller can afford."""
+
+    def __init__(self, priority: int, wait: float):
+        super().__init__(f"{PRIORITY_NAMES[priority]} request would wait {wait:.1f}s for quota")
+        self.priority = priority
+        self.wait     = wait
+
+
+class TokenBucket:
+    """`per_minute` units refilled continuously, at most `capacity` banked. Not thread-safe."""
+
+    def __init__(self, per_minute: float, capacity: float = None, clock=time.monotonic):
+        self.rate     = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens   = self.capacity
+        self.clock    = clock
+        self.updated  = clock()
+
+    def _refill(self, now: float):
+        self.tokens  = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float, now: float = None) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        self._refill(self.clock() if now is None else now)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def take(self, amount: float):
+        """Spend `amount`; the balance may go negative (debt is repaid by refill)."""
+        self._refill(self.clock())
+        self.tokens -= amount
+
+    def give(self, amount: float):
+        """Return (or, if negative, charge) `amount` after the fact."""
+        self._refill(self.clock())
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class Scheduler:
+    """RPM + TPM buckets with a priority queue in front of them."""
+
+    def __init__(self, rpm: float = RPM, tpm: float = TPM, clock=time.monotonic):
+        self.clock     = clock
+        self._requests = TokenBucket(rpm, clock=clock)
+        self._tokens   = TokenBucket(tpm, clock=clock)
+        self._queue    = []                       # heap of (priority, seq, tokens)
+        self._seq      = itertools.count()
+        self._cond     = threading.Condition()
+
+    def _reserve(self, bucket: TokenBucket, priority: int) -> float:
+        return bucket.capacity * HEADROOM[priority]
+
+    def _wait_estimate(self, priority: int, tokens: int, now: float) -> float:
+        ahead = [t for t in self._queue if t[0] <= priority]
+        return max(self._requests.time_until(len(ahead) + 1 + self._reserve(self._requests, priority), now),
+                   self._tokens.time_until(sum(t[2] for t in ahead) + tokens
+                                           + self._reserve(self._tokens, priority), now))
+
+    def estimated_wait(self, priority: int, tokens: int = 0) -> float:
+        """Seconds a request of `priority` would queue if submitted now."""
+        with self._cond:
+            return self._wait_estimate(priority, tokens, self.clock())
+
+    def acquire(self, priority: int, tokens: int, max_wait: float) -> float:
+        """
+        Block until the request is admitted and return the seconds waited.
+        Raises RateLimited, without queueing, if the estimated wait exceeds
+        `max_wait` — or later, if higher-priority work pushes it past that.
+        """
+        labels = {"priority": PRIORITY_NAMES[priority]}
+        with self._cond:
+            start    = self.clock()
+            estimate = self._wait_estimate(priority, tokens, start)
+            if estimate > max_wait:
+                REGISTRY.inc("convoready_llm_queue_total", {**labels, "outcome": "rejected"})
+                raise RateLimited(priority, estimate)
+            ticket = (priority, next(self._seq), tokens)
+            heapq.heappush(self._queue, ticket)
+            while True:
+                now = self.clock()
+                if self._queue[0] is ticket:
+                    reserve = self._reserve(self._tokens, priority)
+                    wait = max(self._requests.time_until(1 + self._reserve(self._requests, priority), now),
+                               self._tokens.time_until(min(tokens + reserve, self._tokens.capacity), now))
+                    if wait <= 0:
+                        heapq.heappop(self._queue)
+                        self._requests.take(1)
+                        self._tokens.take(tokens)
+                        self._cond.notify_all()
+                        REGISTRY.inc("convoready_llm_queue_total", {**labels, "outcome": "admitted"})
+                        return now - start
+                else:
+                    wait = max_wait
+                remaining = start + max_wait - now
+                if remaining <= 0:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self._cond.notify_all()
+                    REGISTRY.inc("convoready_llm_queue_total", {**labels, "outcome": "timed_out"})
+                    raise RateLimited(priority, now - start)
+                self._cond.wait(min(wait, remaining))
+
+    def settle(self, estimated: int, actual: int):
+        """Correct the TPM bucket once the model has reported the tokens a call really used."""
+        if actual is None or actual == estimated:
+            return
+        with self._cond:
+            self._tokens.give(estimated - actual)
+            self._cond.notify_all()
+
+    def status(self) -> dict:
+        """Queued requests and estimated wait per priority, for the UI."""
+        with self._cond:
+            now    = self.clock()
+            queued = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _, _ in self._queue:
+                queued[PRIORITY_NAMES[priority]] += 1
+            return {"queued": queued,
+                    "wait":   {name: self._wait_estimate(p, 0, now) for p, name in PRIORITY_NAMES.items()}}
+
+
+SCHEDULER = Scheduler()
+
+
+# ── Benchmark ────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    # A burst of 40 scenario / background requests (prefetch, warm-up) against
+    # a 30 RPM limit, then 6 chat replies 0.2s later. Chat must find quota
+    # left for it: none may be shed while lower priorities were admitted.
+    scheduler = Scheduler(rpm=30, tpm=1_000_000)
+    budgets   = {CHAT: 4.0, SCENARIO: 10.0, BACKGROUND: 4.0}
+    results   = {p: {"admitted": [], "shed": 0} for p in PRIORITY_NAMES}
+    lock      = threading.Lock()
+
+    def worker(priority, delay):
+        time.sleep(delay)
+        try:
+            waited = scheduler.acquire(priority, 500, budgets[priority])
+            with lock:
+                results[priority]["admitted"].append(waited)
+        except RateLimited:
+            with lock:
+                results[priority]["shed"] += 1
+
+    arrivals = [(SCENARIO if i % 2 else BACKGROUND, 0.0) for i in range(40)] + [(CHAT, 0.2)] * 6
+    threads  = [threading.Thread(target=worker, args=a) for a in arrivals]
+    started  = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"{len(arrivals)} requests at 30 RPM in {time.perf_counter() - started:.1f}s")
+    for p, name in PRIORITY_NAMES.items():
+        waits = sorted(results[p]["admitted"])
+        p95   = waits[int(0.95 * (len(waits) - 1))] if waits else 0.0
+        print(f"  {name:<10} admitted {len(waits):>2} (p95 wait {p95:4.1f}s, budget "
+              f"{budgets[p]:.0f}s) · shed {results[p]['shed']:>2}")
+    lower = len(results[SCENARIO]["admitted"]) + len(results[BACKGROUND]["admitted"])
+    assert not (results[CHAT]["shed"] and lower), "chat shed while lower priorities were admitted"
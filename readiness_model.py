@@ -0,0 +1,226 @@
+"""
+readiness_model.py
+──────────────────
+Online model of how ready a learner is for a scenario at a level.
+
+Each dialogue line the learner marks is one observation: the line's grammar
+pattern, the scenario, the level and whether they knew it. The model keeps
+
+  • a Beta posterior per grammar pattern — prior mean from the pattern's
+    difficulty, PATTERN_PRIOR pseudo-lines strong
+  • a scenario effect and a level effect on the log-odds scale — Gaussian
+    random effects (prior precision EFFECT_PRECISION) fitted to how much
+    better or worse the learner does there than their pattern skill alone
+    predicts, so they are not double-counted with the patterns
+  • the mix of patterns seen per scenario + level, as weights
+
+update() is O(1) and everything is plain numbers in a JSON-friendly dict,
+stored in the profile. predict() evaluates all patterns in the mix as
+NumPy vectors and returns expected readiness (the share of lines the
+learner will know) with a 90% interval — for a whole dialogue of `lines`
+lines, the interval includes line-to-line chance as well as model doubt.
+
+Run `python readiness_model.py [profile.json]` to backtest against a
+profile's session history (or a simulated one): each session is predicted
+from the sessions before it, and scored against the old profile-wide
+difficulty-weighted average.
+"""
+
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+PATTERN_PRIOR      = 2.0     # pseudo-lines behind each pattern's prior mean
+EFFECT_PRECISION   = 4.0     # prior precision of scenario / level effects (sd 0.5 in log-odds)
+INTERVAL_Z         = 1.645   # 90% interval
+DEFAULT_DIFFICULTY = 3
+
+
+def _prior_mean(difficulty):
+    """Prior probability of knowing a line, from pattern difficulty 1 (easy) … 5 (hard)."""
+    return 0.9 - 0.1 * np.asarray(difficulty, dtype=float)
+
+
+def _trigamma(x):
+    """ψ₁(x), the variance of log X for X ~ Gamma(x) — vectorised, accurate to ~1e-8."""
+    x   = np.asarray(x, dtype=float).copy()
+    acc = np.zeros_like(x)
+    for _ in range(6):
+        acc += 1.0 / (x * x)
+        x   += 1.0
+    inv = 1.0 / x
+    return acc + inv + inv ** 2 / 2 + inv ** 3 / 6 - inv ** 5 / 30
+
+
+def empty_state() -> dict:
+    return {"patterns": {}, "scenarios": {}, "levels": {}, "mix": {}, "level_mix": {}, "n": 0}
+
+
+class ReadinessModel:
+    """View over a state dict (see empty_state); update() changes it in place."""
+
+    def __init__(self, state: dict = None, difficulty: dict = None):
+        self.state      = state if state is not None else empty_state()
+        self.difficulty = difficulty or {}
+
+    @classmethod
+    def replay(cls, sessions: list, difficulty: dict = None) -> "ReadinessModel":
+        """Model fitted to past sessions, oldest first."""
+        model = cls(None, difficulty)
+        for session in sessions:
+            for result in session.get("results", []):
+                model.update(result["pattern"], session["scenario"], session["level"], result["confident"])
+        return model
+
+    def _pattern_ab(self, pattern: str):
+        prior            = float(_prior_mean(self.difficulty.get(pattern, DEFAULT_DIFFICULTY)))
+        known, struggled = self.state["patterns"].get(pattern, (0, 0))
+        return prior * PATTERN_PRIOR + known, (1 - prior) * PATTERN_PRIOR + struggled
+
+    def update(self, pattern: str, scenario: str, level: str, confident: bool):
+        """Add one marked line. O(1)."""
+        a, b = self._pattern_ab(pattern)
+        p    = a / (a + b)
+        y    = 1.0 if confident else 0.0
+        for table, key in (("scenarios", scenario), ("levels", level)):
+            residual = self.state[table].setdefault(key, [0.0, 0.0])
+            residual[0] = round(residual[0] + y - p, 4)          # Σ (observed − pattern-only prediction)
+            residual[1] = round(residual[1] + p * (1 - p), 4)    # Σ Fisher information
+        counts = self.state["patterns"].setdefault(pattern, [0, 0])
+        counts[0 if confident else 1] += 1
+        for mix in (self.state["mix"].setdefault(f"{scenario}|{level}", {}),
+                    self.state["level_mix"].setdefault(level, {})):
+            mix[pattern] = mix.get(pattern, 0) + 1
+        self.state["n"] += 1
+
+    def _effect(self, table: str, key: str):
+        """Posterior mean and variance of a scenario / level log-odds effect."""
+        residual, information = self.state[table].get(key, (0.0, 0.0))
+        precision = information + EFFECT_PRECISION
+        return residual / precision, 1.0 / precision
+
+    def predict(self, scenario: str, level: str, lines: int = None):
+        """
+        {"readiness", "low", "high", "observations"} as fractions, or None
+        with nothing to go on. With `lines`, the interval is for a dialogue
+        of that many lines; without, for the expected share.
+        """
+        mix = (self.state["mix"].get(f"{scenario}|{level}")
+               or self.state["level_mix"].get(level)
+               or {p: k + s for p, (k, s) in self.state["patterns"].items()})
+        if not mix:
+            return None
+        patterns = list(mix)
+        weights  = np.array([mix[p] for p in patterns], dtype=float)
+        weights /= weights.sum()
+        counts   = np.array([self.state["patterns"].get(p, (0, 0)) for p in patterns], dtype=float)
+        prior    = _prior_mean([self.difficulty.get(p, DEFAULT_DIFFICULTY) for p in patterns])
+        a        = prior * PATTERN_PRIOR + counts[:, 0]
+        b        = (1 - prior) * PATTERN_PRIOR + counts[:, 1]
+
+        scenario_effect, scenario_var = self._effect("scenarios", scenario)
+        level_effect,    level_var    = self._effect("levels", level)
+        log_odds = np.log(a / b) + scenario_effect + level_effect
+        p        = 1.0 / (1.0 + np.exp(-log_odds))
+        slope    = weights * p * (1 - p)                       # d readiness / d log-odds, per pattern
+
+        readiness = float(weights @ p)
+        variance  = float(slope ** 2 @ (_trigamma(a) + _trigamma(b))
+                          + slope.sum() ** 2 * (scenario_var + level_var))
+        if lines:
+            variance += float(weights @ (p * (1 - p))) / lines
+        half = INTERVAL_Z * variance ** 0.5
+        return {"readiness": readiness, "low": max(0.0, readiness - half),
+                "high": min(1.0, readiness + half), "observations": self.state["n"]}
+
+
+# ── Backtest ─────────────────────────────────────────────────────────────────
+
+def _simulated_sessions(n: int = 300, seed: int = 3) -> list:
+    """A learner with pattern skills that improve with practice, plus scenario and level offsets."""
+    from user_model import PATTERN_DIFFICULTY
+    rng       = random.Random(seed)
+    patterns  = list(PATTERN_DIFFICULTY)
+    scenarios = ["restaurant", "transport", "shopping", "hotel", "health", "work", "social", "housing"]
+    skill     = {p: 1.5 - 0.6 * PATTERN_DIFFICULTY[p] + rng.gauss(0, 0.5) for p in patterns}
+    offset    = {s: rng.gauss(0, 0.6) for s in scenarios}
+    level_off = {"A1": 0.4, "A2": 0.0, "B1": -0.5}
+    mixes     = {s: rng.sample(patterns, 5) for s in scenarios}
+    sessions  = []
+    for _ in range(n):
+        scenario, level = rng.choice(scenarios), rng.choice(list(level_off))
+        results = []
+        for _ in range(rng.randint(3, 7)):
+            pattern = rng.choice(mixes[scenario])
+            p       = 1 / (1 + np.exp(-(skill[pattern] + offset[scenario] + level_off[level])))
+            results.append({"pattern": pattern, "confident": rng.random() < p})
+            skill[pattern] += 0.03
+        sessions.append({"scenario": scenario, "level": level, "results": results})
+    return sessions
+
+
+def _legacy_prediction(pattern_stats: dict, difficulty: dict):
+    """The previous estimate: difficulty-weighted mean of pattern confidence rates, same for every scenario."""
+    rates = {p: c[0] / (c[0] + c[1]) for p, c in pattern_stats.items() if c[0] + c[1]}
+    if not rates:
+        return None
+    total = sum(difficulty.get(p, DEFAULT_DIFFICULTY) for p in rates)
+    return sum(r * difficulty.get(p, DEFAULT_DIFFICULTY) for p, r in rates.items()) / total
+
+
+def backtest(sessions: list, difficulty: dict) -> dict:
+    """Predict every session from the ones before it; mean absolute error, interval coverage, timings."""
+    model     = ReadinessModel(None, difficulty)
+    errors, legacy_errors, covered = [], [], 0
+    predict_s = update_s = 0.0
+    updates   = 0
+    for i, session in enumerate(sessions):
+        results = session.get("results", [])
+        if not results:
+            continue
+        actual = sum(r["confident"] for r in results) / len(results)
+        if i >= 2:
+            start = time.perf_counter()
+            pred  = model.predict(session["scenario"], session["level"], lines=len(results))
+            predict_s += time.perf_counter() - start
+            legacy = _legacy_prediction(model.state["patterns"], difficulty)
+            if pred is not None and legacy is not None:
+                errors.append(abs(pred["readiness"] - actual))
+                legacy_errors.append(abs(legacy - actual))
+                covered += pred["low"] <= actual <= pred["high"]
+        start = time.perf_counter()
+        for r in results:
+            model.update(r["pattern"], session["scenario"], session["level"], r["confident"])
+        update_s += time.perf_counter() - start
+        updates  += len(results)
+    scored = len(errors)
+    return {
+        "sessions":      scored,
+        "mae":           float(np.mean(errors)) if scored else None,
+        "legacy_mae":    float(np.mean(legacy_errors)) if scored else None,
+        "coverage":      covered / scored if scored else None,
+        "predict_us":    predict_s / max(1, scored) * 1e6,
+        "update_us":     update_s / max(1, updates) * 1e6,
+        "state_bytes":   len(json.dumps(model.state)),
+    }
+
+
+if __name__ == "__main__":
+    from user_model import PATTERN_DIFFICULTY
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            history = json.load(f).get("sessions", [])
+        print(f"Backtesting {len(history)} sessions from {sys.argv[1]}")
+    else:
+        history = _simulated_sessions()
+        print(f"Backtesting {len(history)} simulated sessions (pass a profile JSON to use real history)")
+    report = backtest(history, PATTERN_DIFFICULTY)
+    print(f"  scored sessions        {report['sessions']}")
+    print(f"  mean absolute error    {report['mae']:.3f}  (previous estimate {report['legacy_mae']:.3f})")
+    print(f"  90% interval coverage  {report['coverage']:.0%}")
+    print(f"  update                 {report['update_us']:.1f} µs / line")
+    print(f"  predict                {report['predict_us']:.1f} µs")
+    print(f"  model state            {report['state_bytes']:,} bytes of JSON")
@@ -0,0 +1,239 @@
+"""
+resilience.py
+─────────────
+Timeouts, retries, hedged requests and a circuit breaker for Gemini calls.
+
+call_with_resilience() wraps one blocking model call:
+
+  • latency budget  — the whole call, retries included, must finish within
+                      Policy.budget seconds; each attempt within
+                      Policy.attempt_timeout
+  • retries         — only for retryable errors (timeouts, connection
+                      errors, HTTP 408/429/5xx), with jittered exponential
+                      backoff that never overruns the budget
+  • hedging         — if an attempt hasn't answered after hedge_after
+                      seconds, a duplicate request is raced against it
+  • circuit breaker — once the recent error rate crosses the threshold,
+                      calls fail immediately with CircuitOpen so callers go
+                      straight to their fallbacks; after a cooldown one
+                      trial call is let through to probe recovery
+
+Run `python resilience.py` for a fault-injection drill against the local
+stand-in in fake_gemini.py.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from telemetry import REGISTRY
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Model calls block on network I/O; abandoned (timed-out) calls finish on
+# these threads in the background.
+_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-call")
+
+
+class CallTimeout(TimeoutError):
+    """The call did not finish within its latency budget."""
+
+
+class CircuitOpen(Exception):
+    """The circuit breaker is open — fail fast and use the fallback."""
+
+
+class Policy:
+    """Latency budget and retry/hedge settings for one entry point."""
+
+    def __init__(self, budget: float, attempt_timeout: float, retries: int = 1,
+                 hedge_after: float = None, backoff: float = 0.5):
+        self.budget          = budget
+        self.attempt_timeout = attempt_timeout
+        self.retries         = retries
+        self.hedge_after     = hedge_after
+        self.backoff         = backoff
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return code in RETRYABLE_STATUS
+
+
+# ── Circuit breaker ──────────────────────────────────────────────────────────
+
+class CircuitBreaker:
+    """
+    Rolling-window breaker: opens when at least `min_calls` of the last
+    `window` outcomes were recorded and the failure rate is ≥ `threshold`.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, window: int = 20, min_calls: int = 5,
+                 threshold: float = 0.5, cooldown: float = 30.0):
+        self.window    = window
+        self.min_calls = min_calls
+        self.threshold = threshold
+        self.cooldown  = cooldown
+        self._outcomes = deque(maxlen=window)
+        self._state    = self.CLOSED
+        self._opened   = 0.0
+        self._trial    = False
+        self._lock     = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened >= self.cooldown:
+            self._state = self.HALF_OPEN
+            self._trial = False
+        return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def release(self):
+        """End a half-open trial without an outcome (the call failed for reasons unrelated to health)."""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trial = False
+
+    def record(self, success: bool):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                if success:
+                    self._state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._trip()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.threshold):
+                self._trip()
+
+    def _trip(self):
+        self._state  = self.OPEN
+        self._opened = time.monotonic()
+        self._trial  = False
+
+
+# ── Resilient call ───────────────────────────────────────────────────────────
+
+def _event(name: str, event: str):
+    REGISTRY.inc("convoready_llm_resilience_events_total", {"function": name, "event": event})
+
+
+def _attempt(fn, timeout: float, hedge_after, name: str):
+    """One attempt, optionally hedged. Returns fn()'s result or raises its error."""
+    start    = time.monotonic()
+    pending  = {_EXECUTOR.submit(fn)}
+    hedged   = hedge_after is None
+    last_exc = None
+    while pending:
+        elapsed = time.monotonic() - start
+        if elapsed >= timeout:
+            break
+        wait_for = timeout - elapsed
+        if not hedged:
+            wait_for = min(wait_for, max(0.0, hedge_after - elapsed))
+        done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return future.result()
+            last_exc = future.exception()
+        if not hedged and time.monotonic() - start >= hedge_after and pending:
+            hedged = True
+            pending.add(_EXECUTOR.submit(fn))
+            _event(name, "hedge")
+    if last_exc is not None and not pending:
+        raise last_exc
+    raise CallTimeout(f"{name} exceeded {timeout:.1f}s")
+
+
+def call_with_resilience(fn, policy: Policy, breaker: CircuitBreaker, name: str = "llm"):
+    """Run fn() under the policy's budget, retries and hedging, guarded by the breaker."""
+    deadline = time.monotonic() + policy.budget
+    attempt  = 0
+    while True:
+        if not breaker.allow():
+            _event(name, "circuit_open")
+            raise CircuitOpen(f"{name}: circuit open, using fallback")
+        remaining = deadline - time.monotonic()
+        try:
+            result = _attempt(fn, min(policy.attempt_timeout, remaining), policy.hedge_after, name)
+        except Exception as e:
+            retryable = is_retryable(e)
+            if retryable:
+                breaker.record(False)
+            else:
+                breaker.release()       # a 400 or decode error says nothing about upstream health
+            if isinstance(e, CallTimeout):
+                _event(name, "timeout")
+            if not retryable or attempt >= policy.retries:
+                raise
+            delay = min(policy.backoff * 2 ** attempt, 8.0) * random.uniform(0.5, 1.0)
+            if time.monotonic() + delay >= deadline:
+                raise
+            _event(name, "retry")
+            time.sleep(delay)
+            attempt += 1
+            continue
+        breaker.record(True)
+        return result
+
+
+# ── Fault-injection drill ────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    from fake_gemini import FakeGeminiClient
+
+    def run(label, client, policy, breaker, n=20):
+        ok = failed = fast_fail = 0
+        latencies = []
+        for _ in range(n):
+            t = time.perf_counter()
+            try:
+                call_with_resilience(
+                    lambda: client.models.generate_content(model="fake", contents="phrases"),
+                    policy, breaker, name="drill")
+                ok += 1
+            except CircuitOpen:
+                fast_fail += 1
+            except Exception:
+                failed += 1
+            latencies.append(time.perf_counter() - t)
+        latencies.sort()
+        print(f"{label:<28} ok={ok:<3} failed={failed:<3} fast-fail={fast_fail:<3} "
+              f"p50={latencies[n // 2]:.2f}s max={latencies[-1]:.2f}s "
+              f"upstream={client.calls} breaker={breaker.state}")
+
+    policy = Policy(budget=1.5, attempt_timeout=0.6, retries=2, hedge_after=0.25, backoff=0.05)
+    run("healthy", FakeGeminiClient(latency=0.05), policy, CircuitBreaker())
+    run("slow tail (20% × 2s)", FakeGeminiClient(latency=0.05, tail_rate=0.2, tail_latency=2.0),
+        policy, CircuitBreaker())
+    run("flaky (30% 503)", FakeGeminiClient(latency=0.05, error_rate=0.3), policy, CircuitBreaker())
+    run("outage (100% 503)", FakeGeminiClient(latency=0.05, error_rate=1.0), policy,
+        CircuitBreaker(min_calls=5, cooldown=60))
+    run("hang (every call 5s)", FakeGeminiClient(latency=5.0), policy,
+        CircuitBreaker(min_calls=3, cooldown=60), n=8)
+    run("bad request (400)", FakeGeminiClient(latency=0.05, error_rate=1.0, error_code=400),
+        policy, CircuitBreaker(), n=5)
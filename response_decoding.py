@@ -0,0 +1,425 @@
+"""
+response_decoding.py
+────────────────────
+Shared decoding of Gemini's structured (JSON) responses.
+
+Three layers, used by every generator in llm_generator.py:
+
+  1. Response schemas  — PHRASES_SCHEMA, dialogue_schema(), CHAT_SCHEMA and
+                         FEEDBACK_SCHEMA are sent with the request
+                         (response_mime_type="application/json"), so the
+                         model is constrained to the right shape up front.
+  2. Tolerant extractor — extract_json() finds the JSON value in noisy text
+                         (code fences, prose around it, trailing commas) and
+                         repairs output cut off mid-stream; JsonStream does
+                         the same incrementally, yielding array items as
+                         they close so a timed-out stream can be salvaged.
+  3. Field validation  — conform() checks the value against the schema and
+                         repairs (type coercion, enum normalisation,
+                         defaults) or drops individual bad items instead of
+                         discarding the whole response.
+
+Run `python response_decoding.py` to compare the fallback rate of the old
+fence-strip + json.loads parsing against this decoder on a set of noisy
+model outputs.
+"""
+
+import json
+import re
+
+PATTERNS = ["present_simple", "basic_question", "polite_request", "future", "past_simple",
+            "conditional", "subjunctive", "complex", "greeting", "negation"]
+LEVELS   = ["A1", "A2", "B1"]
+
+
+class DecodeError(ValueError):
+    """The response held no usable value for the schema."""
+
+
+# ── Schemas (Gemini OpenAPI subset) ──────────────────────────────────────────
+
+PHRASES_SCHEMA = {
+    "type": "ARRAY", "minItems": 1, "maxItems": 6,
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "es":      {"type": "STRING"},
+            "en":      {"type": "STRING"},
+            "tip":     {"type": "STRING"},
+            "level":   {"type": "STRING", "enum": LEVELS},
+            "pattern": {"type": "STRING", "enum": PATTERNS},
+        },
+        "required": ["es", "en", "tip", "level", "pattern"],
+        "propertyOrdering": ["es", "en", "tip", "level", "pattern"],
+    },
+}
+
+CHAT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {"spanish": {"type": "STRING"}, "english": {"type": "STRING"}},
+    "required": ["spanish", "english"],
+    "propertyOrdering": ["spanish", "english"],
+}
+
+FEEDBACK_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "score":        {"type": "INTEGER", "minimum": 0, "maximum": 100},
+        "summary":      {"type": "STRING"},
+        "strengths":    {"type": "ARRAY", "items": {"type": "STRING"}, "maxItems": 3},
+        "improvements": {"type": "ARRAY", "items": {"type": "STRING"}, "maxItems": 3},
+        "next_focus":   {"type": "STRING"},
+    },
+    "required": ["score", "summary", "strengths", "improvements", "next_focus"],
+    "propertyOrdering": ["score", "summary", "strengths", "improvements", "next_focus"],
+}
+
+
+def dialogue_schema(other_speaker: str) -> dict:
+    return {
+        "type": "ARRAY", "minItems": 4,
+        "items": {
+            "type": "OBJECT",
+            "properties": {
+                "speaker": {"type": "STRING", "enum": ["You", other_speaker]},
+                "es":      {"type": "STRING"},
+                "en":      {"type": "STRING"},
+            },
+            "required": ["speaker", "es", "en"],
+            "propertyOrdering": ["speaker", "es", "en"],
+        },
+    }
+
+
+def request_config(schema: dict) -> dict:
+    """generate_content config asking for JSON that matches `schema`."""
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+
+# ── Tolerant extraction ──────────────────────────────────────────────────────
+
+_DECODER        = json.JSONDecoder()
+_TRAILING_COMMA = re.compile(r",(\s*[\]}])")
+_CLOSERS        = {"[": "]", "{": "}"}
+MAX_CANDIDATES  = 20      # opening brackets tried before giving up
+
+
+def _scan(text: str):
+    """
+    Walk JSON-ish text tracking strings and bracket nesting. Returns the
+    cut points — (index of a top-level-or-nested ',', closers needed there) —
+    and the closers still needed at the end (None if the value closed).
+    """
+    stack, cuts, in_str, esc = [], [], False, False
+    for i, c in enumerate(text):
+        if in_str:
+            if esc:
+                esc = False
+            elif c == "\\":
+                esc = True
+            elif c == '"':
+                in_str = False
+        elif c == '"':
+            in_str = True
+        elif c in "[{":
+            stack.append(c)
+        elif c in "]}":
+            if stack:
+                stack.pop()
+            if not stack:
+                return cuts, None
+        elif c == "," and stack:
+            cuts.append((i, "".join(_CLOSERS[b] for b in reversed(stack))))
+    if in_str:
+        return cuts, '"' + "".join(_CLOSERS[b] for b in reversed(stack))
+    return cuts, "".join(_CLOSERS[b] for b in reversed(stack))
+
+
+def _repair_truncated(text: str):
+    """Close a value cut off mid-stream, dropping the incomplete last member."""
+    cuts, closers = _scan(text)
+    if closers is None:
+        return None
+    attempts = [text.rstrip().rstrip(",:") + closers]
+    attempts += [text[:pos] + tail for pos, tail in reversed(cuts[-8:])]
+    for candidate in attempts:
+        try:
+            return json.loads(_TRAILING_COMMA.sub(r"\1", candidate))
+        except ValueError:
+            continue
+    return None
+
+
+def extract_json(text: str, expect: type = None):
+    """
+    The first JSON value of type `expect` (list / dict) in `text`, tolerating
+    fences, surrounding prose, trailing commas and truncation. None if nothing
+    usable is found.
+    """
+    if not text:
+        return None
+    opener = {list: "[", dict: "{"}.get(expect)
+
+    def starts(source):
+        found = (i for i, c in enumerate(source) if c == opener or (opener is None and c in "[{"))
+        return [i for _, i in zip(range(MAX_CANDIDATES), found)]
+
+    for source in (text, _TRAILING_COMMA.sub(r"\1", text)):
+        for i in starts(source):
+            try:
+                value, _ = _DECODER.raw_decode(source, i)
+            except ValueError:
+                continue
+            if expect is None or isinstance(value, expect):
+                return value
+    first = starts(text)[:1]
+    if first:
+        value = _repair_truncated(text[first[0]:])
+        if expect is None or isinstance(value, expect):
+            return value
+    return None
+
+
+class JsonStream:
+    """
+    Incremental extractor for a streamed top-level JSON array: feed() text
+    chunks as they arrive and get back the items completed by that chunk.
+    """
+
+    def __init__(self):
+        self.text   = ""
+        self.items  = []
+        self._pos   = 0
+        self._depth = 0
+        self._start = None      # index just after '[' or after the last item's ','
+        self._str   = False
+        self._esc   = False
+        self._done  = False
+
+    def feed(self, chunk: str) -> list:
+        self.text += chunk
+        new = []
+        for i in range(self._pos, len(self.text)):
+            if self._done:
+                break
+            c = self.text[i]
+            if self._str:
+                if self._esc:
+                    self._esc = False
+                elif c == "\\":
+                    self._esc = True
+                elif c == '"':
+                    self._str = False
+            elif self._depth == 0:
+                if c == "[":
+                    self._depth, self._start = 1, i + 1
+            elif c == '"':
+                self._str = True
+            elif c in "[{":
+                self._depth += 1
+            elif c in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._flush(self.text[self._start:i], new)
+                    self._done = True
+            elif c == "," and self._depth == 1:
+                self._flush(self.text[self._start:i], new)
+                self._start = i + 1
+        self._pos = len(self.text)
+        return new
+
+    def _flush(self, raw: str, new: list):
+        raw = raw.strip()
+        if not raw:
+            return
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            return
+        self.items.append(item)
+        new.append(item)
+
+
+# ── Field validation and repair ──────────────────────────────────────────────
+
+class _Report:
+    def __init__(self):
+        self.repaired = 0
+        self.dropped  = 0
+
+
+def _enum_match(value: str, options: list):
+    key = re.sub(r"[\s\-]+", "_", value.strip().lower())
+    for option in options:
+        if option.lower() == key or option.lower() == value.strip().lower():
+            return option
+    return None
+
+
+def _conform(value, schema: dict, defaults: dict, report: _Report, name: str = None):
+    """Return the repaired value, or raise DecodeError if it can't be used."""
+    kind = schema.get("type")
+
+    if kind == "STRING":
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+            report.repaired += 1
+        if not isinstance(value, str) or not value.strip():
+            raise DecodeError(f"{name}: expected text")
+        if value != value.strip():
+            report.repaired += 1
+        value = value.strip()
+        if "enum" in schema and value not in schema["enum"]:
+            match = _enum_match(value, schema["enum"])
+            if match is None:
+                raise DecodeError(f"{name}: {value!r} not one of {schema['enum']}")
+            report.repaired += 1
+            value = match
+        return value
+
+    if kind == "INTEGER":
+        if isinstance(value, bool):
+            raise DecodeError(f"{name}: expected integer")
+        if isinstance(value, str):
+            digits = re.search(r"-?\d+(\.\d+)?", value)
+            if not digits:
+                raise DecodeError(f"{name}: expected integer")
+            value = float(digits.group())
+            report.repaired += 1
+        if not isinstance(value, (int, float)):
+            raise DecodeError(f"{name}: expected integer")
+        clamped = int(round(min(max(value, schema.get("minimum", value)), schema.get("maximum", value))))
+        if clamped != value:
+            report.repaired += 1
+        return clamped
+
+    if kind == "ARRAY":
+        if isinstance(value, dict) and schema["items"].get("type") == "OBJECT":
+            value = [value]
+            report.repaired += 1
+        if not isinstance(value, list):
+            raise DecodeError(f"{name}: expected a list")
+        items = []
+        for item in value:
+            try:
+                items.append(_conform(item, schema["items"], defaults, report, name))
+            except DecodeError:
+                report.dropped += 1
+        if "maxItems" in schema and len(items) > schema["maxItems"]:
+            items = items[:schema["maxItems"]]
+        if len(items) < schema.get("minItems", 0):
+            raise DecodeError(f"{name}: {len(items)} usable items, need {schema['minItems']}")
+        return items
+
+    if kind == "OBJECT":
+        if not isinstance(value, dict):
+            raise DecodeError(f"{name}: expected an object")
+        out = {}
+        for field, sub in schema["properties"].items():
+            if field in value:
+                try:
+                    out[field] = _conform(value[field], sub, defaults, report, field)
+                    continue
+                except DecodeError:
+                    if field not in defaults:
+                        raise
+            elif field not in schema.get("required", []):
+                continue
+            elif field not in defaults:
+                raise DecodeError(f"missing {field}")
+            out[field] = defaults[field]
+            report.repaired += 1
+        return out
+
+    return value
+
+
+def conform(value, schema: dict, defaults: dict = None):
+    """
+    Validate `value` against `schema`, repairing what can be repaired.
+    `defaults` fills missing or invalid object fields by name. Returns
+    (value, repaired count, dropped item count); raises DecodeError.
+    """
+    report = _Report()
+    result = _conform(value, schema, defaults or {}, report)
+    return result, report.repaired, report.dropped
+
+
+def decode(text: str, schema: dict, defaults: dict = None):
+    """extract_json() + conform(). Returns (value, repaired, dropped); raises DecodeError."""
+    expect = list if schema.get("type") == "ARRAY" else dict
+    value  = extract_json(text, expect)
+    if value is None and expect is list:
+        value = extract_json(text, dict)     # a lone item instead of a list of one
+    if value is None:
+        raise DecodeError("no JSON value found")
+    return conform(value, schema, defaults)
+
+
+# ── Benchmark: old parser vs decoder ─────────────────────────────────────────
+
+def _legacy_parse(text: str):
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("```")[1]
+        if text.startswith("json"):
+            text = text[4:]
+    return json.loads(text.strip())
+
+
+if __name__ == "__main__":
+    good = [{"es": "¿Me trae la cuenta?", "en": "Can you bring the bill?", "tip": "💡 Ask politely.",
+             "level": "A1", "pattern": "polite_request"},
+            {"es": "Quería una mesa.", "en": "I wanted a table.", "tip": "💡 Softer than quiero.",
+             "level": "A2", "pattern": "polite_request"},
+            {"es": "No como carne.", "en": "I don't eat meat.", "tip": "💡 Say it early.",
+             "level": "A1", "pattern": "negation"}]
+    clean = json.dumps(good, ensure_ascii=False)
+    outputs = {
+        "clean":              clean,
+        "fenced":             f"```json\n{clean}\n```",
+        "fenced, no lang":    f"```\n{clean}\n```",
+        "prose before":       f"Here are your phrases:\n{clean}",
+        "prose after":        f"{clean}\nLet me know if you need more!",
+        "prose + fence":      f"Sure! Here you go:\n```json\n{clean}\n```\nEnjoy.",
+        "trailing comma":     clean[:-1] + ",]",
+        "truncated":          clean[:-40],
+        "truncated in str":   clean[:len(clean) // 2],
+        "bad enum":           clean.replace('"polite_request"', '"Polite Request"'),
+        "one bad item":       json.dumps(good + [{"es": "", "en": 3}], ensure_ascii=False),
+        "missing pattern":    json.dumps([{k: v for k, v in g.items() if k != "pattern"} for g in good],
+                                         ensure_ascii=False),
+        "single object":      json.dumps(good[0], ensure_ascii=False),
+        "not json":           "Lo siento, no puedo ayudar con eso.",
+    }
+    defaults = {"pattern": "present_simple", "level": "A1"}
+
+    def legacy_ok(text):
+        try:
+            value = _legacy_parse(text)
+            return isinstance(value, list) and len(value) > 0
+        except ValueError:
+            return False
+
+    def decoder_ok(text):
+        try:
+            value, _, _ = decode(text, PHRASES_SCHEMA, defaults)
+            return bool(value)
+        except DecodeError:
+            return False
+
+    print(f"{'output':<20} {'legacy':<8} decoder")
+    legacy_fail = decoder_fail = 0
+    for label, text in outputs.items():
+        a, b = legacy_ok(text), decoder_ok(text)
+        legacy_fail  += not a
+        decoder_fail += not b
+        print(f"{label:<20} {'ok' if a else 'FALLBACK':<8} {'ok' if b else 'FALLBACK'}")
+    n = len(outputs)
+    print(f"\nfallback rate: legacy {legacy_fail / n:.0%} → decoder {decoder_fail / n:.0%}")
+    print("(legacy 'ok' rows for bad enum / bad item / missing pattern pass invalid fields to the app)")
+
+    stream = JsonStream()
+    for i in range(0, len(clean), 17):
+        for item in stream.feed(clean[i:i + 17]):
+            print(f"streamed item at byte {i + 17:>3}: {item['es']}")
@@ -0,0 +1,136 @@
+"""
+session_cache.py
+────────────────
+Bounded, stably keyed per-session state for the results page.
+
+Every scenario a visitor analyses leaves its generated phrases and dialogue
+in the session, plus a flag saying its marks were recorded. Without a bound
+a long-lived session grows with every scenario tried. This module keeps
+them in an LRU:
+
+  scenario_key(text, level)   "scenario_data_<id>" — where the content lives
+  touch(state, key)           mark a scenario as just used; evicts the least
+                              recently used beyond MAX_SCENARIOS
+
+The marks-recorded flags live apart from that LRU, as bare ids in one small
+ordered set bounded by MAX_RECORDED. A learner coming back to a scenario
+whose content was evicted gets it rebuilt, but its marks are not recorded
+as a second session:
+
+  is_recorded(state, text, level)      were this scenario's marks saved?
+  set_recorded(state, text, level, v)  set / clear that flag
+
+<id> is a truncated SHA-256 of the text and level, so keys are short
+whatever the scenario text and the same in every process (unlike hash(),
+which is salted per interpreter). An evicted scenario is simply rebuilt
+from the shared content store if the learner comes back to it.
+
+memory_report(state) estimates the bytes held per session key, for the
+debug panel. Works on st.session_state or any dict — no Streamlit imports.
+"""
+
+import hashlib
+import os
+import sys
+import types
+
+MAX_SCENARIOS = int(os.environ.get("CONVOREADY_SESSION_SCENARIOS", "8"))
+MAX_RECORDED  = int(os.environ.get("CONVOREADY_SESSION_RECORDED", "1000"))   # ~120 KB at most
+
+_LRU_KEY      = "scenario_lru"
+_RECORDED_KEY = "recorded_ids"
+
+
+def content_id(user_text: str, level_code: str) -> str:
+    """Stable 16-hex-digit id for a scenario text + level."""
+    return hashlib.sha256(f"{level_code}\x00{user_text}".encode()).hexdigest()[:16]
+
+
+def scenario_key(user_text: str, level_code: str) -> str:
+    return f"scenario_data_{content_id(user_text, level_code)}"
+
+
+def is_recorded(state, user_text: str, level_code: str) -> bool:
+    return content_id(user_text, level_code) in state.get(_RECORDED_KEY, ())
+
+
+def set_recorded(state, user_text: str, level_code: str, recorded: bool = True,
+                 max_entries: int = MAX_RECORDED):
+    """Flag (or unflag) a scenario's marks as saved; the oldest flags go beyond max_entries."""
+    ids = state.get(_RECORDED_KEY)
+    if ids is None:
+        ids = state[_RECORDED_KEY] = {}       # dict as an insertion-ordered set
+    cid = content_id(user_text, level_code)
+    ids.pop(cid, None)
+    if recorded:
+        ids[cid] = None
+        while len(ids) > max(1, max_entries):
+            del ids[next(iter(ids))]
+
+
+def touch(state, key: str, max_entries: int = MAX_SCENARIOS) -> list:
+    """Make `key` (a scenario_key) the most recently used; returns the keys evicted to stay in budget."""
+    order = state.get(_LRU_KEY)
+    if order is None:
+        order = state[_LRU_KEY] = []
+    if key in order:
+        if order[-1] == key:
+            return []
+        order.remove(key)
+    order.append(key)
+    evicted = []
+    while len(order) > max(1, max_entries):
+        old = order.pop(0)
+        state.pop(old, None)
+        evicted.append(old)
+    return evicted
+
+
+# ── Memory report ────────────────────────────────────────────────────────────
+
+def deep_size(obj, seen: set = None) -> int:
+    """Approximate bytes reachable from obj: containers and plain objects are followed, once each."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    try:
+        size = sys.getsizeof(obj)
+    except TypeError:
+        return 0
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None),
+                        type, types.ModuleType, types.FunctionType, types.MethodType)):
+        return size
+    if isinstance(obj, dict):
+        # dict.items, not obj.items: a LazyProfile would inflate its sessions
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in dict.items(obj))
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(v, seen) for v in obj)
+    attrs = getattr(obj, "__dict__", None)
+    if isinstance(attrs, dict):
+        size += deep_size(attrs, seen)
+    return size
+
+
+def memory_report(state) -> dict:
+    """
+    {"total": bytes, "keys": [(key, bytes), ...] largest first,
+     "scenarios": entries held, "budget": MAX_SCENARIOS} for one session.
+    Objects shared between keys are counted once, under the first key.
+    """
+    seen = set()
+    keys = []
+    for key in list(state.keys()):
+        try:
+            value = state[key]
+        except KeyError:
+            continue
+        try:
+            keys.append((str(key), deep_size(value, seen)))
+        except RecursionError:
+            keys.append((str(key), sys.getsizeof(value)))
+    keys.sort(key=lambda kv: kv[1], reverse=True)
+    return {"total":     sum(size for _, size in keys),
+            "keys":      keys,
+            "scenarios": len(state.get(_LRU_KEY, [])),
+            "budget":    MAX_SCENARIOS}
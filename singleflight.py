@@ -0,0 +1,86 @@
+"""
+singleflight.py
+───────────────
+Coalescing of identical in-flight model calls.
+
+When a class all clicks the same example scenario at once, every session
+asks Gemini for the same phrases and dialogue. SingleFlight.do() lets the
+first caller for a key (the leader) make the call while everyone who asks
+for the same key before it finishes waits for the leader's result instead
+of making their own:
+
+    text, shared = FLIGHTS.do(flight_key("generate_phrases", prompt), call_model, timeout=25)
+
+  • a waiter gives up after its own `timeout` with CallTimeout — the leader
+    carries on, and its result still reaches everyone else
+  • if the leader fails, every waiter gets the same exception; nobody
+    retries in its place, so one upstream error can't become a burst of
+    N retries
+  • the key is forgotten as soon as the call settles — this is not a
+    cache, the next caller after that makes a fresh call
+
+test_singleflight.py drills these with 50 concurrent callers against
+fake_gemini.py.
+"""
+
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from resilience import CallTimeout
+from telemetry import REGISTRY
+
+
+def flight_key(*parts) -> str:
+    """Stable key for a generation from its function name, prompt and schema."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self._flights = {}      # key -> Future of the leader's call
+        self._lock    = threading.Lock()
+
+    def do(self, key: str, fn, timeout: float = None, labels: dict = None):
+        """
+        (fn(), False) if this caller led the call, (leader's result, True) if
+        it joined one in flight. Raises whatever the leader raised, or
+        CallTimeout if a joined call doesn't settle within `timeout`.
+        """
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = Future()
+        labels = labels or {}
+        if leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+                return result, False
+            finally:
+                with self._lock:
+                    self._flights.pop(key, None)
+
+        REGISTRY.inc("convoready_llm_coalesced_total", {**labels, "outcome": "joined"})
+        try:
+            return future.result(timeout), True
+        except FutureTimeout:
+            REGISTRY.inc("convoready_llm_coalesced_total", {**labels, "outcome": "timed_out"})
+            raise CallTimeout(f"shared call did not finish within {timeout:.1f}s") from None
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+
+FLIGHTS = SingleFlight()
+
@@ -0,0 +1,146 @@
+"""
+spaced_repetition.py
+────────────────────
+SM-2 review scheduling for the phrases a learner struggled with.
+
+A phrase enters the queue the first time it is marked "I'd struggle"; every
+later mark of it — confident or not — is a review that moves its next due
+date (SM-2: intervals grow by the ease factor on success, reset to a day on
+a lapse, and the ease factor drops with each lapse).
+
+Per-phrase state is one short list in the profile JSON,
+
+    profile["review"] = {"Quería una mesa para dos": [due, interval, ease, reps, lapses], ...}
+
+with `due` in whole minutes since the epoch. ReviewQueue keeps a binary
+heap of (due, phrase) over that state, so a review is O(log n) and the next
+k due phrases are read in O(k log k) without touching the rest — stale heap
+entries left behind by reschedules are skipped, and the heap is rebuilt
+once they outnumber live ones.
+
+Run `python spaced_repetition.py` for scheduling and query timings as the
+number of reviewed phrases grows.
+"""
+
+import heapq
+import random
+import time
+
+INITIAL_EASE    = 2.5
+MIN_EASE        = 1.3
+PASS_QUALITY    = 4          # SM-2 grade for "I know this"
+FAIL_QUALITY    = 2          # ... and for "I'd struggle"
+RELEARN_DAYS    = 1.0        # interval after a lapse
+MINUTES_PER_DAY = 1440
+
+DUE, INTERVAL, EASE, REPS, LAPSES = range(5)
+
+
+def _minute(ts: float) -> int:
+    return int(ts // 60)
+
+
+def next_state(state, confident: bool, now_minute: int) -> list:
+    """SM-2 update of one phrase's [due, interval, ease, reps, lapses] (None for a new phrase)."""
+    _, interval, ease, reps, lapses = state or (0, 0.0, INITIAL_EASE, 0, 0)
+    quality = PASS_QUALITY if confident else FAIL_QUALITY
+    if confident:
+        interval = 1.0 if reps == 0 else 6.0 if reps == 1 else interval * ease
+        reps    += 1
+    else:
+        interval = RELEARN_DAYS
+        reps     = 0
+        lapses  += 1
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return [now_minute + int(interval * MINUTES_PER_DAY), round(interval, 2), round(ease, 2), reps, lapses]
+
+
+class ReviewQueue:
+    """Due-date index over a profile's review state (the dict is updated in place)."""
+
+    def __init__(self, items: dict):
+        self.items = items
+        self._heap = [(state[DUE], phrase) for phrase, state in items.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self.items)
+
+    def review(self, phrase: str, confident: bool, now: float = None):
+        """Record one mark of `phrase`. Confident marks of phrases not in the queue are ignored."""
+        state = self.items.get(phrase)
+        if state is None and confident:
+            return None
+        state = self.items[phrase] = next_state(state, confident, _minute(now or time.time()))
+        heapq.heappush(self._heap, (state[DUE], phrase))
+        if len(self._heap) > 2 * len(self.items) + 64:
+            self._rebuild()
+        return state
+
+    def upcoming(self, k: int = 10) -> list:
+        """The k earliest-due phrases as (phrase, due timestamp), without modifying the heap."""
+        heap, found, seen = self._heap, [], set()
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier and len(found) < k:
+            (due, phrase), i = heapq.heappop(frontier)
+            state = self.items.get(phrase)
+            if state is not None and state[DUE] == due and phrase not in seen:
+                seen.add(phrase)
+                found.append((phrase, due * 60))
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return found
+
+    def due(self, k: int = 10, now: float = None) -> list:
+        """Up to k phrases due at `now`, most overdue first."""
+        cutoff = now or time.time()
+        return [(phrase, due) for phrase, due in self.upcoming(k) if due <= cutoff]
+
+    def _rebuild(self):
+        self._heap = [(state[DUE], phrase) for phrase, state in self.items.items()]
+        heapq.heapify(self._heap)
+
+
+def replay(sessions: list) -> dict:
+    """Review state built from past sessions' results, for profiles that predate scheduling."""
+    from datetime import datetime
+    queue = ReviewQueue({})
+    for session in sessions:
+        try:
+            ts = datetime.fromisoformat(session["timestamp"]).timestamp()
+        except (KeyError, ValueError):
+            ts = time.time()
+        for result in session.get("results", []):
+            queue.review(result["phrase"], result["confident"], ts)
+    return queue.items
+
+
+# ── Benchmark ────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    rng  = random.Random(7)
+    now  = time.time()
+    for n in (1_000, 10_000, 100_000):
+        queue = ReviewQueue({})
+        for i in range(n):
+            queue.review(f"frase {i}", False, now - rng.uniform(0, 90) * 86400)
+
+        phrases = [f"frase {rng.randrange(n)}" for _ in range(5_000)]
+        start = time.perf_counter()
+        for p in phrases:
+            queue.review(p, rng.random() < 0.7, now)
+        review_us = (time.perf_counter() - start) / len(phrases) * 1e6
+
+        start = time.perf_counter()
+        for _ in range(1_000):
+            queue.due(10, now)
+        due_us = (time.perf_counter() - start) / 1_000 * 1e6
+
+        start = time.perf_counter()
+        for _ in range(20):
+            sorted(((s[DUE], p) for p, s in queue.items.items() if s[DUE] * 60 <= now))[:10]
+        scan_us = (time.perf_counter() - start) / 20 * 1e6
+
+        print(f"{n:>7,} phrases: review {review_us:5.1f} µs · next 10 due {due_us:6.1f} µs "
+              f"(full scan {scan_us:9.0f} µs) · heap {len(queue._heap):,}")
@@ -0,0 +1,338 @@
+"""
+telemetry.py
+────────────
+Instrumentation for ConvoReady's Gemini calls.
+
+Every model entry point in llm_generator.py runs inside track_call(), which
+records, labelled by function and model:
+
+  convoready_llm_calls_total          calls by outcome (ok / fallback / error)
+  convoready_llm_fallbacks_total      fallbacks by reason
+  convoready_llm_parse_failures_total responses that could not be decoded
+  convoready_llm_decode_total         decoded responses by outcome (clean / repaired / dropped)
+  convoready_llm_cache_hits_total     generations served without a model call
+  convoready_llm_coalesced_total      calls that joined an identical call in flight (joined / timed_out)
+  convoready_llm_latency_seconds      wall time (histogram)
+  convoready_llm_queue_wait_seconds   time queued for rate-limit quota (histogram)
+  convoready_llm_ttfb_seconds         time to first streamed chunk (histogram)
+  convoready_llm_prompt_tokens        prompt tokens (histogram)
+  convoready_llm_output_tokens        output tokens (histogram)
+
+rate_limiter.py counts admissions by priority and outcome:
+
+  convoready_llm_queue_total          admitted / rejected (wait too long) / timed_out
+
+and, for the results page, labelled by where the first content came from:
+
+  convoready_ui_first_paint_seconds   analyse click to first rendered content (histogram)
+  convoready_ui_personalised_seconds  analyse click to personalised content (histogram)
+
+Metrics are kept in-process, written periodically to a local JSON file and
+served in Prometheus text format by start_metrics_server() (/metrics).
+No Streamlit imports — safe to use from background threads.
+"""
+
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+METRICS_PATH   = os.environ.get("CONVOREADY_METRICS_FILE", os.path.join(".convoready", "metrics.json"))
+METRICS_PORT   = int(os.environ.get("CONVOREADY_METRICS_PORT", "9464"))
+FLUSH_INTERVAL = 10.0   # seconds between metrics file writes
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, math.inf)
+TOKEN_BUCKETS   = (32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, math.inf)
+
+HELP = {
+    "convoready_llm_calls_total":          "Gemini entry-point calls by outcome.",
+    "convoready_llm_fallbacks_total":      "Calls that returned fallback content, by reason.",
+    "convoready_llm_parse_failures_total": "Model responses that could not be decoded.",
+    "convoready_llm_decode_total":         "Decoded model responses by outcome (clean / repaired / dropped items).",
+    "convoready_llm_cache_hits_total":     "Generations served from a cache instead of a model call.",
+    "convoready_llm_coalesced_total":      "Calls that waited on an identical in-flight call instead of calling the model.",
+    "convoready_llm_latency_seconds":      "Wall time of Gemini entry-point calls.",
+    "convoready_llm_queue_wait_seconds":   "Time a call waited for rate-limit quota before being sent.",
+    "convoready_llm_queue_total":          "Rate-limiter admissions by priority and outcome.",
+    "convoready_llm_ttfb_seconds":         "Time to first streamed response chunk.",
+    "convoready_llm_prompt_tokens":        "Prompt tokens per call.",
+    "convoready_llm_output_tokens":        "Output tokens per call.",
+    "convoready_ui_first_paint_seconds":   "Time from submitting a scenario to the first rendered content.",
+    "convoready_ui_personalised_seconds":  "Time from submitting a scenario to personalised content.",
+}
+
+# ── Metric primitives ────────────────────────────────────────────────────────
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics)."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts  = [0] * len(self.buckets)
+        self.sum     = 0.0
+        self.count   = 0
+
+    def observe(self, value: float):
+        self.sum   += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside the bucket."""
+        if not self.count:
+            return 0.0
+        rank, seen, lower = q * self.count, 0, 0.0
+        for bound, n in zip(self.buckets, self.counts):
+            if seen + n >= rank and n:
+                if math.isinf(bound):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / n
+            seen += n
+            lower = bound if not math.isinf(bound) else lower
+        return lower
+
+    def to_dict(self) -> dict:
+        return {"buckets": [b if not math.isinf(b) else "+Inf" for b in self.buckets],
+                "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+
+class Registry:
+    """Thread-safe store of labelled counters and histograms."""
+
+    def __init__(self):
+        self._lock       = threading.Lock()
+        self._counters   = {}   # (name, labels) -> float
+        self._histograms = {}   # (name, labels) -> Histogram
+        self._last_flush = 0.0
+
+    def inc(self, name: str, labels: dict, n: float = 1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def observe(self, name: str, labels: dict, value: float, buckets=LATENCY_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "timestamp":  time.time(),
+                "counters":   [{"name": n, "labels": dict(l), "value": v}
+                               for (n, l), v in self._counters.items()],
+                "histograms": [{"name": n, "labels": dict(l), **h.to_dict()}
+                               for (n, l), h in self._histograms.items()],
+            }
+
+    def histogram(self, name: str, labels: dict):
+        with self._lock:
+            return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def prometheus_text(self) -> str:
+        lines, seen = [], set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                header(name, "counter")
+                lines.append(f"{name}{_fmt_labels(labels)} {value:g}")
+            for (name, labels), hist in sorted(self._histograms.items(), key=lambda kv: kv[0]):
+                header(name, "histogram")
+                cumulative = 0
+                for bound, n in zip(hist.buckets, hist.counts):
+                    cumulative += n
+                    le = "+Inf" if math.isinf(bound) else f"{bound:g}"
+                    lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {hist.sum:g}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self, path: str = METRICS_PATH, force: bool = False):
+        """Write the snapshot to the metrics file, at most once per FLUSH_INTERVAL."""
+        now = time.time()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Could not write metrics file %s: %s", path, e)
+
+
+def _fmt_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + body + "}"
+
+
+def _escape(value) -> str:
+    """A label value in the text exposition format: backslash, quote and newline escaped."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = Registry()
+atexit.register(lambda: REGISTRY.flush(force=True))
+
+# ── Call tracking ────────────────────────────────────────────────────────────
+
+class CallRecord:
+    """Mutable record of one entry-point call, filled in by the caller."""
+
+    def __init__(self, function: str, model: str):
+        self.labels          = {"function": function, "model": model}
+        self.started         = time.perf_counter()
+        self.ttfb            = None
+        self.queue_wait      = None
+        self.prompt_tokens   = None
+        self.output_tokens   = None
+        self.fallback_reason = None
+        self.errored         = False
+
+    def first_byte(self):
+        if self.ttfb is None:
+            self.ttfb = time.perf_counter() - self.started
+
+    def queued(self, seconds: float):
+        self.queue_wait = seconds
+
+    def usage(self, prompt_tokens, output_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+
+    def parse_failure(self):
+        REGISTRY.inc("convoready_llm_parse_failures_total", self.labels)
+
+    def error(self, exc: Exception):
+        self.errored = True
+        logger.warning("%s failed: %s", self.labels["function"], exc)
+
+    def fallback(self, reason: str):
+        self.fallback_reason = reason
+
+
+@contextmanager
+def track_call(function: str, model: str):
+    """Time one Gemini entry-point call and record its outcome on exit."""
+    call = CallRecord(function, model)
+    try:
+        yield call
+    except Exception as e:
+        call.error(e)
+        raise
+    finally:
+        labels  = call.labels
+        outcome = "fallback" if call.fallback_reason else "error" if call.errored else "ok"
+        REGISTRY.inc("convoready_llm_calls_total", {**labels, "outcome": outcome})
+        if call.fallback_reason:
+            REGISTRY.inc("convoready_llm_fallbacks_total", {**labels, "reason": call.fallback_reason})
+        REGISTRY.observe("convoready_llm_latency_seconds", labels,
+                         time.perf_counter() - call.started)
+        if call.queue_wait is not None:
+            REGISTRY.observe("convoready_llm_queue_wait_seconds", labels, call.queue_wait)
+        if call.ttfb is not None:
+            REGISTRY.observe("convoready_llm_ttfb_seconds", labels, call.ttfb)
+        if call.prompt_tokens is not None:
+            REGISTRY.observe("convoready_llm_prompt_tokens", labels, call.prompt_tokens, TOKEN_BUCKETS)
+        if call.output_tokens is not None:
+            REGISTRY.observe("convoready_llm_output_tokens", labels, call.output_tokens, TOKEN_BUCKETS)
+        REGISTRY.flush()
+
+
+def cache_hit(function: str, source: str, model: str = ""):
+    """Count a generation served from `source` (session, store, ...) without calling the model."""
+    REGISTRY.inc("convoready_llm_cache_hits_total",
+                 {"function": function, "model": model, "source": source})
+
+
+def ui_timing(stage: str, source: str, seconds: float):
+    """Record a results-page milestone: stage is "first_paint" or "personalised"."""
+    REGISTRY.observe(f"convoready_ui_{stage}_seconds", {"source": source}, seconds)
+
+
+def latency_summary() -> list:
+    """Per-function call count and p50/p95 latency, for the debug panel."""
+    rows = []
+    for h in REGISTRY.snapshot()["histograms"]:
+        if h["name"] != "convoready_llm_latency_seconds":
+            continue
+        hist = REGISTRY.histogram(h["name"], h["labels"])
+        rows.append({"function": h["labels"]["function"], "count": hist.count,
+                     "p50": hist.quantile(0.5), "p95": hist.quantile(0.95)})
+    return sorted(rows, key=lambda r: r["function"])
+
+
+def ui_timing_summary() -> list:
+    """Per-stage, per-source count and p50/p95 of the results-page milestones."""
+    rows = []
+    for h in REGISTRY.snapshot()["histograms"]:
+        if not h["name"].startswith("convoready_ui_"):
+            continue
+        hist = REGISTRY.histogram(h["name"], h["labels"])
+        rows.append({"stage": h["name"][len("convoready_ui_"):-len("_seconds")],
+                     "source": h["labels"]["source"], "count": hist.count,
+                     "p50": hist.quantile(0.5), "p95": hist.quantile(0.95)})
+    return sorted(rows, key=lambda r: (r["stage"], r["source"]))
+
+# ── Prometheus endpoint ──────────────────────────────────────────────────────
+
+_server         = None
+_server_started = False
+_server_lock    = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT):
+    """Serve /metrics on a daemon thread, once per process. port=0 disables it."""
+    global _server, _server_started
+    if not port:
+        return None
+    with _server_lock:
+        if not _server_started:
+            _server_started = True
+            try:
+                _server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+            except OSError as e:
+                logger.warning("Metrics endpoint not started on port %s: %s", port, e)
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server",
+                             daemon=True).start()
+    return _server
@@ -0,0 +1,49 @@
+"""Scheduler admission order: lower priorities leave HEADROOM for chat."""
+
+import pytest
+
+from rate_limiter import BACKGROUND, CHAT, SCENARIO, RateLimited, Scheduler
+
+
+def _scheduler(rpm=30):
+    now = [0.0]
+    return Scheduler(rpm=rpm, tpm=1_000_000, clock=lambda: now[0]), now
+
+
+def _admit_all(scheduler, priority):
+    admitted = 0
+    while True:
+        try:
+            scheduler.acquire(priority, 500, 0.0)
+        except RateLimited:
+            return admitted
+        admitted += 1
+
+
+def test_background_burst_leaves_headroom():
+    scheduler, _ = _scheduler()
+    assert _admit_all(scheduler, BACKGROUND) == 18
+    assert _admit_all(scheduler, SCENARIO) == 6
+    assert _admit_all(scheduler, CHAT) == 6
+
+
+def test_chat_not_shed_after_lower_priority_burst():
+    scheduler, _ = _scheduler()
+    _admit_all(scheduler, BACKGROUND)
+    _admit_all(scheduler, SCENARIO)
+    for _ in range(6):
+        assert scheduler.acquire(CHAT, 500, 0.0) == 0.0
+
+
+def test_chat_may_use_the_whole_bucket():
+    scheduler, _ = _scheduler()
+    assert _admit_all(scheduler, CHAT) == 30
+
+
+def test_headroom_refills_for_background():
+    scheduler, now = _scheduler()
+    _admit_all(scheduler, BACKGROUND)
+    with pytest.raises(RateLimited):
+        scheduler.acquire(BACKGROUND, 500, 0.0)
+    now[0] += 2.0                              # one request's worth at 30 RPM
+    assert scheduler.acquire(BACKGROUND, 500, 0.0) == 0.0
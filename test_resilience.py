@@ -0,0 +1,71 @@
+"""Circuit-breaker state through call_with_resilience, against fake_gemini.py faults."""
+
+import time
+
+import pytest
+
+from fake_gemini import FakeAPIError
+from resilience import CircuitBreaker, CircuitOpen, Policy, call_with_resilience
+
+POLICY = Policy(budget=1.0, attempt_timeout=0.5, retries=0)
+
+
+def _fail(code):
+    def fn():
+        raise FakeAPIError(code)
+    return fn
+
+
+def _half_open(breaker):
+    for _ in range(breaker.min_calls):
+        with pytest.raises(FakeAPIError):
+            call_with_resilience(_fail(503), POLICY, breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(breaker.cooldown)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_outage_opens_breaker():
+    breaker = CircuitBreaker(min_calls=3, cooldown=60)
+    for _ in range(3):
+        with pytest.raises(FakeAPIError):
+            call_with_resilience(_fail(503), POLICY, breaker)
+    with pytest.raises(CircuitOpen):
+        call_with_resilience(lambda: "ok", POLICY, breaker)
+
+
+def test_successful_trial_closes_breaker():
+    breaker = CircuitBreaker(min_calls=3, cooldown=0.05)
+    _half_open(breaker)
+    assert call_with_resilience(lambda: "ok", POLICY, breaker) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens_breaker():
+    breaker = CircuitBreaker(min_calls=3, cooldown=0.05)
+    _half_open(breaker)
+    with pytest.raises(FakeAPIError):
+        call_with_resilience(_fail(503), POLICY, breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_non_retryable_trial_does_not_wedge_half_open():
+    breaker = CircuitBreaker(min_calls=3, cooldown=0.05)
+    _half_open(breaker)
+    with pytest.raises(FakeAPIError):
+        call_with_resilience(_fail(400), POLICY, breaker)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert call_with_resilience(lambda: "ok", POLICY, breaker) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_decode_error_in_trial_releases_it():
+    breaker = CircuitBreaker(min_calls=3, cooldown=0.05)
+    _half_open(breaker)
+
+    def bad_json():
+        raise ValueError("Expecting value: line 1 column 1")
+
+    with pytest.raises(ValueError):
+        call_with_resilience(bad_json, POLICY, breaker)
+    assert breaker.allow()
@@ -0,0 +1,59 @@
+"""SingleFlight coalescing under 50 concurrent callers, against fake_gemini.py."""
+
+import threading
+
+from fake_gemini import FakeAPIError, FakeGeminiClient
+from resilience import CallTimeout
+from singleflight import SingleFlight, flight_key
+
+CALLERS = 50
+KEY     = flight_key("generate_phrases", "Ordering dinner at a tapas bar", "A2")
+
+
+def _drill(client, timeout=None):
+    flights = SingleFlight()
+    outcome = {"led": 0, "shared": 0, "errors": 0, "timeouts": 0}
+    lock    = threading.Lock()
+    start   = threading.Barrier(CALLERS)
+
+    def learner():
+        start.wait()
+        try:
+            _, shared = flights.do(KEY, lambda: client.models.generate_content(
+                model="fake", contents="phrases for a tapas bar").text, timeout)
+            field = "shared" if shared else "led"
+        except CallTimeout:
+            field = "timeouts"
+        except FakeAPIError:
+            field = "errors"
+        with lock:
+            outcome[field] += 1
+
+    threads = [threading.Thread(target=learner) for _ in range(CALLERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert flights.in_flight() == 0
+    return outcome
+
+
+def test_identical_requests_make_one_upstream_call():
+    client  = FakeGeminiClient(latency=0.3, jitter=0)
+    outcome = _drill(client)
+    assert client.calls == 1
+    assert outcome == {"led": 1, "shared": CALLERS - 1, "errors": 0, "timeouts": 0}
+
+
+def test_upstream_failure_reaches_every_waiter_once():
+    client  = FakeGeminiClient(latency=0.3, jitter=0, error_rate=1.0)
+    outcome = _drill(client)
+    assert client.calls == 1
+    assert outcome["errors"] == CALLERS
+
+
+def test_waiters_time_out_while_leader_finishes():
+    client  = FakeGeminiClient(latency=0.3, jitter=0)
+    outcome = _drill(client, timeout=0.1)
+    assert client.calls == 1
+    assert outcome == {"led": 1, "shared": 0, "errors": 0, "timeouts": CALLERS - 1}
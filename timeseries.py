@@ -0,0 +1,165 @@
+"""
+timeseries.py
+─────────────
+Readiness-over-time series for the Progress Dashboard, sized to the chart.
+
+The sidebar chart is a few hundred pixels wide, so there is no point in
+sending it one point per session: series are downsampled to POINTS with
+Largest-Triangle-Three-Buckets, which keeps the peaks and dips a learner
+would notice instead of averaging them away.
+
+  summarise(sessions)           all-time summaries, overall and per scenario
+  add_session(summaries, n, s)  fold session number n into the "all" and
+                                scenario summaries — O(1), no history needed,
+                                so recording a session never walks the past
+  summary_series(summary)       the chart series for one summary
+  readiness_series(sessions, scenario, since)
+                                one filtered series on demand; a date range
+                                only walks the sessions inside it
+
+A summary splits a series into at most MAX_BUCKETS runs of `width`
+consecutive sessions and keeps each run's lowest and highest point, plus
+the first and last; when the runs fill up, neighbours are merged and the
+width doubles. The chart is then LTTB over those candidate extremes, so the
+peaks and dips survive however long the history gets.
+
+A series is {"x": session numbers, "y": readiness %, "d": dates, "total":
+sessions before downsampling}. Run `python timeseries.py` for timings and
+payload sizes as history grows.
+"""
+
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+POINTS      = 100       # pixel budget of the sidebar chart (~2.5 px per point)
+MAX_BUCKETS = POINTS    # runs kept per summary, each contributing up to two candidates
+
+RANGES = {"All time": None, "Last 90 days": 90, "Last 30 days": 30, "Last 7 days": 7}
+
+
+def lttb(points: list, threshold: int) -> list:
+    """Largest-Triangle-Three-Buckets: `threshold` of the (x, y, ...) points, first and last kept."""
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+    sampled = [points[0]]
+    every   = (n - 2) / (threshold - 2)
+    a       = 0
+    for i in range(threshold - 2):
+        start, end  = int(i * every) + 1, int((i + 1) * every) + 1
+        next_bucket = points[end:min(int((i + 2) * every) + 1, n)] or points[-1:]
+        avg_x       = sum(p[0] for p in next_bucket) / len(next_bucket)
+        avg_y       = sum(p[1] for p in next_bucket) / len(next_bucket)
+        ax, ay      = points[a][0], points[a][1]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def _series(points: list, total: int, size: int) -> dict:
+    points = lttb(points, size)
+    return {"x": [p[0] for p in points], "y": [p[1] for p in points],
+            "d": [p[2] for p in points], "total": total}
+
+
+def readiness_series(sessions: list, scenario: str = None, since: str = None,
+                     points: int = POINTS) -> dict:
+    """Sessions of `scenario` (all if None) from ISO date `since` on, downsampled to `points`."""
+    selected = []
+    for i in range(len(sessions) - 1, -1, -1):      # newest first: a date range stops early
+        s = sessions[i]
+        if since and s["timestamp"] < since:
+            break
+        if scenario is None or s["scenario"] == scenario:
+            selected.append((i + 1, s["readiness"], s["timestamp"][:10]))
+    selected.reverse()
+    return _series(selected, len(selected), points)
+
+
+def _add(summary: dict, point: list):
+    k = summary["total"] = summary["total"] + 1
+    summary["first"] = summary["first"] or point
+    summary["last"]  = point
+    buckets = summary["buckets"]
+    if (k - 1) // summary["width"] >= len(buckets):
+        buckets.append([point, point])
+    else:
+        low, high = buckets[-1]
+        buckets[-1] = [point if point[1] < low[1] else low, point if point[1] > high[1] else high]
+    if len(buckets) > MAX_BUCKETS:
+        summary["buckets"] = [
+            [min((b[0] for b in pair), key=lambda p: p[1]), max((b[1] for b in pair), key=lambda p: p[1])]
+            for pair in (buckets[i:i + 2] for i in range(0, len(buckets), 2))
+        ]
+        summary["width"] *= 2
+
+
+def add_session(summaries: dict, number: int, session: dict):
+    """Fold session `number` (1-based, over the whole history) into the "all" and scenario summaries."""
+    point = [number, session["readiness"], session["timestamp"][:10]]
+    for key in ("all", session["scenario"]):
+        _add(summaries.setdefault(key, {"width": 1, "total": 0, "first": None, "last": None,
+                                        "buckets": []}), point)
+
+
+def summarise(sessions: list) -> dict:
+    """All-time summaries for a history: {"all": summary, "<scenario>": summary, ...}."""
+    summaries = {}
+    for i, s in enumerate(sessions):
+        add_session(summaries, i + 1, s)
+    return summaries
+
+
+def summary_series(summary: dict, points: int = POINTS) -> dict:
+    """Chart series for a summary: LTTB over its first, last and per-run extremes."""
+    candidates = {p[0]: p for b in summary["buckets"] for p in b}
+    for p in (summary["first"], summary["last"]):
+        if p is not None:
+            candidates[p[0]] = p
+    ordered = [tuple(candidates[x]) for x in sorted(candidates)]
+    return _series(ordered, summary["total"], points)
+
+
+def since_date(days) -> str:
+    """ISO timestamp `days` ago, or None for all time."""
+    return (datetime.now() - timedelta(days=days)).isoformat() if days else None
+
+
+# ── Benchmark ────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    rng   = random.Random(5)
+    start = datetime(2022, 1, 1)
+    for n in (100, 1_000, 10_000, 100_000):
+        sessions, level = [], 40.0
+        for i in range(n):
+            level = min(100.0, max(0.0, level + rng.gauss(0.05, 4)))
+            sessions.append({"timestamp": (start + timedelta(hours=i * 24 * 1000 / n)).isoformat(),
+                             "scenario":  rng.choice(["restaurant", "hotel", "transport"]),
+                             "readiness": int(level)})
+        t0 = time.perf_counter()
+        summaries = summarise(sessions)
+        build_ms  = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        add_session(summaries, n + 1, sessions[-1])
+        add_us = (time.perf_counter() - t0) * 1e6
+        series = {"all": summary_series(summaries["all"])}
+        recent_since = sessions[-1]["timestamp"][:10]
+        t0 = time.perf_counter()
+        recent = readiness_series(sessions, since=(datetime.fromisoformat(recent_since)
+                                                   - timedelta(days=30)).isoformat())
+        recent_ms = (time.perf_counter() - t0) * 1000
+        raw   = len(json.dumps([[i + 1, s["readiness"]] for i, s in enumerate(sessions)]))
+        sized = len(json.dumps([series["all"]["x"], series["all"]["y"]]))
+        stored = len(json.dumps(summaries))
+        print(f"{n:>7,} sessions: summarise {build_ms:7.1f} ms · record one {add_us:5.0f} µs "
+              f"· stored {stored:,} B · last 30 days {recent_ms:6.2f} ms "
+              f"({recent['total']:,} sessions) · chart payload {sized:,} B (raw {raw:,} B)")
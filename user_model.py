@@ -7,9 +7,13 @@ Tracks grammar pattern performance across sessions using Supabase
 (cloud PostgreSQL database) so data persists across Streamlit Cloud
 deployments and browser sessions.
 
-Single demo user: all data stored under key 'demo_user'.
+In the Streamlit app there is a single demo user: all data stored under
+key 'demo_user', cached in st.session_state. Headless callers (core.py)
+bind a plain state dict per learner with bind_state(), carrying their
+"user_id"; Streamlit is then not needed at all.
 
-Data schema (stored as JSONB in Supabase):
+Data schema (stored as JSONB in Supabase, with the sessions packed by
+profile_codec.py — legacy plain-JSON rows still load):
 {
     "sessions": [...],
     "pattern_stats": {
@@ -19,32 +23,103 @@ Data schema (stored as JSONB in Supabase):
     "scenario_stats": {
         "restaurant": {"sessions": 3, "avg_readiness": 72},
         ...
-    }
+    },
+    "review": {                    # spaced repetition of struggled phrases
+        "Quería una mesa para dos": [due_minute, interval, ease, reps, lapses],
+        ...
+    },
+    "readiness": {...},            # online readiness model, see readiness_model.py
+    "readiness_summary": {...},    # bounded readiness-over-time summaries, see timeseries.py
+    "version": "3f9a1c0b2d4e"     # new random revision on every save
 }
 """
 
+import contextvars
+import logging
 import os
+import secrets
+from contextlib import contextmanager
 from datetime import datetime
-import streamlit as st
+
+try:
+    import streamlit as st
+except ImportError:            # headless: core.py / api_server.py
+    st = None
+
+from profile_codec import append_session, decode, encode, session_count
+from readiness_model import ReadinessModel
+from spaced_repetition import ReviewQueue, replay
+from timeseries import add_session, readiness_series, since_date, summarise, summary_series
+
+logger = logging.getLogger(__name__)
 
 DEMO_USER_ID = "demo_user"
 
+# ── Session state ────────────────────────────────────────────────────────────
+
+_bound_state   = contextvars.ContextVar("user_model_state", default=None)
+_default_state = {}
+
+
+def _in_streamlit() -> bool:
+    return _bound_state.get() is None and st is not None and st.runtime.exists()
+
+
+def _state() -> dict:
+    """Where the profile cache lives: the bound learner's state, else the Streamlit session."""
+    state = _bound_state.get()
+    if state is not None:
+        return state
+    return st.session_state if _in_streamlit() else _default_state
+
+
+@contextmanager
+def bind_state(state: dict):
+    """Run profile calls in this block against `state` instead of st.session_state."""
+    token = _bound_state.set(state)
+    try:
+        yield state
+    finally:
+        _bound_state.reset(token)
+
+
+def _user_id() -> str:
+    return _state().get("user_id", DEMO_USER_ID)
+
+
+def _warn(message: str):
+    if _in_streamlit():
+        st.warning(message)
+    else:
+        logger.warning(message)
+
 # ── Supabase connection ──────────────────────────────────────────────────────
 
-def _get_client():
-    """Return a Supabase client, initialised once per session."""
-    if "supabase_client" in st.session_state:
-        return st.session_state["supabase_client"]
+def _secret(name: str):
+    if name in os.environ:
+        return os.environ[name]
+    return st.secrets[name] if st is not None else None
+
+
+def connect():
+    """A new Supabase client from env vars or Streamlit secrets, or None if unavailable."""
     try:
         from supabase import create_client
-        url = st.secrets["SUPABASE_URL"]
-        key = st.secrets["SUPABASE_KEY"]
-        client = create_client(url, key)
-        st.session_state["supabase_client"] = client
-        return client
+        return create_client(_secret("SUPABASE_URL"), _secret("SUPABASE_KEY"))
     except Exception:
         return None
 
+
+def _get_client():
+    """Return a Supabase client, initialised once per session."""
+    state = _state()
+    if "supabase_client" in state:
+        return state["supabase_client"]
+    client = connect()
+    if client is not None:
+        state["supabase_client"] = client
+    return client
+
 # ── Constants ────────────────────────────────────────────────────────────────
 
 PATTERN_LABELS = {
@@ -78,14 +153,15 @@ PATTERN_DIFFICULTY = {
 # ── Empty profile ────────────────────────────────────────────────────────────
 
 def _empty_profile() -> dict:
-    return {"sessions": [], "pattern_stats": {}, "scenario_stats": {}}
+    return {"sessions": [], "pattern_stats": {}, "scenario_stats": {}, "review": {}}
 
 # ── Load / Save ──────────────────────────────────────────────────────────────
 
 def _load_profile() -> dict:
     """Load profile from Supabase. Caches in session state to avoid repeated network calls."""
-    if "cached_profile" in st.session_state:
-        return st.session_state["cached_profile"]
+    state = _state()
+    if "cached_profile" in state:
+        return state["cached_profile"]
 
     client = _get_client()
     if client is None:
@@ -93,11 +169,11 @@ def _load_profile() -> dict:
     try:
         result = (client.table("user_profile")
                         .select("data")
-                        .eq("id", DEMO_USER_ID)
+                        .eq("id", _user_id())
                         .execute())
         if result.data:
-            profile = result.data[0]["data"]
-            st.session_state["cached_profile"] = profile
+            profile = decode(result.data[0]["data"])
+            state["cached_profile"] = profile
             return profile
     except Exception:
         pass
@@ -105,26 +181,48 @@ def _load_profile() -> dict:
 
 def _save_profile(profile: dict):
     """Upsert profile to Supabase and update session cache."""
+    # New revision id on every save — cache key for anything derived from the profile
+    profile["version"] = secrets.token_hex(6)
+
     # Update cache immediately so UI reflects changes without another network call
-    st.session_state["cached_profile"] = profile
+    _state()["cached_profile"] = profile
 
     client = _get_client()
     if client is None:
         return
     try:
         client.table("user_profile").upsert({
-            "id":         DEMO_USER_ID,
-            "data":       profile,
+            "id":         _user_id(),
+            "data":       encode(profile),
             "updated_at": datetime.now().isoformat(),
         }).execute()
     except Exception as e:
-        st.warning(f"Could not save to database: {e}")
+        _warn(f"Could not save to database: {e}")
+
+def _review_queue(profile: dict) -> ReviewQueue:
+    """Due-date index over profile["review"], built once per loaded profile."""
+    if "review" not in profile:
+        profile["review"] = replay(profile.get("sessions", []))
+    state = _state()
+    queue = state.get("review_queue")
+    if queue is None or queue.items is not profile["review"]:
+        queue = ReviewQueue(profile["review"])
+        state["review_queue"] = queue
+    return queue
+
+def _readiness_model(profile: dict) -> ReadinessModel:
+    """Readiness model over profile["readiness"], fitted from the history the first time."""
+    if "readiness" not in profile:
+        profile["readiness"] = ReadinessModel.replay(profile.get("sessions", []), PATTERN_DIFFICULTY).state
+    return ReadinessModel(profile["readiness"], PATTERN_DIFFICULTY)
 
 # ── Record session ───────────────────────────────────────────────────────────
 
 def record_session(scenario: str, level: str, confidence_map: dict,
                    dialogue: list, phrase_pattern_fn):
     profile          = _load_profile()
+    queue            = _review_queue(profile)
+    model            = _readiness_model(profile)
     results          = []
     readiness_scores = []
 
@@ -135,6 +233,8 @@ def record_session(scenario: str, level: str, confidence_map: dict,
             pattern   = phrase_pattern_fn(phrase_es)
             confident = verdict == "✅"
             results.append({"pattern": pattern, "phrase": phrase_es, "confident": confident})
+            queue.review(phrase_es, confident)
+            model.update(pattern, scenario, level, confident)
             readiness_scores.append(1 if confident else 0)
 
             if pattern not in profile["pattern_stats"]:
@@ -155,13 +255,20 @@ def record_session(scenario: str, level: str, confidence_map: dict,
     prev["avg_readiness"] = int((prev["avg_readiness"] * n + avg_readiness) / (n + 1))
     prev["sessions"]     += 1
 
-    profile["sessions"].append({
+    profile_session = {
         "timestamp": datetime.now().isoformat(),
         "scenario":  scenario,
         "level":     level,
         "results":   results,
         "readiness": avg_readiness,
-    })
+    }
+    append_session(profile, profile_session)
+
+    if "readiness_summary" in profile:
+        add_session(profile["readiness_summary"], session_count(profile), profile_session)
+    else:           # profiles saved before summaries existed: built once from the history
+        profile["readiness_summary"] = summarise(profile["sessions"])
+    profile.pop("readiness_series", None)
 
     _save_profile(profile)
     return avg_readiness
@@ -218,19 +325,44 @@ def get_recommended_focus() -> str:
                    f"Review {worst['label']} phrases from your last session before moving on.")
     return f"You struggle most with {worst['label']} ({rate}% confident). {tip}"
 
-def get_predicted_readiness(scenario: str, level: str):
+def get_readiness_prediction(scenario: str, level: str, lines: int = None):
+    """Predicted readiness % for this scenario and level with a 90% range: {"readiness", "low", "high"}."""
     profile = _load_profile()
-    if len(profile.get("sessions", [])) < 2:
+    if session_count(profile) < 2:
         return None
-    perf = get_pattern_performance()
-    if not perf:
+    prediction = _readiness_model(profile).predict(scenario, level, lines)
+    if prediction is None:
         return None
-    weighted_sum   = sum(d["rate"] * PATTERN_DIFFICULTY.get(p, 3) for p, d in perf.items())
-    weighted_total = sum(PATTERN_DIFFICULTY.get(p, 3) for p in perf)
-    return int((weighted_sum / weighted_total) * 100) if weighted_total else None
+    return {k: int(round(prediction[k] * 100)) for k in ("readiness", "low", "high")}
+
+def get_predicted_readiness(scenario: str, level: str):
+    prediction = get_readiness_prediction(scenario, level)
+    return prediction["readiness"] if prediction else None
+
+def get_due_reviews(limit: int = 10) -> list:
+    """Struggled phrases due for review now, most overdue first: [{"phrase", "due", "lapses"}]."""
+    queue = _review_queue(_load_profile())
+    return [{"phrase": phrase, "due": due, "lapses": queue.items[phrase][4]}
+            for phrase, due in queue.due(limit)]
+
+def get_readiness_series(scenario: str = None, days: int = None):
+    """Readiness over time, downsampled for the dashboard chart — see timeseries.py. None if empty."""
+    profile = _load_profile()
+    if days:
+        series = readiness_series(profile.get("sessions", []), scenario, since_date(days))
+    else:
+        if "readiness_summary" not in profile:
+            profile["readiness_summary"] = summarise(profile.get("sessions", []))
+        summary = profile["readiness_summary"].get(scenario or "all")
+        series  = summary_series(summary) if summary else None
+    return series if series and series["total"] else None
+
+def get_profile_version() -> str:
+    """Revision id of the current profile; changes whenever it is saved."""
+    return _load_profile().get("version", "")
 
 def get_session_count() -> int:
-    return len(_load_profile().get("sessions", []))
+    return session_count(_load_profile())
 
 def get_scenario_history() -> dict:
     return _load_profile().get("scenario_stats", {})
@@ -0,0 +1,116 @@
+"""
+warmup.py
+─────────
+Background warm-up of common scenarios at server start.
+
+The sidebar example buttons are the most common entry point, yet on a cold
+session each click waits for live generation. start_warmup() launches one
+daemon thread per process that pre-generates phrases and dialogue for
+
+  • every sidebar example × A1 / A2 / B1
+  • the most requested recent scenarios (content_store popularity ranking)
+
+into the shared content store, skipping anything already there. Generation
+runs on a small worker pool behind a throttle, and its model calls queue at
+BACKGROUND priority, so a learner's chat or scenario request waiting for
+Gemini quota is always admitted ahead of them.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from content_store import STORE, normalise
+from llm_generator import generate_scenario_content
+from rate_limiter import BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+EXAMPLE_SCENARIOS = [
+    "Complain to landlord about broken heater",
+    "First date at a tapas bar",
+    "Buying clothes, asking about sizes",
+    "Feeling sick, need a pharmacy",
+    "Taxi from the airport",
+    "Job interview at a Spanish company",
+]
+
+WARMUP_LEVELS   = ["A1", "A2", "B1"]
+POPULAR_COUNT   = 10      # popular recent scenarios warmed besides the examples
+MAX_CONCURRENCY = 2       # generations in flight at once
+MIN_INTERVAL    = 2.0     # seconds between generation starts
+
+
+class Throttle:
+    """Spaces out callers so at most one proceeds every `interval` seconds."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next    = 0.0
+        self._lock    = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now         = time.monotonic()
+            start       = max(now, self._next)
+            self._next  = start + self.interval
+        time.sleep(max(0.0, start - now))
+
+
+def warmup_jobs(store=STORE) -> list:
+    """(scenario text, level) pairs still missing from the store, examples first."""
+    examples = {normalise(t) for t in EXAMPLE_SCENARIOS}
+    texts    = EXAMPLE_SCENARIOS + [t for t in store.popular(POPULAR_COUNT)
+                                    if normalise(t) not in examples]
+    return [(text, level) for text in texts for level in WARMUP_LEVELS
+            if (text, level) not in store]
+
+
+def warm_generate(text: str, primary_key: str, level: str):
+    """generate_scenario_content at BACKGROUND priority: nobody is waiting for it yet."""
+    return generate_scenario_content(text, primary_key, level, priority=BACKGROUND)
+
+
+def warm_scenarios(detect_primary_key, store=STORE, generate=warm_generate,
+                   max_concurrency: int = MAX_CONCURRENCY,
+                   min_interval: float = MIN_INTERVAL) -> dict:
+    """Generate every missing warm-up job into the store. Returns counts."""
+    throttle = Throttle(min_interval)
+    stats    = {"generated": 0, "failed": 0}
+    lock     = threading.Lock()
+
+    def warm_one(text, level):
+        throttle.wait()
+        try:
+            data = generate(text, detect_primary_key(text), level)
+        except Exception as e:
+            logger.warning("Warm-up of %r (%s) failed: %s", text, level, e)
+            data = None
+        if data:
+            store.put(text, level, data)
+        with lock:
+            stats["generated" if data else "failed"] += 1
+
+    jobs = warmup_jobs(store)
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="warmup") as pool:
+        for text, level in jobs:
+            pool.submit(warm_one, text, level)
+    logger.info("Warm-up finished: %d generated, %d failed", stats["generated"], stats["failed"])
+    return stats
+
+
+_started      = False
+_started_lock = threading.Lock()
+
+
+def start_warmup(detect_primary_key) -> bool:
+    """Start the warm-up thread once per process. Returns True if this call started it."""
+    global _started
+    with _started_lock:
+        if _started:
+            return False
+        _started = True
+    threading.Thread(target=warm_scenarios, args=(detect_primary_key,),
+                     name="scenario-warmup", daemon=True).start()
+    return True